@@ -0,0 +1,44 @@
+import queue
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Tuple
+
+
+class AgentPool:
+    """
+    Keeps prebuilt autogen agent pairs so requests don't pay for constructing
+    agents and generating tool schemas every time.
+
+    `factory` builds one (assistant, executor) pair with its system message and
+    tool schemas already registered. A checked-out pair is used by one request at a
+    time; per-request state (system message, tool functions) is bound on checkout.
+    `initiate_chat` clears the pair's history, so returning it to the pool is safe.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Tuple[Any, Any]], size: int = 4, prebuild: int = 1):
+        self.name = name
+        self.factory = factory
+        self._pairs: "queue.LifoQueue[Tuple[Any, Any]]" = queue.LifoQueue(maxsize=size)
+        for _ in range(min(prebuild, size)):
+            self._pairs.put(self._build())
+
+    def _build(self) -> Tuple[Any, Any]:
+        started = time.perf_counter()
+        pair = self.factory()
+        print(f"[AGENT POOL] Built {self.name} agents in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return pair
+
+    @contextmanager
+    def checkout(self) -> Iterator[Tuple[Any, Any]]:
+        """Yields an idle pair, building a new one only when every pair is busy."""
+        try:
+            pair = self._pairs.get_nowait()
+        except queue.Empty:
+            pair = self._build()
+        try:
+            yield pair
+        finally:
+            try:
+                self._pairs.put_nowait(pair)
+            except queue.Full:
+                pass
@@ -1,19 +1,20 @@
 import re
 import sqlite3
+from concurrent.futures import Future
 from passlib.context import CryptContext
 from typing import List, Dict, Any, Optional, Tuple
+
+from db import connection
+from pagination import keyset_page
+from write_behind import write_queue
 # Password hashing setup
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 # VALIDATION FUNCTIONS
 
-import sqlite3
 
 def get_username_by_id(user_id):
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT username FROM users WHERE id = ?", (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        result = conn.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
     return result[0] if result else None
 
 def is_valid_email(email: str) -> bool:
@@ -64,7 +65,7 @@ def add_user(username: str, password: str) -> Tuple[bool, str]:
     sql = "INSERT INTO users (username, password_hash) VALUES (?, ?)"
     
     try:
-        with sqlite3.connect('users.db') as conn:
+        with connection() as conn:
             c = conn.cursor()
             c.execute(sql, (username, hashed))
         return True, "User created successfully!"
@@ -78,7 +79,7 @@ def check_user(username: str, password: str) -> Optional[int]:
     """Checks credentials and returns user_id if valid."""
     sql = "SELECT id, password_hash FROM users WHERE username = ?"
     try:
-        with sqlite3.connect('users.db') as conn:
+        with connection() as conn:
             c = conn.cursor()
             c.execute(sql, (username,))
             user_data = c.fetchone()
@@ -92,21 +93,27 @@ def check_user(username: str, password: str) -> Optional[int]:
         return None
 # CHAT & SUMMARY FUNCTIONS
 
-def save_chat_message(user_id: int, sender: str, message: str, source: Optional[str] = None) -> None:
-    sql = "INSERT INTO chat_history (user_id, sender, message, source) VALUES (?, ?, ?, ?)"
+SAVE_CHAT_SQL = "INSERT INTO chat_history (user_id, sender, message, source) VALUES (?, ?, ?, ?)"
+
+def queue_chat_message(user_id: int, sender: str, message: str, source: Optional[str] = None) -> Future:
+    """Queues a chat message on the write-behind queue; the future resolves to its id once committed."""
+    return write_queue.submit(SAVE_CHAT_SQL, [(user_id, sender, message, source)], return_id=True)
+
+def save_chat_message(user_id: int, sender: str, message: str, source: Optional[str] = None) -> Optional[int]:
+    """Saves a chat message and returns its id (None on failure). Commits together with other queued writes."""
     try:
-        with sqlite3.connect('users.db') as conn:
-            conn.execute(sql, (user_id, sender, message, source))
+        return queue_chat_message(user_id, sender, message, source).result(timeout=30)
     except Exception as e:
         print(f"Error saving chat message: {e}")
+        return None
 
 def load_chat_history(user_id: int) -> List[Dict[str, Any]]:
     sql = "SELECT sender, message, source FROM chat_history WHERE user_id = ? ORDER BY timestamp ASC"
     display_messages = []
     try:
-        with sqlite3.connect('users.db') as conn:
-            conn.row_factory = sqlite3.Row
+        with connection() as conn:
             c = conn.cursor()
+            c.row_factory = sqlite3.Row  # per cursor: the pooled connection is shared
             c.execute(sql, (user_id,))
             history_data = c.fetchall()
         for row in history_data:
@@ -120,18 +127,75 @@ def load_chat_history(user_id: int) -> List[Dict[str, Any]]:
     return display_messages
 
 
-def save_document_summary(user_id: int, summary_text: Optional[str], pdf_name: Optional[str]) -> None:
-    sql = "UPDATE users SET current_summary_text = ?, current_pdf_name = ? WHERE id = ?"
+def load_chat_page(user_id: int, before: Optional[Tuple[str, int]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of chat history ending just before the `before` (timestamp, id)
+    position (the latest messages when None), oldest first, plus the cursor
+    for the next older page (None when there is none).
+    """
+    sql = "SELECT id, sender, message, source, timestamp FROM chat_history WHERE user_id = ?"
+    params: list = [user_id]
+    if before:
+        sql += " AND (timestamp, id) < (?, ?)"
+        params += list(before)
+    sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    rows, next_cursor = keyset_page(rows, limit, lambda r: r[4], lambda r: r[0])
+    messages = []
+    for row_id, sender, message, source, timestamp in reversed(rows):
+        msg = {"id": row_id, "role": "user" if sender == "user" else "assistant",
+               "content": message, "timestamp": timestamp}
+        if source:
+            msg["source"] = source
+        messages.append(msg)
+    return messages, next_cursor
+
+
+def chat_history_version(user_id: int) -> Tuple[Optional[int], Optional[str]]:
+    """(id, timestamp) of the user's newest chat message; chat history is append-only."""
+    sql = "SELECT id, timestamp FROM chat_history WHERE user_id = ? ORDER BY id DESC LIMIT 1"
+    with connection() as conn:
+        row = conn.execute(sql, (user_id,)).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def save_document_summary(user_id: int, summary_text: Optional[str], pdf_name: Optional[str],
+                          doc_hash: Optional[str] = None) -> None:
+    sql = """
+        UPDATE users SET current_summary_text = ?, current_pdf_name = ?, current_doc_hash = ?,
+                         summary_version = summary_version + 1, summary_updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """
     try:
-        with sqlite3.connect('users.db') as conn:
-            conn.execute(sql, (summary_text, pdf_name, user_id))
+        with connection() as conn:
+            conn.execute(sql, (summary_text, pdf_name, doc_hash, user_id))
     except Exception as e:
         print(f"Error saving document summary: {e}")
 
+def load_document_hash(user_id: int) -> Optional[str]:
+    sql = "SELECT current_doc_hash FROM users WHERE id = ?"
+    try:
+        with connection() as conn:
+            data = conn.execute(sql, (user_id,)).fetchone()
+        if data:
+            return data[0]
+    except Exception as e:
+        print(f"Error loading document hash: {e}")
+    return None
+
+def load_summary_version(user_id: int) -> Tuple[int, Optional[str]]:
+    """(summary_version, summary_updated_at) of the user's current document summary."""
+    sql = "SELECT summary_version, summary_updated_at FROM users WHERE id = ?"
+    with connection() as conn:
+        row = conn.execute(sql, (user_id,)).fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
 def load_document_summary(user_id: int) -> Tuple[Optional[str], Optional[str]]:
     sql = "SELECT current_summary_text, current_pdf_name FROM users WHERE id = ?"
     try:
-        with sqlite3.connect('users.db') as conn:
+        with connection() as conn:
             c = conn.cursor()
             c.execute(sql, (user_id,))
             data = c.fetchone()
@@ -0,0 +1,80 @@
+"""
+Measures per-request agent setup cost for the chat agent:
+building AssistantAgent + UserProxyAgent and registering tool schemas on every
+request (old behaviour) vs. checking a prebuilt pair out of an AgentPool and
+binding only the per-request state (current behaviour).
+
+    python benchmarks/bench_agent_setup.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autogen import AssistantAgent, UserProxyAgent  # noqa: E402
+from agent_pool import AgentPool  # noqa: E402
+from tool_runner import enable_concurrent_tool_calls  # noqa: E402
+
+llm_config = {
+    "config_list": [{"model": "gemini-2.5-flash", "api_type": "google", "api_key": "benchmark"}],
+    "temperature": 0.3,
+}
+SYSTEM_MESSAGE = "You are LexiLaw. Document: \"{pdf_name}\". Summary: {summary}"
+TOOLS = {
+    "retrieve_legal_context": "Retrieve content from the uploaded legal document.",
+    "search_indiankanoon_api": "Find related public Indian legal precedents.",
+    "search_web": "Search the live internet for general legal or factual information.",
+}
+
+
+def _tool(query: str) -> str:
+    return query
+
+
+def build_pair(system_message: str):
+    assistant = AssistantAgent(name="LegalAssistant", system_message=system_message, llm_config=llm_config)
+    executor = UserProxyAgent(
+        name="ToolExecutor", llm_config=False, human_input_mode="NEVER",
+        code_execution_config={"use_docker": False},
+    )
+    return assistant, executor
+
+
+def per_request_setup(i: int) -> None:
+    assistant, executor = build_pair(SYSTEM_MESSAGE.format(pdf_name=f"doc{i}.pdf", summary="..."))
+    for name, description in TOOLS.items():
+        assistant.register_for_llm(name=name, description=description)(_tool)
+        executor.register_for_execution(name=name)(_tool)
+    enable_concurrent_tool_calls(executor)
+
+
+def build_template():
+    assistant, executor = build_pair(SYSTEM_MESSAGE)
+    for name, description in TOOLS.items():
+        assistant.register_for_llm(name=name, description=description)(_tool)
+    enable_concurrent_tool_calls(executor)
+    return assistant, executor
+
+
+def pooled_setup(pool: AgentPool, i: int) -> None:
+    with pool.checkout() as (assistant, executor):
+        assistant.update_system_message(SYSTEM_MESSAGE.format(pdf_name=f"doc{i}.pdf", summary="..."))
+        executor.register_function({name: _tool for name in TOOLS}, silent_override=True)
+
+
+def timed(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    before = timed(per_request_setup, iterations)
+    pool = AgentPool("legal_assistant", build_template, size=4)
+    after = timed(lambda i: pooled_setup(pool, i), iterations)
+    print(f"per-request construction: {before:.3f} ms/request")
+    print(f"prebuilt template:        {after:.3f} ms/request")
+    print(f"speedup:                  {before / after:.1f}x")
@@ -0,0 +1,102 @@
+"""
+Seeds a users.db-shaped database with millions of chat, precedent and
+fact-check rows, then times the per-user history queries without the migration-1 indexes (the old
+behaviour) and after running the migration-1 statements (current behaviour),
+printing each query plan. Runs in a temporary
+directory, so the real users.db is never touched.
+
+    python benchmarks/bench_history_queries.py [chat_rows] [users]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from db import connection  # noqa: E402
+
+QUERIES = {
+    "chat history": (
+        "SELECT sender, message, source FROM chat_history WHERE user_id = ? ORDER BY timestamp ASC", ()),
+    "recent messages": (
+        "SELECT id, sender, message FROM chat_history WHERE user_id = ? ORDER BY id DESC LIMIT ?", (6,)),
+    "precedents": (
+        "SELECT id, title, court, year, url, confidence, ai_summary, created_at FROM precedents2 "
+        "WHERE user_id = ? ORDER BY created_at DESC LIMIT 50", ()),
+    "fact-check history": (
+        "SELECT h.statement, h.supported, h.confidence, h.evidence, h.timestamp, r.results_json "
+        "FROM fact_check_history h LEFT JOIN fact_check_results r ON r.id = h.result_id "
+        "WHERE h.user_id = ? ORDER BY h.timestamp DESC", ()),
+    "fact-check by message": (
+        "SELECT h.statement FROM fact_check_history h WHERE h.user_id = ? AND h.message_id = ? ORDER BY h.id",
+        (1,)),
+}
+
+
+def _seed(chat_rows: int, users: int) -> None:
+    rng = random.Random(7)
+    start = time.perf_counter()
+    day = 24 * 60 * 60
+    with connection() as conn:
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, sender, message, source, timestamp) "
+            "VALUES (?, ?, ?, NULL, datetime(?, 'unixepoch'))",
+            ((rng.randrange(users), "user" if i % 2 == 0 else "assistant", f"message {i} " + "x" * 80,
+              1_700_000_000 + i * 30 % (365 * day)) for i in range(chat_rows)),
+        )
+        conn.executemany(
+            "INSERT INTO precedents2 (user_id, run_id, title, court, year, url, confidence, ai_summary, created_at) "
+            "VALUES (?, ?, ?, 'Supreme Court', '2001', ?, 0.9, 'summary', datetime(?, 'unixepoch'))",
+            ((rng.randrange(users), i // 8, f"Case {i}", f"https://example.org/{i}", 1_700_000_000 + i * 60)
+             for i in range(chat_rows // 4)),
+        )
+        conn.executemany(
+            "INSERT INTO fact_check_history (user_id, message_id, statement, supported, confidence, evidence, timestamp) "
+            "VALUES (?, ?, ?, 1, 0.8, 'evidence', datetime(?, 'unixepoch'))",
+            ((rng.randrange(users), i // 3, f"statement {i}", 1_700_000_000 + i * 45) for i in range(chat_rows // 4)),
+        )
+    print(f"seeded {chat_rows:,} chat rows, {chat_rows // 4:,} precedents, {chat_rows // 4:,} fact checks "
+          f"for {users:,} users in {time.perf_counter() - start:.1f}s")
+
+
+def _time_queries(label: str, users: int, samples: int = 20) -> None:
+    print(f"\n{label}")
+    rng = random.Random(11)
+    with connection() as conn:
+        for name, (sql, extra) in QUERIES.items():
+            plan = "; ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, (0, *extra)))
+            start = time.perf_counter()
+            for _ in range(samples):
+                conn.execute(sql, (rng.randrange(users), *extra)).fetchall()
+            ms = (time.perf_counter() - start) * 1000 / samples
+            print(f"  {name:<22} {ms:9.3f} ms   {plan}")
+
+
+def main():
+    chat_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        database.db_init()
+        # Back to the unindexed tables: drop only what migration 1 created, leaving
+        # user_version and the later migrations' columns as they are
+        indexes = [sql.split()[5] for sql in database.MIGRATIONS[0] if sql.startswith("CREATE INDEX")]
+        with connection() as conn:
+            for name in indexes:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+        _seed(chat_rows, users)
+        _time_queries("without migration 1 (no indexes)", users)
+
+        start = time.perf_counter()
+        with connection() as conn:
+            for sql in database.MIGRATIONS[0]:
+                conn.execute(sql)
+        print(f"\nbuilt {len(indexes)} indexes + ANALYZE in {time.perf_counter() - start:.1f}s")
+        _time_queries("with migration 1 indexes", users, samples=200)
+
+
+if __name__ == "__main__":
+    main()
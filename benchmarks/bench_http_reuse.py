@@ -0,0 +1,60 @@
+"""
+Measures the cost of opening a new connection per provider call (bare
+requests.get, the old behaviour) vs. the shared keep-alive session from
+http_client (current behaviour), against a local HTTP/1.1 server so no
+network or API keys are needed. Also prints http_client.connection_stats().
+
+    python benchmarks/bench_http_reuse.py [iterations]
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import get_session, connection_stats  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"results": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _time(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn().raise_for_status()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000 / iterations:8.3f} ms/request")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/search/"
+
+    _time("new connection per call", lambda: requests.get(url, timeout=5), iterations)
+    _time("shared pooled session", lambda: get_session().get(url), iterations)
+    for host, stats in connection_stats().items():
+        print(f"{host}: {stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Concurrent chat writes and history reads against users.db-shaped tables:
+a fresh sqlite3.connect per operation with the default rollback journal (the
+old behaviour) vs. the pooled WAL connections from db.py (current behaviour).
+Runs in a temporary directory, so the real users.db is never touched.
+
+    python benchmarks/bench_sqlite_concurrency.py [threads] [ops_per_thread]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE chat_history (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        sender TEXT,
+        message TEXT,
+        source TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+INSERT = "INSERT INTO chat_history (user_id, sender, message, source) VALUES (?, ?, ?, ?)"
+SELECT = "SELECT sender, message, source FROM chat_history WHERE user_id = ? ORDER BY id DESC LIMIT 20"
+
+
+def _old_write(path, user_id, i):
+    with sqlite3.connect(path, timeout=30) as conn:
+        conn.execute(INSERT, (user_id, "user", f"message {i}", None))
+    conn.close()
+
+
+def _old_read(path, user_id):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute(SELECT, (user_id,)).fetchall()
+    conn.close()
+
+
+def _pooled_write(path, user_id, i):
+    with db.connection(path) as conn:
+        conn.execute(INSERT, (user_id, "user", f"message {i}", None))
+
+
+def _pooled_read(path, user_id):
+    with db.connection(path) as conn:
+        conn.execute(SELECT, (user_id,)).fetchall()
+
+
+def _run(label, path, write, read, threads, ops):
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(ops):
+            start = time.perf_counter()
+            try:
+                # Three history reads per chat write, like /chat + history loads
+                write(path, n % 10, i) if i % 4 == 0 else read(path, n % 10)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<34} {threads * ops / elapsed:9.0f} ops/s   p50 {p50:6.2f} ms   "
+          f"p99 {p99:7.2f} ms   errors {len(errors)}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path, new_path = os.path.join(tmp, "old.db"), os.path.join(tmp, "new.db")
+        for path in (old_path, new_path):
+            with sqlite3.connect(path) as conn:
+                conn.executescript(SCHEMA)
+            conn.close()
+
+        _run("connect per op, rollback journal", old_path, _old_write, _old_read, threads, ops)
+        _run("pooled WAL connections", new_path, _pooled_write, _pooled_read, threads, ops)
+        print(f"pool: {db.pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
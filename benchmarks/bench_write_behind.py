@@ -0,0 +1,107 @@
+"""
+Concurrent /chat-shaped write load: per turn a user message, an assistant
+message (whose id is needed) and a fact-check result set. Compares one
+commit per write on pooled connections (the old save_chat_message /
+save_fact_check_results behaviour) with the write-behind queue, which
+group-commits the same writes. Runs in a temporary directory, so the real
+users.db is never touched.
+
+    python benchmarks/bench_write_behind.py [threads] [turns_per_thread]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connection  # noqa: E402
+from write_behind import WriteBehindQueue  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE chat_history (
+        id INTEGER PRIMARY KEY, user_id INTEGER, sender TEXT, message TEXT, source TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE fact_check_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, message_id INTEGER,
+        statement TEXT, supported BOOLEAN, confidence REAL, evidence TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+CHAT_SQL = "INSERT INTO chat_history (user_id, sender, message, source) VALUES (?, ?, ?, ?)"
+FACT_SQL = ("INSERT INTO fact_check_history (user_id, message_id, statement, supported, confidence, evidence) "
+            "VALUES (?, ?, ?, ?, ?, ?)")
+FACTS_PER_TURN = 4
+
+
+def _facts(user_id, message_id):
+    return [(user_id, message_id, f"statement {k}", 1, 0.9, "evidence") for k in range(FACTS_PER_TURN)]
+
+
+def _direct_turn(path, user_id, i):
+    with connection(path) as conn:
+        conn.execute(CHAT_SQL, (user_id, "user", f"question {i}", None))
+    with connection(path) as conn:
+        message_id = conn.execute(CHAT_SQL, (user_id, "assistant", f"answer {i}", "RAG")).lastrowid
+    with connection(path) as conn:
+        for row in _facts(user_id, message_id):
+            conn.execute(FACT_SQL, row)
+
+
+def _queued_turn(writer):
+    def turn(path, user_id, i):
+        writer.submit(CHAT_SQL, [(user_id, "user", f"question {i}", None)], db_path=path, return_id=True)
+        message_id = writer.submit(CHAT_SQL, [(user_id, "assistant", f"answer {i}", "RAG")],
+                                   db_path=path, return_id=True).result()
+        writer.submit(FACT_SQL, _facts(user_id, message_id), db_path=path)
+    return turn
+
+
+def _run(label, path, turn, threads, turns, finish=lambda: None):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(turns):
+            start = time.perf_counter()
+            turn(path, n, i)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    finish()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    with connection(path) as conn:
+        rows = conn.execute("SELECT (SELECT COUNT(*) FROM chat_history) + (SELECT COUNT(*) FROM fact_check_history)").fetchone()[0]
+    print(f"{label:<30} {threads * turns / elapsed:8.0f} turns/s   p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms   "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms   rows {rows}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        direct_path, queued_path = os.path.join(tmp, "direct.db"), os.path.join(tmp, "queued.db")
+        for path in (direct_path, queued_path):
+            with connection(path) as conn:
+                conn.executescript(SCHEMA)
+
+        _run("commit per write", direct_path, _direct_turn, threads, turns)
+        writer = WriteBehindQueue()
+        _run("write-behind queue", queued_path, _queued_turn(writer), threads, turns, finish=writer.flush)
+        print(f"writer: {writer.stats()}")
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
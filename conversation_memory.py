@@ -0,0 +1,160 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from db import connection
+from prompt_builder import HISTORY_TOKEN_BUDGET, truncate_to_tokens
+from rate_limiter import estimate_tokens, llm_priority, PRIORITY_BACKGROUND
+
+# Last N user/assistant turns are passed verbatim; older ones live in the rolling summary.
+RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+# Fold older messages into the summary only once this many have piled up.
+FOLD_BATCH = 4
+# Upper bound per update so a long backlog is folded over several updates.
+FOLD_MAX = 20
+MAX_MESSAGE_TOKENS = 250
+
+_memory_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory")
+_updating = set()
+_updating_lock = threading.Lock()
+
+
+def load_recent_messages(user_id: int, limit: int) -> List[Dict[str, str]]:
+    """Latest `limit` chat messages of a user, oldest first."""
+    sql = "SELECT id, sender, message FROM chat_history WHERE user_id = ? ORDER BY id DESC LIMIT ?"
+    try:
+        with connection() as conn:
+            rows = conn.execute(sql, (user_id, limit)).fetchall()
+    except Exception as e:
+        print(f"Error loading recent messages: {e}")
+        return []
+    return [{"id": r[0], "sender": r[1], "message": r[2] or ""} for r in reversed(rows)]
+
+
+def load_rolling_summary(user_id: int) -> tuple:
+    """Returns (summary, summarized_through_id) for a user."""
+    sql = "SELECT summary, summarized_through_id FROM conversation_memory WHERE user_id = ?"
+    try:
+        with connection() as conn:
+            row = conn.execute(sql, (user_id,)).fetchone()
+        if row:
+            return row[0] or "", row[1] or 0
+    except Exception as e:
+        print(f"Error loading conversation memory: {e}")
+    return "", 0
+
+
+def save_rolling_summary(user_id: int, summary: str, summarized_through_id: int) -> None:
+    sql = """
+        INSERT INTO conversation_memory (user_id, summary, summarized_through_id, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id) DO UPDATE SET
+            summary = excluded.summary,
+            summarized_through_id = excluded.summarized_through_id,
+            updated_at = excluded.updated_at
+    """
+    try:
+        with connection() as conn:
+            conn.execute(sql, (user_id, summary, summarized_through_id))
+    except Exception as e:
+        print(f"Error saving conversation memory: {e}")
+
+
+def _format_turns(messages: List[Dict[str, str]]) -> str:
+    lines = []
+    for m in messages:
+        speaker = "User" if m["sender"] == "user" else "Assistant"
+        lines.append(f"{speaker}: {truncate_to_tokens(m['message'].strip(), MAX_MESSAGE_TOKENS)}")
+    return "\n".join(lines)
+
+
+def get_conversation_context(user_id: int, max_tokens: int = HISTORY_TOKEN_BUDGET) -> str:
+    """
+    Conversation memory for the next prompt: the rolling summary of older turns
+    followed by the last RECENT_TURNS turns, capped at `max_tokens`.
+    Call before the current query is saved so it isn't repeated.
+    """
+    recent = load_recent_messages(user_id, RECENT_TURNS * 2)
+    summary, _ = load_rolling_summary(user_id)
+    if not recent and not summary:
+        return ""
+
+    parts = []
+    if summary:
+        parts.append(f"Earlier in this conversation: {summary}")
+    if recent:
+        # Drop the oldest turns first if the verbatim block doesn't fit
+        budget = max_tokens - estimate_tokens(summary)
+        while recent and estimate_tokens(_format_turns(recent)) > budget:
+            recent = recent[1:]
+        if recent:
+            parts.append(_format_turns(recent))
+    return truncate_to_tokens("\n".join(parts), max_tokens)
+
+
+def update_rolling_summary(user_id: int, summarize_fn: Callable[[str], str]) -> None:
+    """
+    Folds messages that have dropped out of the recent window into the stored
+    summary. Only the previous summary and the newly dropped messages are sent
+    to the model, never the whole chat_history.
+    """
+    summary, through_id = load_rolling_summary(user_id)
+    recent = load_recent_messages(user_id, RECENT_TURNS * 2)
+    if not recent:
+        return
+    window_start = recent[0]["id"]
+
+    sql = """
+        SELECT id, sender, message FROM chat_history
+        WHERE user_id = ? AND id > ? AND id < ?
+        ORDER BY id ASC
+        LIMIT ?
+    """
+    try:
+        with connection() as conn:
+            rows = conn.execute(sql, (user_id, through_id, window_start, FOLD_MAX)).fetchall()
+    except Exception as e:
+        print(f"Error loading messages to summarize: {e}")
+        return
+    if len(rows) < FOLD_BATCH:
+        return
+
+    dropped = [{"id": r[0], "sender": r[1], "message": r[2] or ""} for r in rows]
+    prompt = f"""
+Update the running summary of a conversation between a user and a legal assistant.
+Keep facts, names, document references and open questions. Be brief (under {MEMORY_SUMMARY_TOKENS * 3 // 4} words).
+Output only the updated summary.
+
+## CURRENT SUMMARY
+{summary or 'None yet.'}
+
+## NEW MESSAGES
+{_format_turns(dropped)}
+"""
+    new_summary = summarize_fn(prompt)
+    if not new_summary or new_summary.startswith("[Gemini Error"):
+        return
+    save_rolling_summary(user_id, truncate_to_tokens(new_summary.strip(), MEMORY_SUMMARY_TOKENS), dropped[-1]["id"])
+    print(f"[MEMORY] Folded {len(dropped)} messages into summary for user {user_id}")
+
+
+def schedule_summary_update(user_id: int, summarize_fn: Callable[[str], str]) -> None:
+    """Runs update_rolling_summary in the background (one at a time per user)."""
+    with _updating_lock:
+        if user_id in _updating:
+            return
+        _updating.add(user_id)
+
+    def run():
+        try:
+            with llm_priority(PRIORITY_BACKGROUND):
+                update_rolling_summary(user_id, summarize_fn)
+        except Exception as e:
+            print(f"[MEMORY ERROR] {e}")
+        finally:
+            with _updating_lock:
+                _updating.discard(user_id)
+
+    _memory_pool.submit(run)
@@ -1,6 +1,11 @@
 # courtlistener_tool.py
 import requests
 
+from http_client import get_session
+from precedent_cache import precedent_cache
+from precedent_store import remember
+from provider_scheduler import provider_scheduler, ProviderUnavailable
+
 def search_courtlistener(query: str, limit: int = 5):
     """
     Search U.S. court cases using the CourtListener API.
@@ -12,6 +17,33 @@ def search_courtlistener(query: str, limit: int = 5):
     Returns:
         list[dict]: Structured list of cases (name, court, year, url)
     """
+    try:
+        results = fetch_courtlistener(query, limit)
+
+        if not results:
+            return [{"name": "No cases found.", "url": "", "court": "", "year": "", "confidence": 0}]
+
+        return results
+
+    except ProviderUnavailable as e:
+        print(f"[CourtListener Error] {e}")
+        return [{"name": "CourtListener is temporarily unavailable.", "url": "", "court": "", "year": "", "confidence": 0}]
+
+    except requests.exceptions.RequestException as e:
+        print(f"[CourtListener Error] {e}")
+        return [{"name": f"API Error: {e}", "url": "", "court": "", "year": "", "confidence": 0}]
+
+
+def fetch_courtlistener(query: str, limit: int = 5) -> list[dict]:
+    """Cached, quota-scheduled CourtListener search. Returns [] if nothing matched; raises on errors."""
+    return precedent_cache.get_or_fetch(
+        "courtlistener", query, limit,
+        lambda: remember("courtlistener", provider_scheduler.call("courtlistener", _fetch_courtlistener, query, limit))
+    )
+
+
+def _fetch_courtlistener(query: str, limit: int) -> list[dict]:
+    """Calls the CourtListener search API. Raises on request/HTTP errors; [] if nothing matched."""
     base_url = "https://www.courtlistener.com/api/rest/v3/search/"
     params = {
         "q": query,
@@ -20,32 +52,24 @@ def search_courtlistener(query: str, limit: int = 5):
         "order_by": "score"
     }
 
-    try:
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        results = []
-
-        for case in data.get("results", []):
-            name = case.get("caseName", "Unknown Case")
-            court_name = case.get("court", {}).get("name", "Unknown Court")
-            date_filed = case.get("dateFiled", "Unknown Date")
-            year = date_filed.split("-")[0] if "-" in date_filed else "N/A"
-            url = f"https://www.courtlistener.com{case.get('absolute_url', '')}"
-
-            results.append({
-                "name": name,
-                "court": court_name,
-                "year": year,
-                "url": url,
-                "confidence": 0.95  # Static confidence for now
-            })
+    response = get_session().get(base_url, params=params, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    results = []
 
-        if not results:
-            return [{"name": "No cases found.", "url": "", "court": "", "year": "", "confidence": 0}]
+    for case in data.get("results", []):
+        name = case.get("caseName", "Unknown Case")
+        court_name = case.get("court", {}).get("name", "Unknown Court")
+        date_filed = case.get("dateFiled", "Unknown Date")
+        year = date_filed.split("-")[0] if "-" in date_filed else "N/A"
+        url = f"https://www.courtlistener.com{case.get('absolute_url', '')}"
 
-        return results
+        results.append({
+            "name": name,
+            "court": court_name,
+            "year": year,
+            "url": url,
+            "confidence": 0.95  # Static confidence for now
+        })
 
-    except requests.exceptions.RequestException as e:
-        print(f"[CourtListener Error] {e}")
-        return [{"name": f"API Error: {e}", "url": "", "court": "", "year": "", "confidence": 0}]
+    return results
@@ -1,168 +1,409 @@
 import sqlite3
 import hashlib
+import json
+from concurrent.futures import Future
 from typing import List, Dict, Any, Optional, Tuple
 
+from db import connection, USERS_DB
+from pagination import keyset_page
+from write_behind import write_queue
+
 def hash_password(password: str) -> str:
     """Hashes the password using SHA-256."""
     return hashlib.sha256(password.encode()).hexdigest()
 def db_init() -> None:
     """Initializes the database and creates/alters tables as needed."""
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
+    with connection() as conn:
+        c = conn.cursor()
     
-    # Create users table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL
-        )
-    ''')
+        # Create users table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL
+            )
+        ''')
     
-    # Create chat_history table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS precedents1 (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT,
-            court TEXT,
-            year TEXT,
-            url TEXT,
-            confidence REAL,
-            ai_summary TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    """)
+        # Create chat_history table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+        ''')
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS precedents1 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT,
+                court TEXT,
+                year TEXT,
+                url TEXT,
+                confidence REAL,
+                ai_summary TEXT,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
 
     
 
-    # --- Migration: Add columns if they don't exist ---
+        # --- Migration: Add columns if they don't exist ---
     
-    def add_column(table: str, column: str, col_type: str) -> None:
-        """Helper function to add a column if it doesn't exist."""
-        try:
-            c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
-        except sqlite3.OperationalError as e:
-            if "duplicate column name" not in str(e):
-                raise
+        def add_column(table: str, column: str, col_type: str) -> None:
+            """Helper function to add a column if it doesn't exist."""
+            try:
+                c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    raise
     
-    # Add columns to users table
-    add_column("users", "current_summary_text", "TEXT")
-    add_column("users", "current_pdf_name", "TEXT")
-    # Add columns to chat_history table
-    add_column("chat_history", "sender", "TEXT")
-    add_column("chat_history", "message", "TEXT")
-    add_column("chat_history", "source", "TEXT")
-    add_column("precedents1", "ai_summary", "TEXT")
-
-    # --- END OF MIGRATION ---
-    conn.commit()
-    conn.close()
+        # Add columns to users table
+        add_column("users", "current_summary_text", "TEXT")
+        add_column("users", "current_pdf_name", "TEXT")
+        # Add columns to chat_history table
+        add_column("chat_history", "sender", "TEXT")
+        add_column("chat_history", "message", "TEXT")
+        add_column("chat_history", "source", "TEXT")
+        add_column("precedents1", "ai_summary", "TEXT")
+
+        # --- END OF MIGRATION ---
     print("Database initialized successfully.")
     
 def db_init():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-
-    # USERS table already exists...
-
-    # # 🆕 DOCUMENTS table
-    # c.execute("""
-    #     CREATE TABLE IF NOT EXISTS documents (
-    #         id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #         user_id INTEGER NOT NULL,
-    #         pdf_name TEXT NOT NULL,
-    #         summary TEXT,
-    #         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    #         FOREIGN KEY (user_id) REFERENCES users(id)
-    #     )
-    # """)
-
-    # Precedents table — now linked to document_id
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS precedents1 (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            document_id INTEGER,
-            name TEXT,
-            court TEXT,
-            year TEXT,
-            url TEXT,
-            confidence REAL,
-            ai_summary TEXT,
-            raw_json TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (document_id) REFERENCES documents(id)
+    with connection() as conn:
+        c = conn.cursor()
+
+        # Users and their chat messages (the first db_init above is shadowed by this one,
+        # so these have to be created here for fresh databases)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL,
+                current_summary_text TEXT,
+                current_pdf_name TEXT
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                sender TEXT,
+                message TEXT,
+                source TEXT,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+        ''')
+
+        # # 🆕 DOCUMENTS table
+        # c.execute("""
+        #     CREATE TABLE IF NOT EXISTS documents (
+        #         id INTEGER PRIMARY KEY AUTOINCREMENT,
+        #         user_id INTEGER NOT NULL,
+        #         pdf_name TEXT NOT NULL,
+        #         summary TEXT,
+        #         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        #         FOREIGN KEY (user_id) REFERENCES users(id)
+        #     )
+        # """)
+
+        # Precedents table — now linked to document_id
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS precedents1 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                document_id INTEGER,
+                name TEXT,
+                court TEXT,
+                year TEXT,
+                url TEXT,
+                confidence REAL,
+                ai_summary TEXT,
+                raw_json TEXT,
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                FOREIGN KEY (document_id) REFERENCES documents(id)
             
-        )
-    """)
+            )
+        """)
+
+         # Try to add new column if old DB exists
+        try:
+            c.execute("ALTER TABLE precedents1 ADD COLUMN raw_json TEXT")
+        except sqlite3.OperationalError:
+            pass  # already exists
 
-     # Try to add new column if old DB exists
-    try:
-        c.execute("ALTER TABLE precedents1 ADD COLUMN raw_json TEXT")
-    except sqlite3.OperationalError:
-        pass  # already exists
+        # Fact-check results, keyed by the assistant message they verify
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS fact_check_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                statement TEXT,
+                supported BOOLEAN,
+                confidence REAL,
+                evidence TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+        """)
+        try:
+            c.execute("ALTER TABLE fact_check_history ADD COLUMN message_id INTEGER")
+        except sqlite3.OperationalError:
+            pass  # already exists
+        try:
+            c.execute("ALTER TABLE fact_check_history ADD COLUMN result_id INTEGER")
+        except sqlite3.OperationalError:
+            pass  # already exists
+
+        # Memoized fact-check results, shared by every history row with the same
+        # (answer, evidence) hash — see fact_checker.fact_check_key
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS fact_check_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                result_hash TEXT UNIQUE NOT NULL,
+                results_json TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Precedents shown to each user, one row per case, linked to the run that produced them
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS precedents2 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                title TEXT,
+                court TEXT,
+                year TEXT,
+                url TEXT,
+                confidence REAL,
+                ai_summary TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
+        try:
+            c.execute("ALTER TABLE precedents2 ADD COLUMN run_id INTEGER")
+        except sqlite3.OperationalError:
+            pass  # already exists
 
-    conn.commit()
-    conn.close()
+        # Memoized precedent pipeline output per (document hash, pipeline version, query)
+        # — see precedent_memo.py
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS precedent_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_hash TEXT NOT NULL,
+                pipeline_version TEXT NOT NULL,
+                query_hash TEXT NOT NULL DEFAULT '',
+                ai_summary TEXT,
+                results_json TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (doc_hash, pipeline_version, query_hash)
+            )
+        """)
+
+        # Content hash of the user's current document
+        try:
+            c.execute("ALTER TABLE users ADD COLUMN current_doc_hash TEXT")
+        except sqlite3.OperationalError:
+            pass  # already exists (or users not created yet)
+
+        # Rolling conversation summary per user (see conversation_memory.py)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_memory (
+                user_id INTEGER PRIMARY KEY,
+                summary TEXT,
+                summarized_through_id INTEGER DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
+    apply_migrations()
     print("Database initialized successfully.1")
 
+
+# Schema changes applied once each, in order; PRAGMA user_version records how
+# many have run. Append new steps, never edit or reorder applied ones.
+MIGRATIONS: List[List[str]] = [
+    # 1: per-user history lookups (load_chat_history, conversation_memory,
+    #    load_precedents2, precedent_memo, fact-check history) without full scans
+    [
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_time ON chat_history(user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_id ON chat_history(user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_precedents2_user_created ON precedents2(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_precedents2_user_run ON precedents2(user_id, run_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_fact_check_user_time ON fact_check_history(user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_fact_check_user_message ON fact_check_history(user_id, message_id)",
+        "ANALYZE",
+    ],
+    # 2: version stamp for the current document summary, used as its ETag / Last-Modified
+    [
+        "ALTER TABLE users ADD COLUMN summary_version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN summary_updated_at DATETIME",
+    ],
+    # 3: the AI summary of a precedent search lives once in precedent_runs;
+    #    drop the per-row copies precedents2 used to carry
+    [
+        "UPDATE precedents2 SET ai_summary = NULL WHERE run_id IN (SELECT id FROM precedent_runs)",
+    ],
+]
+
+
+def apply_migrations(db_path: str = USERS_DB) -> int:
+    """Runs the MIGRATIONS not yet applied to db_path, each in its own transaction. Returns the schema version."""
+    version = 0
+    for number, statements in enumerate(MIGRATIONS, start=1):
+        # BEGIN IMMEDIATE + re-reading the version keeps concurrent workers from applying a step twice
+        with connection(db_path, immediate=True) as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= number:
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {number}")
+            version = number
+        print(f"[DB] Applied schema migration {number}")
+    return version
+
 import sqlite3
 
-def save_fact_check_results(user_id: int, fact_results: list[dict]) -> None:
-    """Save fact-checking results into the database."""
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
+def save_fact_check_results(user_id: int, fact_results: list[dict], message_id: Optional[int] = None,
+                            result_hash: Optional[str] = None) -> Optional[Future]:
+    """
+    Queue fact-checking results for the write-behind writer (see write_behind.py).
+    With a result_hash the results are stored once in fact_check_results and the
+    history row only points at them; without one, one row per statement is written.
+    Returns the future of the last queued write (None if there was nothing to save).
+    """
+    rows = [item for item in fact_results if "statement" in item]
+    if result_hash:
+        write_queue.submit(
+            "INSERT OR IGNORE INTO fact_check_results (result_hash, results_json) VALUES (?, ?)",
+            [(result_hash, json.dumps(rows))],
+        )
+        future = write_queue.submit(
+            "INSERT INTO fact_check_history (user_id, message_id, result_id) "
+            "VALUES (?, ?, (SELECT id FROM fact_check_results WHERE result_hash = ?))",
+            [(user_id, message_id, result_hash)],
+        )
+        print(f"[DB] Queued {len(rows)} fact check results for user {user_id} (result {result_hash[:12]})")
+        return future
+
+    if not rows:
+        return None
+    future = write_queue.submit('''
+        INSERT INTO fact_check_history (user_id, message_id, statement, supported, confidence, evidence)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(
+        user_id,
+        message_id,
+        item.get("statement", ""),
+        int(item.get("supported", False)),  # store as 0/1
+        float(item.get("confidence", 0.0)),
+        item.get("evidence", "")
+    ) for item in rows])
+    print(f"[DB] Queued {len(rows)} fact check results for user {user_id}")
+    return future
+
+
+def load_cached_fact_check(result_hash: str) -> Optional[list[dict]]:
+    """Memoized results for a fact_checker.fact_check_key hash, or None."""
+    with connection() as conn:
+        row = conn.execute("SELECT results_json FROM fact_check_results WHERE result_hash=?",
+                           (result_hash,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _expand_fact_rows(rows) -> list[dict]:
+    """
+    Turns fact_check_history rows into result dicts. Rows pointing at a shared
+    fact_check_results entry expand into its statements; older rows carry their own.
+    """
+    history = []
+    for statement, supported, confidence, evidence, timestamp, results_json in rows:
+        if results_json:
+            for item in json.loads(results_json):
+                history.append({
+                    "statement": item.get("statement", ""),
+                    "supported": bool(item.get("supported", False)),
+                    "confidence": item.get("confidence", 0.0),
+                    "evidence": item.get("evidence", ""),
+                    "reference": item.get("reference", ""),
+                    "timestamp": timestamp
+                })
+        elif statement is not None:
+            history.append({
+                "statement": statement,
+                "supported": bool(supported),
+                "confidence": confidence,
+                "evidence": evidence,
+                "timestamp": timestamp
+            })
+    return history
 
-    for item in fact_results:
-        if "statement" not in item:
-            continue
-        c.execute('''
-            INSERT INTO fact_check_history (user_id, statement, supported, confidence, evidence)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            item.get("statement", ""),
-            int(item.get("supported", False)),  # store as 0/1
-            float(item.get("confidence", 0.0)),
-            item.get("evidence", "")
-        ))
-    conn.commit()
-    conn.close()
-    print(f"[DB] ✅ Saved {len(fact_results)} fact check results for user {user_id}")
 
 def load_fact_check_history(user_id: int) -> list[dict]:
     """Retrieve all fact-check history for a user."""
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute('''
-        SELECT statement, supported, confidence, evidence, timestamp
-        FROM fact_check_history
-        WHERE user_id=?
-        ORDER BY timestamp DESC
-    ''', (user_id,))
-    rows = c.fetchall()
-    conn.close()
-
-    return [
-        {
-            "statement": row[0],
-            "supported": bool(row[1]),
-            "confidence": row[2],
-            "evidence": row[3],
-            "timestamp": row[4]
-        }
-        for row in rows
-    ]
+    with connection() as conn:
+        rows = conn.execute('''
+            SELECT h.statement, h.supported, h.confidence, h.evidence, h.timestamp, r.results_json
+            FROM fact_check_history h
+            LEFT JOIN fact_check_results r ON r.id = h.result_id
+            WHERE h.user_id=?
+            ORDER BY h.timestamp DESC
+        ''', (user_id,)).fetchall()
+    return _expand_fact_rows(rows)
+
+
+def load_fact_check_page(user_id: int, before: Optional[Tuple[str, int]], limit: int) -> Tuple[list[dict], Optional[str]]:
+    """
+    Fact-check history newest first, `limit` history rows (fact-check runs)
+    per page, starting just before the `before` (timestamp, id) cursor
+    position. Returns (results, next_cursor).
+    """
+    sql = '''
+        SELECT h.id, h.statement, h.supported, h.confidence, h.evidence, h.timestamp, r.results_json
+        FROM fact_check_history h
+        LEFT JOIN fact_check_results r ON r.id = h.result_id
+        WHERE h.user_id=?
+    '''
+    params: list = [user_id]
+    if before:
+        sql += " AND (h.timestamp, h.id) < (?, ?)"
+        params += list(before)
+    sql += " ORDER BY h.timestamp DESC, h.id DESC LIMIT ?"
+    params.append(limit + 1)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    rows, next_cursor = keyset_page(rows, limit, lambda r: r[5], lambda r: r[0])
+    return _expand_fact_rows([row[1:] for row in rows]), next_cursor
+
+
+def fact_check_version(user_id: int) -> Tuple[Optional[int], Optional[str]]:
+    """(id, timestamp) of the user's newest fact-check row; the history is append-only."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT id, timestamp FROM fact_check_history WHERE user_id=? ORDER BY timestamp DESC, id DESC LIMIT 1",
+            (user_id,),
+        ).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def load_fact_check_results(user_id: int, message_id: int) -> list[dict]:
+    """Retrieve the fact-check results saved for one assistant message."""
+    with connection() as conn:
+        rows = conn.execute('''
+            SELECT h.statement, h.supported, h.confidence, h.evidence, h.timestamp, r.results_json
+            FROM fact_check_history h
+            LEFT JOIN fact_check_results r ON r.id = h.result_id
+            WHERE h.user_id=? AND h.message_id=?
+            ORDER BY h.id ASC
+        ''', (user_id, message_id)).fetchall()
+    return _expand_fact_rows(rows)
 
 
 if __name__ == '__main__':
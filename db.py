@@ -0,0 +1,111 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+USERS_DB = os.getenv("USERS_DB", "users.db")
+# Idle connections kept open per database file.
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# How long a writer waits for the lock before "database is locked" is raised.
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+
+_idle: Dict[str, "queue.LifoQueue[sqlite3.Connection]"] = {}
+_idle_lock = threading.Lock()
+_local = threading.local()
+_stats = {"opened": 0, "reused": 0, "closed": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(field: str) -> None:
+    with _stats_lock:
+        _stats[field] += 1
+
+
+def _open(db_path: str) -> sqlite3.Connection:
+    # check_same_thread=False: a pooled connection moves between threads, but
+    # only ever belongs to the one thread that has it checked out.
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    # WAL lets readers run alongside the single writer; NORMAL is durable
+    # across application crashes (only an OS crash can lose the last commits).
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    _count("opened")
+    return conn
+
+
+def _idle_queue(db_path: str) -> "queue.LifoQueue[sqlite3.Connection]":
+    with _idle_lock:
+        if db_path not in _idle:
+            _idle[db_path] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return _idle[db_path]
+
+
+def _checkout(db_path: str) -> sqlite3.Connection:
+    try:
+        conn = _idle_queue(db_path).get_nowait()
+        _count("reused")
+        return conn
+    except queue.Empty:
+        return _open(db_path)
+
+
+def _checkin(db_path: str, conn: sqlite3.Connection) -> None:
+    try:
+        _idle_queue(db_path).put_nowait(conn)
+    except queue.Full:
+        conn.close()
+        _count("closed")
+
+
+@contextmanager
+def connection(db_path: str = USERS_DB, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    Drop-in for `with sqlite3.connect(path) as conn:` backed by the pool:
+    commits on success, rolls back on error, and hands the connection back
+    instead of closing it. Nested blocks on the same thread share the outer
+    connection and transaction. immediate=True takes the write lock up front
+    (BEGIN IMMEDIATE), so read-then-write sequences wait on the busy timeout
+    instead of failing with "database is locked" halfway through.
+    """
+    active = getattr(_local, "active", None)
+    if active is None:
+        active = _local.active = {}
+    if db_path in active:
+        conn, depth = active[db_path]
+        active[db_path] = (conn, depth + 1)
+        try:
+            yield conn
+        finally:
+            active[db_path] = (conn, depth)
+        return
+
+    conn = _checkout(db_path)
+    active[db_path] = (conn, 1)
+    try:
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        del active[db_path]
+        _checkin(db_path, conn)
+
+
+def pool_stats() -> Dict[str, int]:
+    """Connections opened, reused from the pool and closed for overflow since startup."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    with _idle_lock:
+        snapshot["idle"] = sum(q.qsize() for q in _idle.values())
+    return snapshot
@@ -0,0 +1,143 @@
+import os
+import re
+from typing import List, Union
+
+import numpy as np
+
+from rate_limiter import estimate_tokens
+from tools import get_embeddings
+
+# Token budget for the evidence block of a fact-check prompt.
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "1200"))
+# Per claim, the best few sentences are always kept before filling the rest by score.
+TOP_PER_CLAIM = 2
+
+
+# A period after these doesn't end a sentence ("Puttaswamy v. Union of India",
+# "Appeal No. 5", "Art. 21", "s. 420", "XYZ Pvt. Ltd."). Single letters (initials) count too.
+ABBREVIATIONS = {
+    "v", "vs", "no", "nos", "art", "arts", "s", "ss", "sec", "secs", "cl", "para", "paras", "r", "o",
+    "ltd", "pvt", "co", "corp", "inc", "bros", "ors", "anr", "j", "jj", "cj", "mr", "mrs", "ms", "dr",
+    "smt", "shri", "sri", "st", "vol", "pp", "p", "cr", "crl", "civ", "misc", "govt", "dept", "i.e", "e.g",
+}
+# Paragraph breaks: blank lines, or a line break before a bullet / numbered item.
+_BLOCK_BREAK_RE = re.compile(r"\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)")
+_SENTENCE_END_RE = re.compile(r"[.!?]\s+")
+_LAST_WORD_RE = re.compile(r"([A-Za-z][A-Za-z.']*)\.$")
+
+
+def _ends_with_abbreviation(text: str) -> bool:
+    match = _LAST_WORD_RE.search(text)
+    if not match:
+        return False
+    word = match.group(1).lower()
+    return len(word) == 1 or word in ABBREVIATIONS
+
+
+def _split_block(block: str) -> List[str]:
+    parts, start = [], 0
+    for match in _SENTENCE_END_RE.finditer(block):
+        end = match.start() + 1
+        if block[match.start()] == "." and _ends_with_abbreviation(block[start:end]):
+            continue
+        parts.append(block[start:end])
+        start = match.end()
+    parts.append(block[start:])
+    return parts
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Splits text into sentences / bullet items, stripping markdown markers.
+    Single line breaks (PDF layout) are joined; paragraphs split on blank lines
+    or list items, and sentences not after legal abbreviations.
+    """
+    text = (text or "").replace("\r\n", "\n").replace("\r", "\n")
+    sentences = []
+    for block in _BLOCK_BREAK_RE.split(text):
+        block = re.sub(r"\s*\n\s*", " ", block.strip())
+        for part in _split_block(block):
+            part = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", part)
+            part = part.replace("**", "").replace("`", "").strip()
+            if part:
+                sentences.append(part)
+    return sentences
+
+
+def normalize_chunks(retrieved_chunks: List[Union[str, dict]]) -> List[dict]:
+    """Accepts plain strings or tools.chunk_reference dicts; always returns dicts."""
+    chunks = []
+    for i, chunk in enumerate(retrieved_chunks):
+        if isinstance(chunk, dict):
+            chunks.append(chunk)
+        else:
+            chunks.append({"text": str(chunk), "page": None, "source": "", "chunk_id": f"chunk-{i + 1}"})
+    return chunks
+
+
+def chunk_label(chunk: dict) -> str:
+    """Short citation label, e.g. 'p.4 · abc123'."""
+    parts = []
+    if chunk.get("page"):
+        parts.append(f"p.{chunk['page']}")
+    if chunk.get("chunk_id"):
+        parts.append(str(chunk["chunk_id"])[:12])
+    return " · ".join(parts) or "evidence"
+
+
+def evidence_sentences(chunks: List[dict]) -> List[dict]:
+    """Every sentence of the evidence, carrying its chunk reference and document order."""
+    sentences = []
+    for c_index, chunk in enumerate(chunks):
+        for s_index, text in enumerate(split_sentences(chunk.get("text", ""))):
+            if len(text.split()) < 3:
+                continue
+            sentences.append({
+                "text": text,
+                "ref": chunk_label(chunk),
+                "chunk_id": chunk.get("chunk_id"),
+                "page": chunk.get("page"),
+                "order": (c_index, s_index),
+            })
+    return sentences
+
+
+def similarity_matrix(claims: List[str], sentences: List[dict]) -> np.ndarray:
+    """Cosine similarity of every claim (rows) against every evidence sentence (columns)."""
+    embeddings = get_embeddings()
+    claim_vecs = np.asarray(embeddings.embed_documents(claims), dtype=float)
+    sentence_vecs = np.asarray(embeddings.embed_documents([s["text"] for s in sentences]), dtype=float)
+    claim_vecs /= np.linalg.norm(claim_vecs, axis=1, keepdims=True) + 1e-9
+    sentence_vecs /= np.linalg.norm(sentence_vecs, axis=1, keepdims=True) + 1e-9
+    return claim_vecs @ sentence_vecs.T
+
+
+def select_evidence(similarity: np.ndarray, sentences: List[dict], max_tokens: int = EVIDENCE_TOKEN_BUDGET) -> List[dict]:
+    """
+    Keeps the evidence sentences most similar to the claims (rows of `similarity`)
+    within `max_tokens`. Each claim's best TOP_PER_CLAIM sentences go first, then
+    the rest by their best score. Returned in document order.
+    """
+    if similarity.size == 0 or not sentences:
+        return []
+    best_score = similarity.max(axis=0)
+    priority = []
+    for row in similarity:
+        priority.extend(int(j) for j in np.argsort(-row)[:TOP_PER_CLAIM])
+    priority.extend(int(j) for j in np.argsort(-best_score))
+
+    kept, used = {}, 0
+    for j in priority:
+        if j in kept:
+            continue
+        cost = estimate_tokens(sentences[j]["text"]) + 6
+        if used + cost > max_tokens:
+            continue
+        kept[j] = dict(sentences[j], score=round(float(best_score[j]), 3))
+        used += cost
+    return sorted(kept.values(), key=lambda s: s["order"])
+
+
+def format_evidence(selected: List[dict]) -> str:
+    """One sentence per line, prefixed with its [reference] label."""
+    return "\n".join(f"[{s['ref']}] {s['text']}" for s in selected)
@@ -0,0 +1,93 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from database import save_fact_check_results, load_fact_check_results, load_cached_fact_check
+from fact_checker import fact_checker_agent, fact_check_key
+from rate_limiter import llm_priority, PRIORITY_BACKGROUND
+from tools import retrieve_legal_context_with_chunks
+
+# Finished jobs stay in memory this long; after that results come from the DB.
+JOB_RETENTION_SECONDS = 15 * 60
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+
+_fact_check_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fact-check")
+_jobs: Dict[int, Dict[str, Any]] = {}
+_jobs_lock = threading.Lock()
+
+
+def _set_job(message_id: int, **fields) -> None:
+    with _jobs_lock:
+        _jobs.setdefault(message_id, {}).update(fields, updated=time.time())
+
+
+def _prune_jobs() -> None:
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with _jobs_lock:
+        for message_id in [m for m, job in _jobs.items()
+                           if job["status"] != STATUS_PENDING and job["updated"] < cutoff]:
+            del _jobs[message_id]
+
+
+def _run_fact_check(message_id: int, user_id: int, query: str, answer: str, db_path: str, prefetch=None) -> None:
+    try:
+        retrieved_chunks = prefetch.get_chunks(query, persist_dir=db_path) if prefetch is not None else None
+        if retrieved_chunks is None:
+            _, retrieved_chunks = retrieve_legal_context_with_chunks(query, persist_dir=db_path)
+        retrieved_chunks = retrieved_chunks[:5]
+
+        if not retrieved_chunks:
+            print("[FACT CHECK] Skipped: no retrieved context.")
+            _set_job(message_id, status=STATUS_SKIPPED, results=[{"error": "No valid evidence for fact check."}])
+            return
+
+        # Same answer against the same evidence: reuse the memoized result
+        result_hash = fact_check_key(answer, retrieved_chunks)
+        cached = load_cached_fact_check(result_hash)
+        if cached is not None:
+            print(f"[FACT CHECK] Cache hit for message {message_id}")
+            save_fact_check_results(user_id, cached, message_id, result_hash=result_hash)
+            _set_job(message_id, status=STATUS_DONE, results=cached)
+            return
+
+        print(f"[FACT CHECK] Running for message {message_id}: {query[:60]}...")
+        with llm_priority(PRIORITY_BACKGROUND):
+            fact_results = fact_checker_agent(answer, retrieved_chunks)
+        if fact_results and isinstance(fact_results, list):
+            # Errors (e.g. an unparseable Gemini reply, unverified claims) are not memoized
+            failed = any("statement" not in item or "error" in item for item in fact_results)
+            save_fact_check_results(user_id, fact_results, message_id,
+                                    result_hash=None if failed else result_hash)
+        _set_job(message_id, status=STATUS_DONE, results=fact_results or [])
+    except Exception as e:
+        print(f"[FACT CHECK ERROR] {e}")
+        _set_job(message_id, status=STATUS_ERROR, results=[{"error": f"Fact check failed: {e}"}])
+
+
+def submit_fact_check(message_id: int, user_id: int, query: str, answer: str, db_path: str, prefetch=None) -> str:
+    """Queues a fact check of `answer` for the given assistant message and returns its status."""
+    _prune_jobs()
+    _set_job(message_id, status=STATUS_PENDING, user_id=user_id, results=[])
+    _fact_check_pool.submit(_run_fact_check, message_id, user_id, query, answer, db_path, prefetch)
+    return STATUS_PENDING
+
+
+def get_fact_check(user_id: int, message_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Status and results of a fact check, or None if the message has none.
+    Falls back to the saved rows once the in-memory job has been pruned.
+    """
+    with _jobs_lock:
+        job = dict(_jobs.get(message_id) or {})
+    if job and job.get("user_id") == user_id:
+        return {"message_id": message_id, "status": job["status"], "fact_check": job["results"]}
+
+    results: List[dict] = load_fact_check_results(user_id, message_id)
+    if results:
+        return {"message_id": message_id, "status": STATUS_DONE, "fact_check": results}
+    return None
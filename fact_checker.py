@@ -11,7 +11,7 @@
 # # You can switch models if needed
 # MODEL = "gemini-2.5-flash"  # or "gemini-2.0-flash", "gemini-pro"
 
-# def fact_checker_agent(answer: str, retrieved_chunks: list[str]) -> list[dict]:
+# def fact_checker_agent(answer: str, retrieved_chunks: list) -> list[dict]:
 #     """
 #     Fact-check the overall assistant answer against retrieved evidence,
 #     rather than breaking it into sub-statements.
@@ -70,10 +70,20 @@
 #         return [{"error": f"Fact-checking failed: {e}"}]
 
 import os
+import hashlib
 import json
 import re
+import threading
+from functools import lru_cache
+import numpy as np
 from dotenv import load_dotenv
 import google.generativeai as genai
+from evidence_selector import (
+    split_sentences, normalize_chunks, chunk_label, evidence_sentences,
+    similarity_matrix, select_evidence, format_evidence,
+)
+from rate_limiter import gemini_limiter, estimate_tokens, PRIORITY_BACKGROUND
+from prompt_builder import log_prompt_tokens
 
 # Load Gemini API Key
 load_dotenv()
@@ -84,6 +94,9 @@ MODEL = "gemini-2.5-flash"
 # -------------------------
 # Helper: Remove trivial/greeting lines
 # -------------------------
+# Whole-word match so words like "this" or "which" don't count as "hi"
+GREETING_RE = re.compile(r"\b(hello|hi|hey|good morning|good evening|how can i help|how can i assist)\b")
+
 def _filter_trivial_sentences(text: str) -> str:
     """
     Remove greetings, short fillers, and trivial lines from the assistant answer
@@ -93,10 +106,7 @@ def _filter_trivial_sentences(text: str) -> str:
     useful = []
     for ln in lines:
         lower = ln.lower()
-        if any(word in lower for word in [
-            "hello", "hi", "hey", "good morning", "good evening", 
-            "how can i help", "how can i assist"
-        ]):
+        if GREETING_RE.search(lower):
             continue
         if len(ln.split()) <= 3:
             continue
@@ -104,16 +114,152 @@ def _filter_trivial_sentences(text: str) -> str:
     return "\n\n".join(useful) if useful else text
 
 
+# -------------------------
+# Local tier: claim splitting + embedding / NLI scoring
+# -------------------------
+# Without an NLI verdict, a claim is settled locally as supported only if its
+# best evidence sentence scores at least this cosine similarity AND contains
+# every word of the claim with the same negations (near-verbatim). Similarity
+# alone can't tell "X is entitled" from "X is not entitled".
+LOCAL_SUPPORT_THRESHOLD = float(os.getenv("FACT_CHECK_LOCAL_THRESHOLD", "0.85"))
+# Optional small CPU NLI cross-encoder, e.g. "cross-encoder/nli-deberta-v3-xsmall".
+NLI_MODEL = os.getenv("FACT_CHECK_NLI_MODEL", "")
+NLI_THRESHOLD = 0.8
+
+NEGATION_WORDS = {"not", "no", "never", "nor", "neither", "cannot", "without", "nothing", "none", "nt"}
+
+_local_stats = {"claims": 0, "settled_locally": 0}
+_stats_lock = threading.Lock()
+
+
+def split_claims(answer: str) -> list[str]:
+    """Factual claims of an answer: sentences of 4+ words that aren't greetings."""
+    return [s for s in split_sentences(_filter_trivial_sentences(answer))
+            if len(s.split()) >= 4 and not GREETING_RE.search(s.lower())]
+
+
+@lru_cache(maxsize=1)
+def _load_nli_model():
+    from sentence_transformers import CrossEncoder
+    model = CrossEncoder(NLI_MODEL, device="cpu")
+    id2label = getattr(getattr(model, "config", None) or model.model.config, "id2label", {})
+    labels = {str(v).lower(): int(k) for k, v in id2label.items()}
+    return model, labels
+
+
+def _nli_scores(pairs: list[tuple[str, str]]) -> list[dict]:
+    """Entailment / contradiction probabilities for (evidence, claim) pairs."""
+    model, labels = _load_nli_model()
+    logits = np.atleast_2d(np.asarray(model.predict(pairs)))
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probs = probs / probs.sum(axis=1, keepdims=True)
+    return [{
+        "entailment": float(row[labels.get("entailment", 1)]),
+        "contradiction": float(row[labels.get("contradiction", 0)]),
+    } for row in probs]
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9]+", text.lower().replace("n't", " nt")))
+
+
+def is_near_exact(claim: str, sentence: str) -> bool:
+    """True if every word of the claim appears in the sentence and both carry the same negations."""
+    claim_words, sentence_words = _words(claim), _words(sentence)
+    return claim_words <= sentence_words and claim_words & NEGATION_WORDS == sentence_words & NEGATION_WORDS
+
+
+def local_fact_check(claims: list[str], sentences: list[dict], similarity: np.ndarray) -> tuple[list[dict], list[int]]:
+    """
+    Settles claims using the optional NLI model on each claim's best evidence
+    sentence; without an NLI verdict only near-verbatim claims are settled.
+    Returns (settled results, row indexes of claims that still need Gemini).
+    """
+    if not claims or not sentences:
+        return [], list(range(len(claims)))
+    best = similarity.argmax(axis=1)
+
+    nli = None
+    if NLI_MODEL:
+        try:
+            nli = _nli_scores([(sentences[j]["text"], claim) for claim, j in zip(claims, best)])
+        except Exception as e:
+            print(f"[FACT CHECK] NLI model unavailable, using similarity only: {e}")
+
+    settled, unresolved = [], []
+    for i, claim in enumerate(claims):
+        sentence = sentences[int(best[i])]
+        score = float(similarity[i, best[i]])
+        supported = {"statement": claim, "supported": True, "evidence": sentence["text"][:200],
+                     "reference": sentence["ref"]}
+        if nli and nli[i]["entailment"] >= NLI_THRESHOLD:
+            settled.append(dict(supported, confidence=round(nli[i]["entailment"], 2)))
+        elif nli and nli[i]["contradiction"] >= NLI_THRESHOLD:
+            settled.append({"statement": claim, "supported": False,
+                            "confidence": round(nli[i]["contradiction"], 2),
+                            "evidence": "NO SUPPORT IN RETRIEVED EVIDENCE", "reference": sentence["ref"]})
+        elif score >= LOCAL_SUPPORT_THRESHOLD and is_near_exact(claim, sentence["text"]):
+            settled.append(dict(supported, confidence=round(score, 2)))
+        else:
+            unresolved.append(i)
+    return settled, unresolved
+
+
+def get_local_tier_stats() -> dict:
+    """Share of claims settled by the local tier since startup."""
+    with _stats_lock:
+        claims, local = _local_stats["claims"], _local_stats["settled_locally"]
+    return {"claims": claims, "settled_locally": local,
+            "local_share": round(local / claims, 3) if claims else 0.0}
+
+
+def _record_local_share(total: int, local: int) -> None:
+    with _stats_lock:
+        _local_stats["claims"] += total
+        _local_stats["settled_locally"] += local
+    overall = get_local_tier_stats()["local_share"]
+    print(f"[FACT CHECK] Settled {local}/{total} claims locally (overall {overall:.0%})")
+
+
+# -------------------------
+# Memoization key
+# -------------------------
+# Bump when the checking logic changes so old memoized results stop matching.
+FACT_CHECK_CACHE_VERSION = "4"
+
+
+def fact_check_key(answer: str, retrieved_chunks: list) -> str:
+    """
+    Hash of the normalized answer and the ids of the evidence chunks.
+    Identical answers checked against the same evidence get the same key.
+    """
+    normalized = re.sub(r"\s+", " ", re.sub(r"[*`#>]", "", answer or "")).strip().lower()
+    chunk_ids = []
+    for chunk in retrieved_chunks[:8]:
+        chunk_id = chunk.get("chunk_id") if isinstance(chunk, dict) else None
+        text = chunk.get("text", "") if isinstance(chunk, dict) else str(chunk)
+        chunk_ids.append(str(chunk_id or hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]))
+    chunk_ids.sort()
+    payload = json.dumps([FACT_CHECK_CACHE_VERSION, MODEL, LOCAL_SUPPORT_THRESHOLD, NLI_MODEL,
+                          normalized, chunk_ids])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 # -------------------------
 # Main Function
 # -------------------------
-def fact_checker_agent(answer: str, retrieved_chunks: list[str]) -> list[dict]:
+def fact_checker_agent(answer: str, retrieved_chunks: list) -> list[dict]:
     """
-    Runs Gemini-based fact-checking on the full assistant answer as one unit.
+    Fact-checks the assistant answer against the retrieved evidence.
+
+    Claims that the local tier can settle (near-verbatim matches, or confident
+    NLI verdicts) are answered on CPU; only the remaining low-confidence claims
+    are sent to Gemini, together with the evidence sentences closest to them.
 
     Args:
         answer (str): Assistant's final full response.
-        retrieved_chunks (list[str]): List of evidence text chunks from RAG.
+        retrieved_chunks (list): Evidence chunks from RAG, as plain strings or
+            tools.chunk_reference dicts (which add page / chunk references).
 
     Returns:
         list[dict]: Structured fact-checking results:
@@ -122,7 +268,8 @@ def fact_checker_agent(answer: str, retrieved_chunks: list[str]) -> list[dict]:
                     "statement": "...",
                     "supported": True/False,
                     "confidence": 0.00–1.00,
-                    "evidence": "..."
+                    "evidence": "...",
+                    "reference": "p.4 · chunk id"   # where the evidence quote comes from
                 }
             ]
     """
@@ -134,12 +281,48 @@ def fact_checker_agent(answer: str, retrieved_chunks: list[str]) -> list[dict]:
     if not retrieved_chunks:
         return [{"error": "No evidence chunks found to verify facts."}]
 
-    # Prepare evidence (keep top 8 chunks to avoid prompt overflow)
-    evidence_text = "\n\n".join(retrieved_chunks[:8])
-
-    # Clean the answer (remove greetings etc.)
-    cleaned_answer = _filter_trivial_sentences(answer)
+    chunks = normalize_chunks(retrieved_chunks[:8])
+    sentences = evidence_sentences(chunks)
+    claims = split_claims(answer)
 
+    similarity = None
+    settled, unresolved = [], list(range(len(claims)))
+    if claims and sentences:
+        try:
+            similarity = similarity_matrix(claims, sentences)
+            settled, unresolved = local_fact_check(claims, sentences, similarity)
+        except Exception as e:
+            print(f"[FACT CHECK] Local tier failed, sending everything to Gemini: {e}")
+    if claims:
+        _record_local_share(len(claims), len(settled))
+        if not unresolved:
+            return settled
+
+    # Only the claims the local tier couldn't settle go to Gemini, with the
+    # evidence pruned to the sentences closest to those claims.
+    if claims:
+        cleaned_answer = "\n".join(claims[i] for i in unresolved)
+    else:
+        cleaned_answer = _filter_trivial_sentences(answer)
+    if similarity is not None:
+        selected = select_evidence(similarity[unresolved], sentences)
+        evidence_text = format_evidence(selected)
+        print(f"[FACT CHECK] Evidence pruned to {len(selected)}/{len(sentences)} sentences")
+    else:
+        evidence_text = "\n\n".join(f"[{chunk_label(c)}] {c['text']}" for c in chunks)
+
+    gemini_results = _gemini_fact_check(cleaned_answer, evidence_text)
+    if settled and gemini_results and "error" in gemini_results[0]:
+        # Keep the unresolved claims visible as unverified; the error entries
+        # also stop this partial result from being memoized
+        error = gemini_results[0]["error"]
+        return settled + [{"statement": claims[i], "supported": None, "confidence": 0.0,
+                           "evidence": "UNVERIFIED", "error": error} for i in unresolved]
+    return settled + gemini_results
+
+
+def _gemini_fact_check(cleaned_answer: str, evidence_text: str) -> list[dict]:
+    """Runs Gemini-based fact-checking on the given answer text."""
     # Prompt for Gemini
     prompt = f"""
 You are a FACT-CHECKER specializing in **Indian legal content**.
@@ -152,7 +335,8 @@ are supported by the provided EVIDENCE (retrieved from legal documents or judgme
 2️⃣ Identify only meaningful factual statements (ignore greetings or opinion words).
 3️⃣ For each factual statement:
      - Determine whether it is **supported** by the evidence.
-     - If supported, include a short direct quote from the evidence (<=200 chars).
+     - If supported, include a short direct quote from the evidence (<=200 chars)
+       and copy the [reference] label of the line it comes from.
      - If unsupported, write "NO SUPPORT IN RETRIEVED EVIDENCE".
      - Provide a confidence score between 0.00 and 1.00.
 4️⃣ Return valid JSON **only**, in this structure:
@@ -162,14 +346,15 @@ are supported by the provided EVIDENCE (retrieved from legal documents or judgme
     "statement": "...",
     "supported": true/false,
     "confidence": 0.00,
-    "evidence": "..."
+    "evidence": "...",
+    "reference": "..."
   }}
 ]
 
 ### ASSISTANT ANSWER
 {cleaned_answer}
 
-### EVIDENCE (retrieved legal context)
+### EVIDENCE (retrieved legal context, one [reference] per line)
 {evidence_text}
 
 Important:
@@ -178,8 +363,10 @@ Important:
 """
 
     try:
-        model = genai.GenerativeModel(MODEL)
-        response = model.generate_content(prompt)
+        log_prompt_tokens("fact_check", prompt)
+        with gemini_limiter.acquire(tokens=estimate_tokens(prompt), priority=PRIORITY_BACKGROUND):
+            model = genai.GenerativeModel(MODEL)
+            response = model.generate_content(prompt)
         raw_output = response.text.strip()
 
         # Strip ```json fences if model wraps output
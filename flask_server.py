@@ -12,46 +12,84 @@ from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any, List, Tuple
 import fitz
-import requests
 from flask import request, jsonify
 from langchain_community.tools import DuckDuckGoSearchRun
 import warnings
 warnings.filterwarnings("ignore", message="PydanticSerializationUnexpectedValue")
 from auth import (
     add_user, check_user,
-    save_chat_message, load_chat_history,
-    save_document_summary, load_document_summary
+    save_chat_message, queue_chat_message, load_chat_page, chat_history_version,
+    save_document_summary, load_document_summary, load_document_hash, load_summary_version
 )
-from fact_checker import fact_checker_agent
 from rag_index_builder import build_index_from_pdf
 from tools import retrieve_legal_context
 from web_search_tool import search_web
 from database import db_init
-from indiankanoon_api_tool import search_indiankanoon_api
+from db import connection, pool_stats
+from http_cache import conditional_json, gzip_response, make_etag, sqlite_time
+from write_behind import install_shutdown_handler, write_queue
+from pagination import InvalidCursor, decode_cursor, keyset_page, page_size
+from indiankanoon_api_tool import search_indiankanoon_api, open_indiankanoon_cursor, get_indiankanoon_cursor
+from query_router import classify_query, greeting_reply, ROUTE_GREETING, ROUTE_DOCUMENT
+from agent_pool import AgentPool
+from fact_check_jobs import submit_fact_check, get_fact_check
+from fact_checker import get_local_tier_stats
+from conversation_memory import get_conversation_context, schedule_summary_update
+from prompt_builder import build_summary_context, fit_retrieved_context, context_budget, log_prompt_tokens
+from retrieval_prefetch import RetrievalPrefetch, start_prefetch
+from tool_runner import abandoned_tool_calls, enable_concurrent_tool_calls
+from rate_limiter import gemini_limiter, estimate_tokens, llm_priority, PRIORITY_BACKGROUND
+from http_client import log_connection_stats, connection_stats
+from precedent_cache import precedent_cache
+from url_verifier import verify_urls
+from lawyer_search import check_search_area, find_lawyers_near
+from precedent_memo import (
+    document_hash, query_hash, load_precedent_run, save_precedent_run, link_run_to_user,
+    is_refreshing, schedule_refresh,
+)
+from provider_scheduler import provider_scheduler, ProviderUnavailable
 import autogen
-from autogen import AssistantAgent, UserProxyAgent
-from autogen import Agent
-
-def custom_gemini_completion(agent: Agent, messages, **kwargs):
-    """Force Autogen to use Gemini for all LLM replies."""
-    try:
-        prompt = messages[-1]["content"] if isinstance(messages, list) else str(messages)
-        config = agent.llm_config["config_list"][0]
-        generate_func = config.get("custom_generate")
-        if callable(generate_func):
-            return generate_func(prompt)
-        return "[Error: Gemini generator missing]"
-    except Exception as e:
-        return f"[Gemini Patch Error: {e}]"
-
-# 🧠 Patch the core LLM reply function
-Agent._generate_reply = lambda self, messages, **kwargs: custom_gemini_completion(self, messages, **kwargs)
+from autogen import AssistantAgent, OpenAIWrapper, UserProxyAgent
+
+# Every autogen agent turn reaches Gemini through OpenAIWrapper.create (the
+# installed autogen replies via generate_oai_reply, not Agent._generate_reply),
+# so turns are admitted through the shared limiter here, like gemini_generate.
+_autogen_create = OpenAIWrapper.create
+
+
+def _turn_prompt_text(config: Dict[str, Any]) -> str:
+    """Text sent to the model for one agent turn: messages, tool calls / results and tool schemas."""
+    parts = []
+    for message in config.get("messages") or []:
+        content = message.get("content")
+        parts.append(content if isinstance(content, str) else json.dumps(content, default=str))
+        if message.get("tool_calls"):
+            parts.append(json.dumps(message["tool_calls"], default=str))
+    agent = config.get("agent")
+    tools = config.get("tools") or (getattr(agent, "llm_config", None) or {}).get("tools")
+    if tools:
+        parts.append(json.dumps(tools, default=str))
+    return "\n".join(p for p in parts if p)
+
+
+def limited_autogen_create(self, **config):
+    # Logged per turn: the system message plus the history, tool schemas and tool results sent this time
+    agent_name = getattr(config.get("agent"), "name", "agent")
+    tokens = log_prompt_tokens(f"{agent_name} turn", _turn_prompt_text(config))
+    with gemini_limiter.acquire(tokens=tokens):
+        return _autogen_create(self, **config)
+
+
+OpenAIWrapper.create = limited_autogen_create
 load_dotenv()
 # --- Flask App Setup ---
 app = Flask(__name__, static_folder=None)
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-key-please-change")
 jwt = JWTManager(app)
 CORS(app, supports_credentials=True)
+app.after_request(gzip_response)
+# Queued chat / fact-check writes are flushed on SIGTERM, not only at normal exit
+install_shutdown_handler()
 
 # --- LLM Configuration ---
 # llm_config = {
@@ -69,11 +107,14 @@ genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 import time
 
 def gemini_generate(prompt: str, model="gemini-2.5-flash", temperature=0.3, retries=3) -> str:
-    """Wrapper to call Gemini with retry logic."""
+    """Wrapper to call Gemini with retry logic, admitted through the shared rate limiter."""
     for attempt in range(retries):
         try:
-            model_instance = genai.GenerativeModel(model)
-            response = model_instance.generate_content(prompt)
+            if attempt == 0:
+                log_prompt_tokens(model, prompt)
+            with gemini_limiter.acquire(tokens=estimate_tokens(prompt)):
+                model_instance = genai.GenerativeModel(model)
+                response = model_instance.generate_content(prompt)
             return response.text.strip()
         except Exception as e:
             error_text = str(e)
@@ -81,6 +122,10 @@ def gemini_generate(prompt: str, model="gemini-2.5-flash", temperature=0.3, retr
                 print(f"[Gemini busy] Retrying... attempt {attempt + 1}/{retries}")
                 time.sleep(3)  # wait before retrying
                 continue
+            if "429" in error_text or "RESOURCE_EXHAUSTED" in error_text:
+                print(f"[Gemini rate limited] Backing off... attempt {attempt + 1}/{retries}")
+                time.sleep(5 * (attempt + 1))
+                continue
             return f"[Gemini Error: {e}]"
     return "[Gemini Error: Model temporarily unavailable. Please try again later.]"
 
@@ -116,11 +161,8 @@ def get_full_text_from_pdf(pdf_path: str) -> str:
         return ""
 
 
-def run_summarizer_agent(full_text: str) -> str:
-    """Runs the summarizer agent."""
-    if not full_text:
-        return "Could not summarize: No text provided or PDF was unreadable."
-
+def build_summarizer_agents():
+    """Builds one (SummarizerAgent, SummaryUserProxy) pair for the agent pool."""
     summarizer_agent = AssistantAgent(
         name="SummarizerAgent",
         system_message=(
@@ -141,20 +183,33 @@ def run_summarizer_agent(full_text: str) -> str:
         is_termination_msg=is_termination_msg,
         code_execution_config={"use_docker": False}
     )
+    return summarizer_agent, user_proxy
 
-    try:
-        chat_result = user_proxy.initiate_chat(summarizer_agent, message=full_text)
-        history = getattr(chat_result, "chat_history", None)
-        if history:
-            for msg in reversed(history):
-                if msg.get("name") == "SummarizerAgent":
-                    content = msg.get("content", "").replace("TERMINATE", "").strip()
-                    if content:
-                        return content
-        return "Failed to generate summary."
-    except Exception as e:
-        print(f"Error during summarization: {e}")
-        return f"Failed to generate summary due to error: {e}"
+
+summarizer_pool = AgentPool("summarizer", build_summarizer_agents, size=2)
+
+
+def run_summarizer_agent(full_text: str) -> str:
+    """Runs the summarizer agent."""
+    if not full_text:
+        return "Could not summarize: No text provided or PDF was unreadable."
+
+    started = time.perf_counter()
+    with summarizer_pool.checkout() as (summarizer_agent, user_proxy):
+        print(f"[AGENT SETUP] summarizer: {(time.perf_counter() - started) * 1000:.2f}ms")
+        try:
+            chat_result = user_proxy.initiate_chat(summarizer_agent, message=full_text)
+            history = getattr(chat_result, "chat_history", None)
+            if history:
+                for msg in reversed(history):
+                    if msg.get("name") == "SummarizerAgent":
+                        content = msg.get("content", "").replace("TERMINATE", "").strip()
+                        if content:
+                            return content
+            return "Failed to generate summary."
+        except Exception as e:
+            print(f"Error during summarization: {e}")
+            return f"Failed to generate summary due to error: {e}"
 # ⚖️ PRECEDENT FINDER AGENT
 def format_precedent_results(results: list[dict]) -> str:
     """
@@ -191,21 +246,10 @@ def search_web_wrapper(query: str) -> str:
     except Exception as e:
         return f"Web search failed: {e}"
     
-from google_scholar_tool import search_google_scholar_legal
-
-def run_precedent_finder_agent(summary_text: str) -> str:
-    """Runs an AI agent to find similar legal precedents from multiple sources."""
-    if not summary_text:
-        return "Could not find precedents: No summary text provided."
-
-    from langchain_community.tools import DuckDuckGoSearchRun
-    search_web = DuckDuckGoSearchRun()
-    try:
-        from google_scholar_tool import search_google_scholar_legal
-    except ImportError:
-        def search_google_scholar_legal(query: str, limit: int = 5) -> list[dict]:
-            return "Google Scholar tool not available."
+from precedent_search import search_precedents, start_precedent_search
 
+def build_precedent_finder_agents():
+    """Builds one (PrecedentFinderAgent, ToolExecutor) pair with its tool schemas registered."""
     precedent_finder = AssistantAgent(
         name="PrecedentFinderAgent",
         system_message=(
@@ -213,8 +257,8 @@ def run_precedent_finder_agent(summary_text: str) -> str:
             "You analyze the summary of a legal document and find real-world case precedents.\n\n"
             "## STEPS:\n"
             "1️⃣ Identify 5–7 relevant legal issues or concepts.\n"
-            "2️⃣ Use `search_indian_kanoon` to find Indian cases.\n"
-            "3️⃣ If no results or tool error, automatically fallback to `search_google_scholar_legal`.\n"
+            "2️⃣ Use `search_precedents` for the most important issues; it searches Indian Kanoon, "
+            "CourtListener and Google Scholar at once and returns merged results.\n"
 
             "Output should always be a JSON list of dicts like:\n"
             "[{\"name\": ..., \"court\": ..., \"year\": ..., \"url\": ..., \"confidence\": ...}]\n"
@@ -231,18 +275,10 @@ def run_precedent_finder_agent(summary_text: str) -> str:
         code_execution_config={"use_docker": False}
     )
 
-    from indiankanoon_api_tool import search_indiankanoon_api
-    from google_scholar_tool import search_google_scholar_legal
-
     precedent_finder.register_for_llm(
-        name="search_indian_kanoon",
-        description="Search Indian Kanoon for case precedents."
-    )(search_indiankanoon_api)
-
-    precedent_finder.register_for_llm(
-        name="search_google_scholar_legal",
-        description="Search Google Scholar for legal cases."
-    )(search_google_scholar_legal)
+        name="search_precedents",
+        description="Search Indian Kanoon, CourtListener and Google Scholar for case precedents."
+    )(search_precedents)
 
     # precedent_finder.register_for_llm(
     #     name="search_web",
@@ -250,44 +286,57 @@ def run_precedent_finder_agent(summary_text: str) -> str:
     # )(search_web_wrapper)
 
 
-    tool_executor.register_for_execution(name="search_indian_kanoon")(search_indiankanoon_api)
-    tool_executor.register_for_execution(name="search_google_scholar_legal")(search_google_scholar_legal)
+    tool_executor.register_for_execution(name="search_precedents")(search_precedents)
+    enable_concurrent_tool_calls(tool_executor)
     # tool_executor.register_for_execution(name="search_web")(search_web_wrapper)
+    return precedent_finder, tool_executor
 
-    try:
-        chat_result = tool_executor.initiate_chat(precedent_finder, message=summary_text)
-        history = getattr(chat_result, "chat_history", None)
 
-        if not history:
-            return "No precedents found."
+precedent_finder_pool = AgentPool("precedent_finder", build_precedent_finder_agents, size=2)
 
-        # Look for AI output
-        for msg in reversed(history):
-            if msg.get("name") == "PrecedentFinderAgent":
-                content = msg.get("content", "").replace("TERMINATE", "").strip()
-
-                # Attempt JSON parsing
-                json_match = re.search(r"\[(.*?)\]", content, re.DOTALL)
-                if json_match:
-                    try:
-                        parsed = json.loads(f"[{json_match.group(1)}]")
-                        formatted = format_precedent_results(parsed)
-                        return formatted
-                    except Exception as e:
-                        print(f"Error parsing JSON: {e}")
-
-                return content or "No precedents found."
-        return "No precedents found."
-    except Exception as e:
-        print(f"Error during precedent finder agent chat: {e}")
-        # Fallback: use Google Scholar directly if AI pipeline fails
+
+def run_precedent_finder_agent(summary_text: str) -> str:
+    """Runs an AI agent to find similar legal precedents from multiple sources."""
+    if not summary_text:
+        return "Could not find precedents: No summary text provided."
+
+    started = time.perf_counter()
+    with precedent_finder_pool.checkout() as (precedent_finder, tool_executor):
+        print(f"[AGENT SETUP] precedent_finder: {(time.perf_counter() - started) * 1000:.2f}ms")
         try:
-            scholar_results = search_google_scholar_legal(summary_text)
-            formatted = format_precedent_results(scholar_results)
-            return f"⚠️ AI Fallback: Using Google Scholar directly.\n\n{formatted}"
-        except Exception as ee:
-            print(f"Fallback error: {ee}")
-            return f"Failed to find precedents: {e}"
+            chat_result = tool_executor.initiate_chat(precedent_finder, message=summary_text)
+            history = getattr(chat_result, "chat_history", None)
+
+            if not history:
+                return "No precedents found."
+
+            # Look for AI output
+            for msg in reversed(history):
+                if msg.get("name") == "PrecedentFinderAgent":
+                    content = msg.get("content", "").replace("TERMINATE", "").strip()
+
+                    # Attempt JSON parsing
+                    json_match = re.search(r"\[(.*?)\]", content, re.DOTALL)
+                    if json_match:
+                        try:
+                            parsed = json.loads(f"[{json_match.group(1)}]")
+                            formatted = format_precedent_results(parsed)
+                            return formatted
+                        except Exception as e:
+                            print(f"Error parsing JSON: {e}")
+
+                    return content or "No precedents found."
+            return "No precedents found."
+        except Exception as e:
+            print(f"Error during precedent finder agent chat: {e}")
+            # Fallback: search the providers directly if AI pipeline fails
+            try:
+                direct_results = search_precedents(summary_text)
+                formatted = format_precedent_results(direct_results)
+                return f"⚠️ AI Fallback: Using direct precedent search.\n\n{formatted}"
+            except Exception as ee:
+                print(f"Fallback error: {ee}")
+                return f"Failed to find precedents: {e}"
 
 
 # 🔍 VALIDATION & FORMATTING HELPERS
@@ -305,11 +354,6 @@ def _clean_and_validate_results(parsed_list: List[Dict[str, Any]]) -> str:
                 continue
             if url in seen_urls:
                 continue
-            try:
-                head = requests.head(url, timeout=3)
-                verified = head.status_code < 400
-            except Exception:
-                verified = False
             seen_urls.add(url)
             cleaned.append({
                 "name": name,
@@ -317,12 +361,15 @@ def _clean_and_validate_results(parsed_list: List[Dict[str, Any]]) -> str:
                 "year": year,
                 "url": url,
                 "confidence": round(confidence, 2),
-                "verified": verified
             })
         except Exception:
             continue
     if not cleaned:
         return "No structured precedents found."
+    statuses = verify_urls([c["url"] for c in cleaned])
+    for c in cleaned:
+        status = statuses.get(c["url"])
+        c["verified"] = bool(status and status["verified"])
     return _format_precedent_results_for_ui(cleaned)
 
 
@@ -343,27 +390,19 @@ def _extract_case_like_entries(text: str) -> List[Dict[str, str]]:
 
 
 def _validate_and_dedupe_entries(entries: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    urls = [e.get("url", "").strip() for e in entries]
+    # Page titles are only fetched for links that came without a case name
+    untitled = [e.get("url", "").strip() for e in entries if not e.get("name", "").strip()]
+    statuses = verify_urls(urls, titles_for=untitled)
+
     validated = []
     seen = set()
     for e in entries:
         url = e.get("url", "").strip()
         name = e.get("name", "").strip()
-        verified = False
-        title = name
-        if url:
-            try:
-                resp = requests.head(url, timeout=4, allow_redirects=True)
-                verified = resp.status_code < 400
-                if not name:
-                    try:
-                        r2 = requests.get(url, timeout=4)
-                        m = re.search(r'<title>(.*?)</title>', r2.text, re.IGNORECASE | re.DOTALL)
-                        if m:
-                            title = m.group(1).strip()
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+        status = statuses.get(url) if url else None
+        verified = bool(status and status["verified"])
+        title = name or (status or {}).get("title") or ""
         key = (title, url)
         if key in seen:
             continue
@@ -461,36 +500,16 @@ def get_answer_source(chat_history: List[Dict[str, Any]]) -> str:
 
     return " & ".join(sources) if sources else "General Knowledge"
 # 💬 MAIN CHAT AGENT
-def run_agent(query: str, db_path: Optional[str] = None, summary: Optional[str] = None, pdf_name: Optional[str] = None):
-    used_tools = {"local_rag": False, "kanoon": False, "web": False}
-    used_tools["local_rag"] = True 
-    def retrieve_context_tool(query: str) -> str:
-        if not db_path or not os.path.exists(db_path):
-            return "NO_INDEX_AVAILABLE"
-        return retrieve_legal_context(query, persist_dir=db_path)
-    
-    def kanoon_tool(query: str):
-        used_tools["kanoon"] = True
-        return search_indiankanoon_api(query)
-
-    def web_tool(query: str):
-        used_tools["web"] = True
-        return search_web(query)
-
-
-    system_message_template = f"""
-You are LexiLaw — an intelligent legal AI assistant integrated into a Flask-based app.
-
-You are designed to analyze legal documents, find relevant precedents, and answer general legal or factual questions accurately.
+LEGAL_ASSISTANT_PROMPT = """
+You are LexiLaw — a legal AI assistant that analyzes legal documents, finds relevant precedents, and answers legal or factual questions.
 
 ## CONTEXT
-- You are currently analyzing this document: "{pdf_name or 'N/A'}"
-- Document summary: {summary or 'No summary available.'}
+- Current document: "{pdf_name}"
+- Relevant summary fields:
+{summary}
 
-## TOOLS AVAILABLE
-1. *retrieve_legal_context(query)* — Retrieve content from the uploaded legal document.
-2. *search_indiankanoon_api(query)* — Find related public Indian legal precedents.
-3. *search_web(query)* — Search the live internet for general legal or factual information.
+## CONVERSATION SO FAR
+{history}
 
 ## DECISION RULES
 1. *Greeting or closing* → Reply politely and end immediately with TERMINATE.
@@ -505,15 +524,29 @@ You are designed to analyze legal documents, find relevant precedents, and answe
 - Output *only* the final answer (no steps or internal reasoning).
 - Be accurate, formal, and concise.
 - Every valid response *must* end with TERMINATE.
-
-consistent, reliable, and direct.
- — just the factual answer followed by `TERMINATE`.
 """
 
+# Tool schemas are generated once from these signatures; the callables that
+# actually run are bound per request in run_agent().
+CHAT_TOOL_DESCRIPTIONS = {
+    "retrieve_legal_context": "Retrieve content from the uploaded legal document.",
+    "search_indiankanoon_api": "Find related public Indian legal precedents.",
+    "search_web": "Search the live internet for general legal or factual information.",
+}
+
+
+CHAT_TOOL_SCHEMA_TOKENS = 200  # approximate size of the three tool schemas sent with each turn
+
 
+def _chat_tool_schema(query: str) -> str:
+    return ""
+
+
+def build_legal_assistant_agents():
+    """Builds one (LegalAssistant, ToolExecutor) pair with the chat tool schemas registered."""
     legal_assistant = AssistantAgent(
         name="LegalAssistant",
-        system_message=system_message_template,
+        system_message=LEGAL_ASSISTANT_PROMPT,
         llm_config=llm_config,
     )
 
@@ -525,46 +558,153 @@ consistent, reliable, and direct.
         code_execution_config={"use_docker": False}
     )
 
-    legal_assistant.register_for_llm(name="retrieve_legal_context")(retrieve_context_tool)
-    legal_assistant.register_for_llm(name="search_indiankanoon_api")(kanoon_tool)
-    legal_assistant.register_for_llm(name="search_web")(web_tool)
+    for name, description in CHAT_TOOL_DESCRIPTIONS.items():
+        legal_assistant.register_for_llm(name=name, description=description)(_chat_tool_schema)
+    enable_concurrent_tool_calls(tool_executor)
+    return legal_assistant, tool_executor
 
-    tool_executor.register_for_execution(name="retrieve_legal_context")(retrieve_context_tool)
-    tool_executor.register_for_execution(name="search_indiankanoon_api")(kanoon_tool)
-    tool_executor.register_for_execution(name="search_web")(web_tool)
 
+legal_assistant_pool = AgentPool("legal_assistant", build_legal_assistant_agents, size=4)
 
-    try:
-        chat_result = tool_executor.initiate_chat(legal_assistant, message=query)
-        history = getattr(chat_result, "chat_history", None)
-        if not history:
-            return "No chat history found.", [], "Error"
-
-        # Determine actual data source dynamically
-        sources = []
-        if used_tools["local_rag"]:
-            sources.append("Uploaded Document")
-        if used_tools["kanoon"]:
-            sources.append("Indian Kanoon")
-        if used_tools["web"]:
-            sources.append("Web Search")
-        if not sources:
-            sources.append("General Knowledge")
-        source = " & ".join(sources)
-
-        for msg in reversed(history):
-            if msg.get("name") == "LegalAssistant":
-                content = msg.get("content", "").strip()
-                if "TERMINATE" in content:
-                    return content.replace("TERMINATE", "").strip(), history, source
-        return "No valid answer generated.", history, "Error"
-    except Exception as e:
-        error_text = str(e)
-        if "503" in error_text or "UNAVAILABLE" in error_text:
-            return "Gemini is currently overloaded. Please try again in a few seconds.", [], "Gemini Service"
-        print(f"Error during agent chat: {e}")
-        return f"Error: {e}", [], "Error"
+
+def run_agent(query: str, db_path: Optional[str] = None, summary: Optional[str] = None, pdf_name: Optional[str] = None,
+              prefetch: Optional[RetrievalPrefetch] = None, history: str = ""):
+    used_tools = {"local_rag": False, "kanoon": False, "web": False}
+    used_tools["local_rag"] = True 
+    def retrieve_context_tool(query: str) -> str:
+        if not db_path or not os.path.exists(db_path):
+            return "NO_INDEX_AVAILABLE"
+        context = prefetch.get(query, persist_dir=db_path) if prefetch is not None else None
+        if context is None:
+            context = retrieve_legal_context(query, persist_dir=db_path)
+        return fit_retrieved_context(context, context_budget(system_message, query, reserved=CHAT_TOOL_SCHEMA_TOKENS))
     
+    def kanoon_tool(query: str):
+        used_tools["kanoon"] = True
+        return search_indiankanoon_api(query)
+
+    def web_tool(query: str):
+        used_tools["web"] = True
+        return search_web(query)
+
+    system_message = LEGAL_ASSISTANT_PROMPT.format(
+        pdf_name=pdf_name or 'N/A',
+        summary=build_summary_context(summary, query),
+        history=history or "No previous messages.",
+    )
+
+    started = time.perf_counter()
+    with legal_assistant_pool.checkout() as (legal_assistant, tool_executor):
+        # Bind per-request state onto the prebuilt agents
+        legal_assistant.update_system_message(system_message)
+        tool_executor.register_function({
+            "retrieve_legal_context": retrieve_context_tool,
+            "search_indiankanoon_api": kanoon_tool,
+            "search_web": web_tool,
+        }, silent_override=True)
+        print(f"[AGENT SETUP] legal_assistant: {(time.perf_counter() - started) * 1000:.2f}ms")
+        try:
+            chat_result = tool_executor.initiate_chat(legal_assistant, message=query)
+            history = getattr(chat_result, "chat_history", None)
+            if not history:
+                return "No chat history found.", [], "Error"
+
+            # Determine actual data source dynamically
+            sources = []
+            if used_tools["local_rag"]:
+                sources.append("Uploaded Document")
+            if used_tools["kanoon"]:
+                sources.append("Indian Kanoon")
+            if used_tools["web"]:
+                sources.append("Web Search")
+            if not sources:
+                sources.append("General Knowledge")
+            source = " & ".join(sources)
+
+            for msg in reversed(history):
+                if msg.get("name") == "LegalAssistant":
+                    content = msg.get("content", "").strip()
+                    if "TERMINATE" in content:
+                        return content.replace("TERMINATE", "").strip(), history, source
+            return "No valid answer generated.", history, "Error"
+        except Exception as e:
+            error_text = str(e)
+            if "503" in error_text or "UNAVAILABLE" in error_text:
+                return "Gemini is currently overloaded. Please try again in a few seconds.", [], "Gemini Service"
+            print(f"Error during agent chat: {e}")
+            return f"Error: {e}", [], "Error"
+
+# 🚦 FAST-PATH ROUTER
+DOCUMENT_PROMPT_OVERHEAD = 150  # tokens used by the fixed instructions of the fast-path prompt
+
+# Reply the document fast path asks for when the retrieved context can't answer the question.
+NOT_IN_DOCUMENT = "NOT_IN_DOCUMENT"
+
+
+def answer_document_query(query: str, db_path: Optional[str], summary: Optional[str] = None, pdf_name: Optional[str] = None,
+                          prefetch: Optional[RetrievalPrefetch] = None, history: str = ""):
+    """
+    Answers a document question with one retrieval and a single Gemini call (no
+    agent loop). None if that isn't possible, including when the model reports
+    the document doesn't contain the answer; the caller then runs the agent.
+    """
+    if not db_path or not os.path.exists(db_path):
+        return None
+    context = prefetch.get(query, persist_dir=db_path) if prefetch is not None else None
+    if context is None:
+        context = retrieve_legal_context(query, persist_dir=db_path)
+    if not context or context == "NO_INDEX_AVAILABLE" or context.startswith("Error loading Chroma DB"):
+        return None
+
+    summary_context = build_summary_context(summary, query)
+    context = fit_retrieved_context(context, context_budget(summary_context, history, query, reserved=DOCUMENT_PROMPT_OVERHEAD))
+    prompt = f"""
+You are LexiLaw — an intelligent legal AI assistant.
+Answer the user's question using the retrieved context from the document "{pdf_name or 'N/A'}".
+If the context does not contain the answer, reply with exactly {NOT_IN_DOCUMENT} and nothing else.
+Be accurate, formal, and concise. Output only the final answer.
+
+## DOCUMENT SUMMARY
+{summary_context}
+
+## CONVERSATION SO FAR
+{history or 'No previous messages.'}
+
+## RETRIEVED CONTEXT
+{context}
+
+## QUESTION
+{query}
+"""
+    answer = gemini_generate(prompt)
+    if answer.startswith("[Gemini Error"):
+        return None
+    if NOT_IN_DOCUMENT in answer:
+        # Not answerable from the document: let the agent search for it
+        print("[ROUTER] Document lacks the answer.")
+        return None
+    return answer.replace("TERMINATE", "").strip(), [], "Uploaded Document"
+
+
+def answer_query(query: str, db_path: Optional[str] = None, summary: Optional[str] = None, pdf_name: Optional[str] = None,
+                 prefetch: Optional[RetrievalPrefetch] = None, history: str = "", route: Optional[str] = None):
+    """
+    Routes the query to the cheapest path that can answer it; same return shape
+    as run_agent. Pass the route from classify_query() if it is already known.
+    """
+    if route is None:
+        route = classify_query(query, bool(db_path and os.path.exists(db_path)))
+    print(f"[ROUTER] {route}: {query[:60]}")
+
+    if route == ROUTE_GREETING:
+        return greeting_reply(query, pdf_name), [], "LexiLaw"
+    if route == ROUTE_DOCUMENT:
+        result = answer_document_query(query, db_path, summary, pdf_name, prefetch, history)
+        if result is not None:
+            return result
+        print("[ROUTER] Fast path failed, falling back to agent.")
+    return run_agent(query, db_path, summary, pdf_name, prefetch, history)
+
 # 🌐 API ROUTES
 @app.route("/")
 def serve_index():
@@ -599,23 +739,30 @@ def login_user():
         return jsonify({"detail": "Incorrect username or password"}), 401
 
     access_token = create_access_token(identity=str(user_id))
-    summary, pdf_name = load_document_summary(user_id)
-    chat_history = load_chat_history(user_id)
-    precedents = load_precedents2(user_id)
-
-
+    # Summary, chat history and precedents are separate cacheable GETs
+    # (/summary, /chat-history, /get-precedents) the client loads after login.
     return jsonify({
         "message": "Login successful",
         "access_token": access_token,
         "username": username,
         "user_id": user_id,
-        "summary": summary,
-        "pdf_name": pdf_name,
-        "chat_history": chat_history,
-        "precedents": precedents # ✅ Send precedents to frontend
     }), 200
 
 
+@app.route("/summary", methods=["GET"])
+@jwt_required()
+def get_summary():
+    """The user's current document summary; 304 while summary_version is unchanged."""
+    user_id = int(get_jwt_identity())
+    version, updated_at = load_summary_version(user_id)
+
+    def build():
+        summary, pdf_name = load_document_summary(user_id)
+        return {"summary": summary, "pdf_name": pdf_name}
+
+    return conditional_json(make_etag("summary", user_id, version), sqlite_time(updated_at), build)
+
+
 
 @app.route("/upload", methods=["POST"])
 @jwt_required()
@@ -635,8 +782,9 @@ def upload_file():
     file.save(pdf_save_path)
 
     full_text = get_full_text_from_pdf(pdf_save_path)
-    summary = run_summarizer_agent(full_text)
-    save_document_summary(user_id, summary, filename)
+    with llm_priority(PRIORITY_BACKGROUND):
+        summary = run_summarizer_agent(full_text)
+    save_document_summary(user_id, summary, filename, document_hash(full_text))
 
     user_db_path = f"chroma_db_user_{user_id}"
     if os.path.exists(user_db_path):
@@ -660,43 +808,47 @@ def chat():
     if not query:
         return jsonify({"detail": "Query is required."}), 400
 
-    summary, pdf_name = load_document_summary(user_id)
     user_db_path = f"chroma_db_user_{user_id}"
-
-    save_chat_message(user_id, "user", query)
-    answer, raw_history, source = run_agent(query, user_db_path, summary, pdf_name)
-    save_chat_message(user_id, "assistant", answer, source)
+    route = classify_query(query, os.path.exists(user_db_path))
+    # Start retrieval now so it overlaps the first LLM turn
+    prefetch = None if route == ROUTE_GREETING else start_prefetch(query, user_db_path)
+    summary, pdf_name = load_document_summary(user_id)
+    # Memory must be read before the current query is saved
+    history = get_conversation_context(user_id)
+
+    # Written behind while the answer is generated; the assistant message below
+    # waits for its own commit (it needs the id), which also covers this one
+    queue_chat_message(user_id, "user", query)
+    answer, raw_history, source = answer_query(query, user_db_path, summary, pdf_name, prefetch, history, route)
+    message_id = save_chat_message(user_id, "assistant", answer, source)
+    schedule_summary_update(user_id, gemini_generate)
     formatted_answer = format_json_to_markdown(answer)
 
-    # --- FACT CHECK START ---
-    fact_results = []  # ✅ always initialize
-    try:
-        from fact_checker import fact_checker_agent
-        from tools import retrieve_legal_context
-        from database import save_fact_check_results
-
-        context_text = retrieve_legal_context(query, persist_dir=user_db_path)
-        retrieved_chunks = context_text.split("\n\n")[:5] if context_text else []
-
-        if retrieved_chunks:
-            print(f"[FACT CHECK] Running for query: {query[:60]}...")
-            fact_results = fact_checker_agent(answer, retrieved_chunks)
-            if fact_results and isinstance(fact_results, list):
-                save_fact_check_results(user_id, fact_results)
-        else:
-            fact_results = [{"error": "No valid evidence for fact check."}]
-            print("[FACT CHECK] Skipped: no retrieved context.")
-    except Exception as e:
-        fact_results = [{"error": f"Fact check failed: {e}"}]
-        print(f"[FACT CHECK ERROR] {e}")
-    # --- FACT CHECK END ---
+    # Fact check runs in the background; the client polls /fact-check/<message_id>
+    # Greetings answered by the router carry no factual claims
+    fact_check_status = "skipped"
+    if message_id is not None and route != ROUTE_GREETING:
+        fact_check_status = submit_fact_check(message_id, user_id, query, answer, user_db_path, prefetch)
 
     return jsonify({
         "answer": formatted_answer,
         "source": source,
-        "fact_check": fact_results   # ✅ Always included
+        "message_id": message_id,
+        "fact_check_status": fact_check_status,
+        "fact_check": []   # ✅ Always included; results arrive via /fact-check/<message_id>
     }), 200
 
+
+@app.route("/fact-check/<int:message_id>", methods=["GET"])
+@jwt_required()
+def get_fact_check_result(message_id):
+    user_id = int(get_jwt_identity())
+    result = get_fact_check(user_id, message_id)
+    if result is None:
+        return jsonify({"detail": "No fact check found for this message."}), 404
+    status_code = 202 if result["status"] == "pending" else 200
+    return jsonify(result), status_code
+
 def format_precedent_html(item):
     title = item.get("name") or item.get("title") or "Unnamed"
     court = item.get("court") or "N/A"
@@ -713,13 +865,62 @@ def format_precedent_html(item):
     """
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Cache hit rates, fact-check tier share, outbound and SQLite connection reuse and provider health, for monitoring."""
+    return jsonify({
+        "precedent_cache": precedent_cache.stats(),
+        "fact_check_local_tier": get_local_tier_stats(),
+        "http_connections": connection_stats(),
+        "sqlite_connections": pool_stats(),
+        "write_behind": write_queue.stats(),
+        "providers": provider_scheduler.health(),
+        "abandoned_tool_calls": abandoned_tool_calls(),
+    }), 200
+
+
+def _page_args() -> Tuple[Optional[Tuple[str, int]], int]:
+    """(before, limit) from the ?before=<cursor>&limit=<n> query string; raises InvalidCursor."""
+    return decode_cursor(request.args.get("before")), page_size(request.args.get("limit"))
+
+
+@app.route("/chat-history", methods=["GET"])
+@jwt_required()
+def get_chat_history():
+    """Chat messages older than ?before=, oldest first within the page."""
+    user_id = int(get_jwt_identity())
+    try:
+        before, limit = _page_args()
+    except InvalidCursor as e:
+        return jsonify({"detail": str(e)}), 400
+    latest_id, latest_at = chat_history_version(user_id)
+
+    def build():
+        messages, next_cursor = load_chat_page(user_id, before, limit)
+        return {"messages": messages, "next_cursor": next_cursor}
+
+    etag = make_etag("chat", user_id, latest_id, request.args.get("before"), limit)
+    return conditional_json(etag, sqlite_time(latest_at), build)
+
+
 @app.route("/fact-history", methods=["GET"])
 @jwt_required()
 def get_fact_history():
+    """Fact-check history newest first, one page of fact-check runs at a time."""
     user_id = int(get_jwt_identity())
-    from database import load_fact_check_history
-    history = load_fact_check_history(user_id)
-    return jsonify({"history": history}), 200
+    try:
+        before, limit = _page_args()
+    except InvalidCursor as e:
+        return jsonify({"detail": str(e)}), 400
+    from database import load_fact_check_page, fact_check_version
+    latest_id, latest_at = fact_check_version(user_id)
+
+    def build():
+        history, next_cursor = load_fact_check_page(user_id, before, limit)
+        return {"history": history, "next_cursor": next_cursor}
+
+    etag = make_etag("facts", user_id, latest_id, request.args.get("before"), limit)
+    return conditional_json(etag, sqlite_time(latest_at), build)
 
 import json
 
@@ -746,6 +947,35 @@ import json
 #         "saved_precedents": precedents_list
 #     }), 200
 
+def run_precedent_pipeline(summary: str, query: str) -> Tuple[str, List[dict]]:
+    """The full precedent pipeline: finder agent plus the direct provider fan-out."""
+    # Direct provider fan-out runs while the agent works
+    direct_search = start_precedent_search(query, limit=5)
+
+    # Generate AI formatted precedents
+    with llm_priority(PRIORITY_BACKGROUND):
+        precedents_formatted = run_precedent_finder_agent(summary)
+
+    try:
+        precedents_list = direct_search.result()["results"]
+        log_connection_stats()
+    except Exception as e:
+        print(f"[PRECEDENT SEARCH ERROR] {e}")
+        precedents_list = []
+    return precedents_formatted, precedents_list
+
+
+def _with_link_status(precedents_list: List[dict]) -> List[dict]:
+    # Links are checked in the background; anything not yet in the
+    # verification cache is returned as unverified (None) for now
+    statuses = verify_urls([p.get("url", "") for p in precedents_list], block=False)
+    annotated = []
+    for p in precedents_list:
+        status = statuses.get(p.get("url", ""))
+        annotated.append(dict(p, verified=status["verified"] if status else None))
+    return annotated
+
+
 @app.route("/find-precedents", methods=["POST"])
 @jwt_required()
 def find_precedents():
@@ -755,69 +985,167 @@ def find_precedents():
     if not summary:
         return jsonify({"detail": "No summary found. Please upload a document first."}), 400
 
-    # Generate AI formatted precedents
-    precedents_formatted = run_precedent_finder_agent(summary)
-
     # Extract query (optional)
     body = request.get_json(silent=True) or {}
-    query = body.get("query", summary)
-
-    try:
-        # Get Indian Kanoon results
-        precedents_list = search_indiankanoon_api(query, limit=5)
-
-        # Save both Kanoon results and AI formatted precedents
-        save_precedents2(user_id, precedents_list, precedents_formatted)
-
-    except Exception as e:
-        print(f"[DB SAVE ERROR] {e}")
-        precedents_list = []
+    query = body.get("query") or summary
+    refresh = bool(body.get("refresh"))
+
+    # Memoized per (document content hash, pipeline version, custom query)
+    doc_hash = load_document_hash(user_id) or document_hash(summary)
+    q_hash = query_hash(query, summary)
+    run = load_precedent_run(doc_hash, q_hash)
+
+    if run is not None:
+        link_run_to_user(user_id, run)
+        refreshing = is_refreshing(doc_hash, q_hash)
+        if refresh:
+            refreshing = schedule_refresh(
+                user_id, doc_hash, q_hash, lambda: run_precedent_pipeline(summary, query)
+            ) or refreshing
+        print(f"[PRECEDENTS] Memoized run for document {doc_hash[:12]}{' (refreshing)' if refreshing else ''}")
+        return jsonify({
+            "precedents": run["ai_summary"],
+            "saved_precedents": _with_link_status(run["results"]),
+            "cached": True,
+            "refreshing": refreshing,
+        }), 202 if refresh else 200
+
+    precedents_formatted, precedents_list = run_precedent_pipeline(summary, query)
+    save_precedent_run(user_id, doc_hash, q_hash, precedents_formatted, precedents_list)
 
     return jsonify({
         "precedents": precedents_formatted,  # AI summary precedents
-        "saved_precedents": precedents_list  # saved IKanoon cases
+        "saved_precedents": _with_link_status(precedents_list),  # saved merged provider cases
+        "cached": False,
+        "refreshing": False,
     }), 200
 
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import sqlite3
 
-def save_precedents2(user_id: int, precedents_list: list, formatted_ai: str):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
 
-    for item in precedents_list:
-        c.execute("""
-            INSERT INTO precedents2 (user_id, title, court, year, url, confidence, ai_summary)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            user_id,
-            item.get("name") or item.get("title"),
-            item.get("court", ""),
-            item.get("year", ""),
-            item.get("url", ""),
-            item.get("confidence", 1.0),
-            formatted_ai  # Store the AI-formatted precedents summary
-        ))
+@app.route("/precedents/search", methods=["POST"])
+@jwt_required()
+def search_precedents_paged():
+    """
+    Opens an Indian Kanoon cursor and returns its first page right away;
+    the next page is already being fetched in the background.
+    """
+    user_id = int(get_jwt_identity())
+    body = request.get_json(silent=True) or {}
+    query = (body.get("query") or "").strip()
+    if not query:
+        return jsonify({"detail": "Query is required."}), 400
+
+    cursor = open_indiankanoon_cursor(query, user_id)
+    try:
+        first = cursor.page(0)
+    except ProviderUnavailable as e:
+        return jsonify({"detail": str(e)}), 503
+    except Exception as e:
+        print(f"[IKANOON ERROR] {e}")
+        return jsonify({"detail": "Indian Kanoon search failed."}), 502
+    return jsonify({"cursor": cursor.id, **first}), 200
 
-    conn.commit()
-    conn.close()
 
+@app.route("/precedents/search/<cursor_id>", methods=["GET"])
+@jwt_required()
+def search_precedents_next_page(cursor_id):
+    user_id = int(get_jwt_identity())
+    cursor = get_indiankanoon_cursor(cursor_id, user_id)
+    if cursor is None:
+        return jsonify({"detail": "Unknown or expired cursor."}), 404
+    page = request.args.get("page", default=1, type=int)
+    try:
+        result = cursor.page(max(0, page))
+    except ProviderUnavailable as e:
+        return jsonify({"detail": str(e)}), 503
+    except Exception as e:
+        print(f"[IKANOON ERROR] {e}")
+        return jsonify({"detail": "Indian Kanoon search failed."}), 502
+    return jsonify({"cursor": cursor.id, **result}), 200
 
 
 def load_precedents2(user_id: int):
-    with sqlite3.connect("users.db") as conn:
-        conn.row_factory = sqlite3.Row
+    with connection() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         cursor.execute("""
-            SELECT id, title, court, year, url, confidence, ai_summary, created_at
-            FROM precedents2
-            WHERE user_id = ?
-            ORDER BY created_at DESC
+            SELECT p.id, p.title, p.court, p.year, p.url, p.confidence,
+                   COALESCE(p.ai_summary, r.ai_summary) AS ai_summary, p.created_at
+            FROM precedents2 p
+            LEFT JOIN precedent_runs r ON r.id = p.run_id
+            WHERE p.user_id = ?
+            ORDER BY p.created_at DESC
             LIMIT 50
         """, (user_id,))
         return [dict(row) for row in cursor.fetchall()]
 
 
+def precedents_version(user_id: int) -> Tuple[int, Optional[int], Optional[str], Optional[str]]:
+    """
+    (row count, newest id, newest created_at, newest run updated_at) of the user's
+    precedents2 rows. The run's updated_at covers summaries refreshed through a
+    precedent_runs row shared with other users, which leaves the user's rows untouched.
+    """
+    with connection() as conn:
+        return tuple(conn.execute("""
+            SELECT COUNT(*), MAX(p.id), MAX(p.created_at), MAX(r.updated_at)
+            FROM precedents2 p
+            LEFT JOIN precedent_runs r ON r.id = p.run_id
+            WHERE p.user_id = ?
+        """, (user_id,)).fetchone())
+
+
+def load_precedents_page(user_id: int, before: Optional[Tuple[str, int]], limit: int) -> Tuple[List[dict], Dict[int, str], Optional[str]]:
+    """
+    Saved precedents newest first, starting just before the `before` (created_at, id)
+    position. Returns (rows, AI summary per run_id, next_cursor); a run's summary
+    is shared by all of its rows, so it is sent once per run.
+    """
+    sql = """
+        SELECT p.id, p.run_id, p.title, p.court, p.year, p.url, p.confidence,
+               COALESCE(p.ai_summary, r.ai_summary) AS ai_summary, p.created_at
+        FROM precedents2 p
+        LEFT JOIN precedent_runs r ON r.id = p.run_id
+        WHERE p.user_id = ?
+    """
+    params: list = [user_id]
+    if before:
+        sql += " AND (p.created_at, p.id) < (?, ?)"
+        params += list(before)
+    sql += " ORDER BY p.created_at DESC, p.id DESC LIMIT ?"
+    params.append(limit + 1)
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = [dict(row) for row in cursor.execute(sql, params).fetchall()]
+    rows, next_cursor = keyset_page(rows, limit, lambda r: r["created_at"], lambda r: r["id"])
+    summaries = {}
+    for row in rows:
+        if row["run_id"] is not None:  # rows saved before runs existed keep their own summary
+            summaries.setdefault(row["run_id"], row.pop("ai_summary"))
+    return rows, summaries, next_cursor
+
+
+@app.route("/precedent-history", methods=["GET"])
+@jwt_required()
+def get_precedent_history():
+    user_id = int(get_jwt_identity())
+    try:
+        before, limit = _page_args()
+    except InvalidCursor as e:
+        return jsonify({"detail": str(e)}), 400
+    count, latest_id, latest_at, run_updated_at = precedents_version(user_id)
+
+    def build():
+        precedents, summaries, next_cursor = load_precedents_page(user_id, before, limit)
+        return {"precedents": precedents, "summaries": summaries, "next_cursor": next_cursor}
+
+    etag = make_etag("precedents", user_id, count, latest_id, run_updated_at, request.args.get("before"), limit)
+    return conditional_json(etag, sqlite_time(max(latest_at or "", run_updated_at or "")), build)
+
+
 # @app.route("/get-precedents-json", methods=["GET"])
 # @jwt_required()
 # def get_precedents_json():
@@ -829,15 +1157,21 @@ def load_precedents2(user_id: int):
 @jwt_required()
 def get_precedents():
     user_id = int(get_jwt_identity())
-    precedents_raw = load_precedents2(user_id)
+    count, latest_id, latest_at, run_updated_at = precedents_version(user_id)
 
-    # Extract the AI formatted markdown summary from the most recent entry
-    formatted_md = precedents_raw[0]["ai_summary"] if precedents_raw else ""
+    def build():
+        precedents_raw = load_precedents2(user_id)
 
-    return jsonify({
-        "formatted_markdown": formatted_md,  # Beautiful formatted summary
-        "precedents_json": precedents_raw    # Full structured JSON list
-    }), 200
+        # Extract the AI formatted markdown summary from the most recent entry
+        formatted_md = precedents_raw[0]["ai_summary"] if precedents_raw else ""
+
+        return {
+            "formatted_markdown": formatted_md,  # Beautiful formatted summary
+            "precedents_json": precedents_raw    # Full structured JSON list
+        }
+
+    etag = make_etag("latest-precedents", user_id, count, latest_id, run_updated_at)
+    return conditional_json(etag, sqlite_time(max(latest_at or "", run_updated_at or "")), build)
 
 
 @app.route("/find-lawyers", methods=["POST"])
@@ -851,10 +1185,24 @@ def find_lawyers():
     if not api_key:
         return jsonify({"error": "Missing Geoapify API key"}), 500
 
-    url = f"https://api.geoapify.com/v2/places?categories=legal.lawyer&filter=circle:{longitude},{latitude},{radius}&limit=20&apiKey={api_key}"
+    try:
+        latitude, longitude, radius = float(latitude), float(longitude), float(radius)
+    except (TypeError, ValueError):
+        return jsonify({"error": "lat, lon and radius must be numbers"}), 400
+    try:
+        check_search_area(latitude, longitude, radius)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    res = requests.get(url)
-    return jsonify(res.json())
+    try:
+        result = find_lawyers_near(latitude, longitude, radius, api_key)
+    except ProviderUnavailable as e:
+        print(f"[LAWYERS ERROR] {e}")
+        return jsonify({"error": "Lawyer search is temporarily unavailable."}), 503
+    except Exception as e:
+        print(f"[LAWYERS ERROR] {e}")
+        return jsonify({"error": "Lawyer search is unavailable right now."}), 502
+    return jsonify(result)
 
 
 
@@ -0,0 +1,62 @@
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from flask import Response, current_app, jsonify, request
+from werkzeug.http import is_resource_modified
+
+# JSON responses at least this large are gzip-compressed for clients that accept it.
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag value for a resource version, e.g. make_etag("chat", user_id, latest_id, cursor)."""
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:24]
+
+
+def sqlite_time(value: Optional[str]) -> Optional[datetime]:
+    """SQLite CURRENT_TIMESTAMP text ('YYYY-MM-DD HH:MM:SS', UTC) as an aware datetime."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)[:19]).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def conditional_json(etag: str, last_modified: Optional[datetime], build: Callable[[], Any]) -> Response:
+    """
+    304 Not Modified if the client's If-None-Match / If-Modified-Since still
+    match this version, otherwise the JSON from build(). build() only runs on
+    a miss, so unchanged resources cost just the version lookup. ETags are
+    weak because the body may be sent gzip-compressed or not.
+    """
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Per-user data behind a bearer token: browser cache only, revalidated on every use
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def gzip_response(response: Response) -> Response:
+    """after_request hook compressing large JSON bodies."""
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "").lower()):
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
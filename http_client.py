@@ -0,0 +1,102 @@
+import os
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds, used when a call doesn't pass its own timeout.
+DEFAULT_TIMEOUT = (
+    float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("HTTP_READ_TIMEOUT", "10")),
+)
+# Number of hosts kept in the pool manager, and keep-alive connections per host.
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "20"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+RETRY_POLICY = Retry(
+    total=2,
+    connect=2,
+    read=1,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    # Only idempotent methods are retried after a read error or a retryable status.
+    # POSTs (paid Indian Kanoon searches) are retried on connect errors only,
+    # which fail before the request reaches the provider and can't be billed.
+    allowed_methods=frozenset({"HEAD", "GET", "OPTIONS"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+USER_AGENT = "LexiLaw/1.0 (+legal research assistant)"
+
+
+class _TimeoutSession(requests.Session):
+    """Session that applies DEFAULT_TIMEOUT to every request without one."""
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = DEFAULT_TIMEOUT
+        return super().request(method, url, **kwargs)
+
+
+def _build_session() -> requests.Session:
+    session = _TimeoutSession()
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=RETRY_POLICY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    The process-wide HTTP session shared by every provider module.
+    Connections are pooled per host and kept alive between calls.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def connection_stats() -> Dict[str, dict]:
+    """
+    Per-host connection reuse: connections opened vs. requests sent over the
+    pool. A reuse ratio near 1.0 means almost every request rode an existing
+    keep-alive connection.
+    """
+    stats = {}
+    if _session is None:
+        return stats
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}"
+            connections, requests_sent = pool.num_connections, pool.num_requests
+            stats[host] = {
+                "connections_opened": connections,
+                "requests": requests_sent,
+                "reuse_ratio": round(1 - connections / requests_sent, 3) if requests_sent else 0.0,
+            }
+    return stats
+
+
+def log_connection_stats() -> None:
+    for host, s in connection_stats().items():
+        print(f"[HTTP] {host}: {s['requests']} requests over {s['connections_opened']} connections "
+              f"(reuse {s['reuse_ratio']:.0%})")
@@ -1,8 +1,29 @@
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
 import requests
 
+from http_client import get_session
+from precedent_cache import precedent_cache
+from precedent_store import remember
+from provider_scheduler import provider_scheduler, ProviderUnavailable
+
 IKANOON_API_URL = "https://api.indiankanoon.org/search/"
 IKANOON_API_TOKEN = os.getenv("INDIAN_KANOON_API_TOKEN")
+# Indian Kanoon matches poorly on very long inputs (e.g. a whole summary)
+IKANOON_MAX_QUERY_WORDS = int(os.getenv("IKANOON_MAX_QUERY_WORDS", "30"))
+# Indian Kanoon returns up to 10 documents per result page
+IKANOON_PAGE_SIZE = 10
+IKANOON_MAX_PAGES = int(os.getenv("IKANOON_MAX_PAGES", "5"))
+CURSOR_TTL_SECONDS = 10 * 60
+
+_page_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ikanoon-pages")
+_cursors: Dict[str, "IndianKanoonCursor"] = {}
+_cursors_lock = threading.Lock()
 
 
 def search_indiankanoon_api(query: str, limit: int = 5) -> list[dict]:
@@ -30,40 +51,11 @@ def search_indiankanoon_api(query: str, limit: int = 5) -> list[dict]:
             "confidence": 0
         }]
 
-    # 🧠 STEP 1 — Truncate query (first 30 words only)
-    words = query.split()
-    short_query = " ".join(words[:30])
-
-    headers = {
-        "Authorization": f"Token {IKANOON_API_TOKEN}",
-        "Accept": "application/json",
-    }
-
-    # 🟢 Indian Kanoon REQUIRES POST now
-    payload = {
-        "formInput": short_query,
-        "pagenum": 0,
-        "maxpages": 1
-    }
-
     try:
-        print(f"[IKANOON DEBUG] Querying short: {short_query[:120]}...")
-
-        # 🚀 FIX: use POST instead of GET
-        res = requests.post(
-            IKANOON_API_URL,
-            headers=headers,
-            data=payload,
-            timeout=10
-        )
-
-        print(f"[IKANOON DEBUG] Status: {res.status_code}")
-
-        res.raise_for_status()
-        data = res.json()
+        precedents = fetch_indiankanoon(query, limit)
 
         # No docs returned
-        if "docs" not in data or not data["docs"]:
+        if not precedents:
             return [{
                 "name": "No matching cases found on Indian Kanoon.",
                 "court": "",
@@ -71,20 +63,18 @@ def search_indiankanoon_api(query: str, limit: int = 5) -> list[dict]:
                 "url": "",
                 "confidence": 0.0
             }]
-
-        precedents = []
-        for doc in data["docs"][:limit]:
-            precedents.append({
-                "name": doc.get("title", "Untitled"),
-                "year": doc.get("year", ""),
-                "court": doc.get("docsource", ""),
-                "url": f"https://indiankanoon.org/doc/{doc.get('tid', '')}/",
-                "confidence": 1.0
-            })
-
-        print(f"[IKANOON DEBUG] ✅ Retrieved {len(precedents)} results.")
         return precedents
 
+    except ProviderUnavailable as e:
+        print(f"[IKANOON ERROR] {e}")
+        return [{
+            "name": "Indian Kanoon is temporarily unavailable.",
+            "court": "",
+            "year": "",
+            "url": "",
+            "confidence": 0
+        }]
+
     except requests.exceptions.Timeout:
         print("[IKANOON ERROR] Request timed out.")
         return [{
@@ -114,3 +104,141 @@ def search_indiankanoon_api(query: str, limit: int = 5) -> list[dict]:
             "url": "",
             "confidence": 0
         }]
+
+
+def fetch_indiankanoon(query: str, limit: int = 5) -> list[dict]:
+    """
+    Cached, quota-scheduled Indian Kanoon search. Returns [] if nothing matched;
+    raises ProviderUnavailable or the request error instead of returning error entries.
+    """
+    if not IKANOON_API_TOKEN:
+        raise ProviderUnavailable("indiankanoon", "missing API token")
+    return precedent_cache.get_or_fetch(
+        "indiankanoon", query, limit,
+        lambda: remember("indiankanoon", provider_scheduler.call("indiankanoon", _fetch_indiankanoon, query, limit))
+    )
+
+
+def _fetch_indiankanoon(query: str, limit: int, pagenum: int = 0) -> list[dict]:
+    """Calls the Indian Kanoon search API. Raises on request/HTTP errors; [] if nothing matched."""
+    # 🧠 STEP 1 — Truncate query (first IKANOON_MAX_QUERY_WORDS words only)
+    words = query.split()
+    short_query = " ".join(words[:IKANOON_MAX_QUERY_WORDS])
+
+    headers = {
+        "Authorization": f"Token {IKANOON_API_TOKEN}",
+        "Accept": "application/json",
+    }
+
+    # 🟢 Indian Kanoon REQUIRES POST now
+    payload = {
+        "formInput": short_query,
+        "pagenum": pagenum,
+        "maxpages": 1
+    }
+
+    print(f"[IKANOON DEBUG] Querying short (page {pagenum}): {short_query[:120]}...")
+
+    # 🚀 FIX: use POST instead of GET
+    res = get_session().post(
+        IKANOON_API_URL,
+        headers=headers,
+        data=payload,
+        timeout=10
+    )
+
+    print(f"[IKANOON DEBUG] Status: {res.status_code}")
+
+    res.raise_for_status()
+    data = res.json()
+
+    precedents = []
+    for doc in (data.get("docs") or [])[:limit]:
+        precedents.append({
+            "name": doc.get("title", "Untitled"),
+            "year": doc.get("year", ""),
+            "court": doc.get("docsource", ""),
+            "url": f"https://indiankanoon.org/doc/{doc.get('tid', '')}/",
+            "confidence": 1.0
+        })
+
+    print(f"[IKANOON DEBUG] ✅ Retrieved {len(precedents)} results.")
+    return precedents
+
+
+# -------------------------
+# Pagination
+# -------------------------
+def fetch_indiankanoon_page(query: str, pagenum: int) -> list[dict]:
+    """One cached, quota-scheduled result page (up to IKANOON_PAGE_SIZE cases). Raises on errors."""
+    if not IKANOON_API_TOKEN:
+        raise ProviderUnavailable("indiankanoon", "missing API token")
+    return precedent_cache.get_or_fetch(
+        "indiankanoon", query, IKANOON_PAGE_SIZE,
+        lambda: remember("indiankanoon", provider_scheduler.call(
+            "indiankanoon", _fetch_indiankanoon, query, IKANOON_PAGE_SIZE, pagenum)),
+        page=pagenum,
+    )
+
+
+class IndianKanoonCursor:
+    """
+    Server-side cursor over Indian Kanoon result pages. Reading page n starts
+    fetching page n + 1 in the background, so paging forward rarely waits.
+    """
+
+    def __init__(self, query: str, user_id: Optional[int] = None, max_pages: int = IKANOON_MAX_PAGES):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.user_id = user_id
+        self.max_pages = max_pages
+        self.touched = time.time()
+        self._pages: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def _future(self, pagenum: int) -> Future:
+        with self._lock:
+            future = self._pages.get(pagenum)
+            started = future is None
+            if started:
+                future = self._pages[pagenum] = _page_pool.submit(fetch_indiankanoon_page, self.query, pagenum)
+        if started:
+            # Added outside the lock: the callback runs at once if the fetch already finished
+            future.add_done_callback(lambda f: self._forget_failed(pagenum, f))
+        return future
+
+    def _forget_failed(self, pagenum: int, future: Future) -> None:
+        """Drops a failed fetch so the next page(n) call retries it instead of re-raising."""
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                if self._pages.get(pagenum) is future:
+                    del self._pages[pagenum]
+
+    def page(self, pagenum: int, timeout: float = 15) -> dict:
+        """{"page", "results", "has_more"}; raises on provider errors."""
+        self.touched = time.time()
+        if pagenum >= self.max_pages:
+            return {"page": pagenum, "results": [], "has_more": False}
+        results = self._future(pagenum).result(timeout=timeout)
+        has_more = len(results) >= IKANOON_PAGE_SIZE and pagenum + 1 < self.max_pages
+        if has_more:
+            self._future(pagenum + 1)  # prefetch
+        return {"page": pagenum, "results": results, "has_more": has_more}
+
+
+def open_indiankanoon_cursor(query: str, user_id: Optional[int] = None) -> IndianKanoonCursor:
+    cutoff = time.time() - CURSOR_TTL_SECONDS
+    cursor = IndianKanoonCursor(query, user_id)
+    with _cursors_lock:
+        for cursor_id in [c for c, cur in _cursors.items() if cur.touched < cutoff]:
+            del _cursors[cursor_id]
+        _cursors[cursor.id] = cursor
+    return cursor
+
+
+def get_indiankanoon_cursor(cursor_id: str, user_id: Optional[int] = None) -> Optional[IndianKanoonCursor]:
+    with _cursors_lock:
+        cursor = _cursors.get(cursor_id)
+    if cursor is None or cursor.user_id != user_id:
+        return None
+    return cursor
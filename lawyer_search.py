@@ -0,0 +1,316 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from db import connection
+from http_client import get_session
+from provider_scheduler import provider_scheduler
+
+GEOAPIFY_PLACES_URL = "https://api.geoapify.com/v2/places"
+GEO_CACHE_DB = os.getenv("GEO_CACHE_DB", "geo_cache.db")
+# Lawyer listings change slowly; a tile is reused for this long.
+LAWYER_TILE_TTL = int(os.getenv("LAWYER_TILE_TTL", str(24 * 60 * 60)))
+# Places requested from Geoapify per tile. A tile that comes back with exactly
+# this many places is truncated and is split into its child cells where it
+# could hold lawyers nearer than the current results.
+TILE_PLACE_LIMIT = int(os.getenv("GEOAPIFY_TILE_LIMIT", "60"))
+MAX_RESULTS = 20
+MAX_TILES_PER_REQUEST = 12
+# Coarsest tiles ever used: precision 3 cells (~156 km) hold far too many places for one capped query.
+MIN_TILE_PRECISION = 4
+# Finest tiles truncated tiles are split into (~150 x 150 m).
+MAX_TILE_PRECISION = 7
+# Upper bound on the Geoapify requests of one search, refinement included. Kept well
+# below the geoapify quota (PROVIDER_RPM_GEOAPIFY, 60 rpm) so one search can't drain
+# it; refinement is further limited to the quota left at the time.
+MAX_TILE_FETCHES_PER_REQUEST = int(os.getenv("LAWYER_MAX_TILE_FETCHES", "16"))
+
+# Radius bucket (metres) -> geohash precision of the tiles used for it.
+# Precision 6 tiles are ~1.2 x 0.6 km, 5 are ~4.9 x 4.9 km, 4 are ~39 x 20 km.
+RADIUS_BUCKETS = [(1000, 6), (2500, 6), (5000, 5), (10000, 5), (25000, 4), (50000, 4)]
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371000.0
+
+_tile_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="geo-tiles")
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+_schema_ready = False
+
+
+# -------------------------
+# Geometry
+# -------------------------
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    bits, bit_count, even, code = 0, 0, True, []
+    while len(code) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            code.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(code)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def radius_bucket(radius: float) -> Tuple[int, int]:
+    """Smallest (bucket radius, tile precision) covering `radius`."""
+    for bucket, precision in RADIUS_BUCKETS:
+        if radius <= bucket:
+            return bucket, precision
+    return RADIUS_BUCKETS[-1]
+
+
+def covering_tiles(lat: float, lon: float, radius: float, precision: int) -> List[str]:
+    """Geohash cells at `precision` that intersect the circle's bounding box."""
+    d_lat = math.degrees(radius / EARTH_RADIUS_M)
+    d_lon = math.degrees(radius / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 0.01)))
+    min_lat, max_lat = max(-90.0, lat - d_lat), min(90.0, lat + d_lat)
+    min_lon, max_lon = lon - d_lon, lon + d_lon
+
+    cell = geohash_bounds(geohash_encode(lat, lon, precision))
+    step_lat, step_lon = (cell[2] - cell[0]) * 0.9, (cell[3] - cell[1]) * 0.9
+    tiles = []
+    y = min_lat
+    while True:
+        x = min_lon
+        while True:
+            tile = geohash_encode(y, ((x + 180) % 360) - 180, precision)
+            if tile not in tiles:
+                tiles.append(tile)
+            if x >= max_lon:
+                break
+            x = min(max_lon, x + step_lon)
+        if y >= max_lat:
+            break
+        y = min(max_lat, y + step_lat)
+    return tiles
+
+
+# -------------------------
+# Tile cache
+# -------------------------
+def _connect():
+    """Pooled transaction on the geo cache, creating the table on first use."""
+    global _schema_ready
+    if not _schema_ready:
+        with connection(GEO_CACHE_DB) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lawyer_tiles (
+                    tile TEXT PRIMARY KEY,
+                    features_json TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+        _schema_ready = True
+    return connection(GEO_CACHE_DB)
+
+
+def _load_tiles(tiles: List[str]) -> Dict[str, list]:
+    placeholders = ",".join("?" * len(tiles))
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT tile, features_json FROM lawyer_tiles WHERE tile IN ({placeholders}) AND expires_at > ?",
+            [*tiles, time.time()],
+        ).fetchall()
+    return {tile: json.loads(features) for tile, features in rows}
+
+
+def _fetch_tile(tile: str, api_key: str) -> list:
+    """Every lawyer Geoapify lists inside one geohash cell (rect filter)."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(tile)
+    params = {
+        "categories": "legal.lawyer",
+        "filter": f"rect:{min_lon},{min_lat},{max_lon},{max_lat}",
+        "limit": TILE_PLACE_LIMIT,
+        "apiKey": api_key,
+    }
+
+    def fetch():
+        res = get_session().get(GEOAPIFY_PLACES_URL, params=params, timeout=(3.05, 8))
+        res.raise_for_status()
+        return res.json().get("features", [])
+
+    features = provider_scheduler.call("geoapify", fetch)
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO lawyer_tiles (tile, features_json, expires_at) VALUES (?, ?, ?)",
+            (tile, json.dumps(features), time.time() + LAWYER_TILE_TTL),
+        )
+    return features
+
+
+def _tile_future(tile: str, api_key: str) -> Future:
+    """Coalesces concurrent requests for the same uncached tile into one provider call."""
+    with _in_flight_lock:
+        future = _in_flight.get(tile)
+        started = future is None
+        if started:
+            future = _in_flight[tile] = _tile_pool.submit(_fetch_tile, tile, api_key)
+    if started:
+        # Outside the lock: the callback runs at once if the fetch already finished
+        future.add_done_callback(lambda f, t=tile: _drop_in_flight(t, f))
+    return future
+
+
+def _drop_in_flight(tile: str, future: Future) -> None:
+    with _in_flight_lock:
+        if _in_flight.get(tile) is future:
+            del _in_flight[tile]
+
+
+def check_search_area(lat: float, lon: float, radius: float) -> None:
+    """Raises ValueError unless lat / lon are finite coordinates and radius a finite positive distance."""
+    if not all(math.isfinite(v) for v in (lat, lon, radius)):
+        raise ValueError("lat, lon and radius must be finite numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat must be within -90..90 and lon within -180..180")
+    if radius <= 0:
+        raise ValueError("radius must be positive")
+
+
+def find_lawyers_near(lat: float, lon: float, radius: float, api_key: str,
+                      timeout: float = 10) -> Dict[str, object]:
+    """
+    Lawyers within `radius` metres, nearest first, as a GeoJSON FeatureCollection.
+    Served from cached geohash tiles; only uncached tiles go to Geoapify.
+    "partial" is set if a tile failed or a truncated tile near the user could
+    not be refined within the tile budget or timeout. Raises the provider error if no tile at all could be loaded.
+    """
+    check_search_area(lat, lon, radius)  # NaN / inf would never end the covering_tiles scan
+    bucket, precision = radius_bucket(radius)
+    radius = min(radius, bucket)
+    tiles = covering_tiles(lat, lon, radius, precision)
+    while len(tiles) > MAX_TILES_PER_REQUEST and precision > MIN_TILE_PRECISION:
+        precision -= 1
+        tiles = covering_tiles(lat, lon, radius, precision)
+
+    deadline = time.monotonic() + timeout
+    features_by_tile, errors, counts, _ = _gather_tiles(tiles, api_key, deadline)
+    tried = set(tiles)
+    refined, incomplete = 0, False
+    while True:
+        # Truncated tiles may hide lawyers nearer than the current MAX_RESULTS-th result:
+        # replace them with their child cells that intersect that distance
+        cutoff = _result_cutoff(lat, lon, radius, features_by_tile)
+        truncated = [t for t, features in features_by_tile.items()
+                     if len(features) >= TILE_PLACE_LIMIT and len(t) < MAX_TILE_PRECISION
+                     and _cell_distance_m(lat, lon, t) <= cutoff]
+        children = sorted((child for t in truncated for child in (t + c for c in _BASE32)
+                           if _cell_distance_m(lat, lon, child) <= cutoff),
+                          key=lambda child: _cell_distance_m(lat, lon, child))
+        children = [c for c in children if c not in tried]
+        if not children or time.monotonic() >= deadline:
+            incomplete = bool(children)
+            break
+        # Cached children are free; uncached ones are fetched nearest first while the budget lasts
+        fetch_budget = min(MAX_TILE_FETCHES_PER_REQUEST - counts[1], provider_scheduler.remaining_quota("geoapify"))
+        more, more_errors, more_counts, skipped = _gather_tiles(children, api_key, deadline, max(0, fetch_budget))
+        tried.update(c for c in children if c not in skipped)
+        refined += more_counts[0] + more_counts[1]
+        features_by_tile.update(more)
+        errors += more_errors
+        counts = [a + b for a, b in zip(counts, more_counts)]
+        if skipped:
+            incomplete = True
+            break
+
+    if errors and not features_by_tile:
+        raise errors[0]
+    print(f"[LAWYERS] {len(tiles)} tiles (precision {precision}) + {refined} refined: {counts[0]} cached, "
+          f"{counts[1]} fetched, {len(errors)} failed")
+
+    nearby = _nearby(lat, lon, radius, features_by_tile)
+    return {"type": "FeatureCollection", "features": nearby[:MAX_RESULTS], "partial": bool(errors) or incomplete}
+
+
+def _gather_tiles(tiles: List[str], api_key: str, deadline: float,
+                  max_fetches: Optional[int] = None) -> Tuple[Dict[str, list], list, List[int], List[str]]:
+    """
+    (features by tile, errors, [cached count, fetched count], skipped tiles) for `tiles`,
+    fetching the first `max_fetches` uncached ones (all if None) until `deadline`.
+    """
+    cached = _load_tiles(tiles)
+    missing = [t for t in tiles if t not in cached]
+    skipped = missing[max_fetches:] if max_fetches is not None else []
+    missing = missing[:len(missing) - len(skipped)]
+    futures = {t: _tile_future(t, api_key) for t in missing}
+    if futures:
+        wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
+
+    features_by_tile = dict(cached)
+    errors = []
+    for tile, future in futures.items():
+        if future.done() and not future.exception():
+            features_by_tile[tile] = future.result()
+        else:
+            errors.append(future.exception() if future.done() else TimeoutError(f"tile {tile} timed out"))
+    return features_by_tile, errors, [len(cached), len(missing)], skipped
+
+
+def _cell_distance_m(lat: float, lon: float, tile: str) -> float:
+    """Distance from the point to the nearest edge of a geohash cell (0 inside it)."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(tile)
+    return haversine_m(lat, lon, min(max(lat, min_lat), max_lat), min(max(lon, min_lon), max_lon))
+
+
+def _result_cutoff(lat: float, lon: float, radius: float, features_by_tile: Dict[str, list]) -> float:
+    """Distance of the MAX_RESULTS-th nearest place found so far, or `radius` if there are fewer."""
+    nearby = _nearby(lat, lon, radius, features_by_tile)
+    return nearby[MAX_RESULTS - 1]["properties"]["distance"] if len(nearby) >= MAX_RESULTS else radius
+
+
+def _nearby(lat: float, lon: float, radius: float, features_by_tile: Dict[str, list]) -> list:
+    """Places within `radius` of the point, deduplicated, nearest first."""
+    seen, nearby = set(), []
+    for features in features_by_tile.values():
+        for feature in features:
+            props = feature.get("properties", {})
+            coords = (feature.get("geometry") or {}).get("coordinates") or [props.get("lon"), props.get("lat")]
+            if coords[0] is None or coords[1] is None:
+                continue
+            place_id = props.get("place_id") or (coords[0], coords[1], props.get("name"))
+            if place_id in seen:
+                continue
+            seen.add(place_id)
+            distance = haversine_m(lat, lon, coords[1], coords[0])
+            if distance <= radius:
+                nearby.append(dict(feature, properties=dict(props, distance=round(distance))))
+    nearby.sort(key=lambda f: f["properties"]["distance"])
+    return nearby
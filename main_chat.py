@@ -5,6 +5,7 @@ from autogen import AssistantAgent, UserProxyAgent
 from tools import retrieve_legal_context
 load_dotenv()
 import google.generativeai as genai
+from rate_limiter import gemini_limiter, estimate_tokens
 
 
 # Configure Gemini with API key
@@ -12,8 +13,9 @@ genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 def gemini_generate(prompt: str, model="gemini-2.5-flash", temperature=0.3) -> str:
     """Wrapper to call Gemini like an OpenAI model."""
     try:
-        model_instance = genai.GenerativeModel(model)
-        response = model_instance.generate_content(prompt)
+        with gemini_limiter.acquire(tokens=estimate_tokens(prompt)):
+            model_instance = genai.GenerativeModel(model)
+            response = model_instance.generate_content(prompt)
         return response.text.strip()
     except Exception as e:
         return f"[Gemini Error: {e}]"
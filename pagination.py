@@ -0,0 +1,47 @@
+import base64
+import os
+from typing import Any, List, Optional, Tuple
+
+# Rows per page for the history endpoints (?limit= may ask for up to HISTORY_MAX_PAGE_SIZE).
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_size(raw: Optional[str]) -> int:
+    """?limit= value clamped to 1..HISTORY_MAX_PAGE_SIZE; HISTORY_PAGE_SIZE when absent or invalid."""
+    try:
+        return max(1, min(int(raw), HISTORY_MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return HISTORY_PAGE_SIZE
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """Opaque cursor for the (timestamp, id) position of a row."""
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(timestamp, id) from encode_cursor, None for no cursor. Raises InvalidCursor on garbage."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, row_id = raw.rsplit("|", 1)
+        return timestamp, int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_page(rows: List[Any], limit: int, timestamp_of, id_of) -> Tuple[List[Any], Optional[str]]:
+    """
+    Splits `limit + 1` newest-first rows into (page, next_cursor); next_cursor
+    is None once the oldest row has been returned.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(timestamp_of(page[-1]), id_of(page[-1]))
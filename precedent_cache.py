@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db import connection
+
+# "sqlite" (default) or "memory" — the in-process stand-in used by tests and
+# local runs that shouldn't touch the cache file.
+CACHE_BACKEND = os.getenv("PRECEDENT_CACHE_BACKEND", "sqlite")
+CACHE_DB = os.getenv("PRECEDENT_CACHE_DB", "precedent_cache.db")
+
+DAY = 24 * 60 * 60
+# How long a provider's results are reused. Case law changes slowly; Scholar
+# rankings drift faster.
+PROVIDER_TTLS = {
+    "indiankanoon": int(os.getenv("PRECEDENT_TTL_INDIANKANOON", str(7 * DAY))),
+    "google_scholar": int(os.getenv("PRECEDENT_TTL_GOOGLE_SCHOLAR", str(3 * DAY))),
+    "courtlistener": int(os.getenv("PRECEDENT_TTL_COURTLISTENER", str(7 * DAY))),
+}
+DEFAULT_TTL = DAY
+# Empty result lists are cached too, but only briefly.
+NEGATIVE_TTL = int(os.getenv("PRECEDENT_NEGATIVE_TTL", str(60 * 60)))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, punctuation-free, single-spaced form of a search query."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", (query or "").lower())).strip()
+
+
+def cache_key(query: str, limit: int, page: int = 0) -> str:
+    key = f"{normalize_query(query)}|{limit}" + (f"|page={page}" if page else "")
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """Dict-backed stand-in for SQLiteCacheBackend."""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[list, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, key: str) -> Optional[list]:
+        with self._lock:
+            entry = self._entries.get((provider, key))
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[(provider, key)]
+                return None
+            return entry[0]
+
+    def set(self, provider: str, key: str, query: str, results: list, ttl: float) -> None:
+        with self._lock:
+            self._entries[(provider, key)] = (results, time.time() + ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """Cache entries in a SQLite file, shared by every worker process."""
+
+    def __init__(self, db_path: str = CACHE_DB):
+        self.db_path = db_path
+        with connection(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS precedent_cache (
+                    provider TEXT NOT NULL,
+                    query_key TEXT NOT NULL,
+                    query TEXT,
+                    results_json TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (provider, query_key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_precedent_cache_expiry ON precedent_cache(expires_at)")
+
+    def get(self, provider: str, key: str) -> Optional[list]:
+        with connection(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT results_json FROM precedent_cache WHERE provider = ? AND query_key = ? AND expires_at > ?",
+                (provider, key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, provider: str, key: str, query: str, results: list, ttl: float) -> None:
+        now = time.time()
+        with connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO precedent_cache "
+                "(provider, query_key, query, results_json, expires_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, key, query, json.dumps(results), now + ttl, now),
+            )
+            # Expired rows are dropped lazily on writes
+            conn.execute("DELETE FROM precedent_cache WHERE expires_at <= ?", (now,))
+
+    def clear(self) -> None:
+        with connection(self.db_path) as conn:
+            conn.execute("DELETE FROM precedent_cache")
+
+
+class PrecedentCache:
+    """
+    Normalized query -> parsed precedent list, per provider.
+    Only successful fetches are stored: `fetch` must raise on provider errors.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else _default_backend()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, provider: str, field: str) -> None:
+        with self._lock:
+            counters = self._stats.setdefault(provider, {"hits": 0, "negative_hits": 0, "misses": 0})
+            counters[field] += 1
+
+    def get_or_fetch(self, provider: str, query: str, limit: int, fetch: Callable[[], List[dict]],
+                     page: int = 0) -> List[dict]:
+        key = cache_key(query, limit, page)
+        try:
+            cached = self.backend.get(provider, key)
+        except Exception as e:
+            print(f"[PRECEDENT CACHE] Read failed: {e}")
+            cached = None
+        if cached is not None:
+            self._count(provider, "negative_hits" if not cached else "hits")
+            print(f"[PRECEDENT CACHE] {provider} hit ({len(cached)} results)")
+            return cached
+
+        self._count(provider, "misses")
+        results = fetch()
+        ttl = PROVIDER_TTLS.get(provider, DEFAULT_TTL) if results else NEGATIVE_TTL
+        try:
+            self.backend.set(provider, key, normalize_query(query), results, ttl)
+        except Exception as e:
+            print(f"[PRECEDENT CACHE] Write failed: {e}")
+        return results
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-provider hit / negative-hit / miss counts and hit rate since startup."""
+        with self._lock:
+            snapshot = {p: dict(c) for p, c in self._stats.items()}
+        for counters in snapshot.values():
+            lookups = counters["hits"] + counters["negative_hits"] + counters["misses"]
+            counters["hit_rate"] = round((counters["hits"] + counters["negative_hits"]) / lookups, 3) if lookups else 0.0
+        return snapshot
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def _default_backend():
+    if CACHE_BACKEND == "memory":
+        return MemoryCacheBackend()
+    return SQLiteCacheBackend(CACHE_DB)
+
+
+precedent_cache = PrecedentCache()
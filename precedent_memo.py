@@ -0,0 +1,137 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db import connection
+from rate_limiter import llm_priority, PRIORITY_BACKGROUND
+
+# Bump when the precedent pipeline (agent prompt, providers, merge rules)
+# changes, so memoized runs from the old pipeline are no longer served.
+PIPELINE_VERSION = "3"
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="precedent-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def document_hash(text: str) -> str:
+    """Content hash of a document's extracted text (whitespace-insensitive)."""
+    return hashlib.sha256(re.sub(r"\s+", " ", text or "").strip().encode("utf-8")).hexdigest()
+
+
+def query_hash(query: str, summary: str) -> str:
+    """'' for the default summary-derived query, otherwise a hash of the custom query."""
+    if not query or query == summary:
+        return ""
+    return hashlib.sha256(re.sub(r"\s+", " ", query).strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def load_precedent_run(doc_hash: str, q_hash: str) -> Optional[Dict[str, Any]]:
+    """The memoized pipeline output for a document under the current PIPELINE_VERSION, or None."""
+    sql = """
+        SELECT id, ai_summary, results_json, updated_at FROM precedent_runs
+        WHERE doc_hash = ? AND pipeline_version = ? AND query_hash = ?
+    """
+    try:
+        with connection() as conn:
+            row = conn.execute(sql, (doc_hash, PIPELINE_VERSION, q_hash)).fetchone()
+    except Exception as e:
+        print(f"Error loading precedent run: {e}")
+        return None
+    if not row:
+        return None
+    return {"id": row[0], "ai_summary": row[1], "results": json.loads(row[2] or "[]"), "updated_at": row[3]}
+
+
+def _replace_user_rows(conn: sqlite3.Connection, user_id: int, run_id: int, results: List[dict]) -> None:
+    """One precedents2 row per case; the run's AI summary stays in precedent_runs (joined on read)."""
+    conn.execute("DELETE FROM precedents2 WHERE user_id = ? AND run_id = ?", (user_id, run_id))
+    conn.executemany("""
+        INSERT INTO precedents2 (user_id, run_id, title, court, year, url, confidence)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(
+        user_id,
+        run_id,
+        item.get("name") or item.get("title"),
+        item.get("court", ""),
+        item.get("year", ""),
+        item.get("url", ""),
+        item.get("confidence", 1.0),
+    ) for item in results])
+
+
+def save_precedent_run(user_id: int, doc_hash: str, q_hash: str, ai_summary: str, results: List[dict]) -> Optional[int]:
+    """Stores (or refreshes) the memoized run and the user's precedents2 rows for it."""
+    try:
+        with connection(immediate=True) as conn:
+            conn.execute("""
+                INSERT INTO precedent_runs (doc_hash, pipeline_version, query_hash, ai_summary, results_json)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(doc_hash, pipeline_version, query_hash) DO UPDATE SET
+                    ai_summary = excluded.ai_summary,
+                    results_json = excluded.results_json,
+                    updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')  -- ms, part of the precedents ETag
+            """, (doc_hash, PIPELINE_VERSION, q_hash, ai_summary, json.dumps(results)))
+            run_id = conn.execute(
+                "SELECT id FROM precedent_runs WHERE doc_hash = ? AND pipeline_version = ? AND query_hash = ?",
+                (doc_hash, PIPELINE_VERSION, q_hash),
+            ).fetchone()[0]
+            _replace_user_rows(conn, user_id, run_id, results)
+        return run_id
+    except Exception as e:
+        print(f"[DB SAVE ERROR] {e}")
+        return None
+
+
+def link_run_to_user(user_id: int, run: Dict[str, Any]) -> None:
+    """
+    Gives the user precedents2 rows for a memoized run (e.g. another account
+    uploaded the same document), or refreshes rows older than the run.
+    """
+    try:
+        with connection(immediate=True) as conn:
+            newest = conn.execute(
+                "SELECT MAX(created_at) FROM precedents2 WHERE user_id = ? AND run_id = ?",
+                (user_id, run["id"]),
+            ).fetchone()[0]
+            if newest is None or newest < run["updated_at"]:
+                _replace_user_rows(conn, user_id, run["id"], run["results"])
+    except Exception as e:
+        print(f"[DB SAVE ERROR] {e}")
+
+
+def is_refreshing(doc_hash: str, q_hash: str) -> bool:
+    with _refreshing_lock:
+        return (doc_hash, q_hash) in _refreshing
+
+
+def schedule_refresh(user_id: int, doc_hash: str, q_hash: str,
+                     pipeline: Callable[[], Tuple[str, List[dict]]]) -> bool:
+    """
+    Re-runs the precedent pipeline in the background and replaces the memoized
+    run when it finishes. Returns False if a refresh is already running.
+    """
+    key = (doc_hash, q_hash)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with llm_priority(PRIORITY_BACKGROUND):
+                ai_summary, results = pipeline()
+            save_precedent_run(user_id, doc_hash, q_hash, ai_summary, results)
+            print(f"[PRECEDENTS] Refreshed run for document {doc_hash[:12]}")
+        except Exception as e:
+            print(f"[PRECEDENTS REFRESH ERROR] {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(run)
+    return True
@@ -0,0 +1,132 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from courtlistener_tool import fetch_courtlistener
+from google_scholar_tool import fetch_google_scholar
+from indiankanoon_api_tool import fetch_indiankanoon
+from precedent_store import (
+    LOCAL_MATCH_THRESHOLD, extract_citation, local_recall_sufficient, normalize_case_name, search_local,
+)
+from provider_scheduler import ProviderUnavailable
+
+# Overall time budget for one fan-out; providers still running after it are
+# left to finish in the background (their results still land in the cache).
+SEARCH_DEADLINE_SECONDS = float(os.getenv("PRECEDENT_SEARCH_DEADLINE", "8"))
+# Long summary-derived queries are cut to this many words for every provider.
+MAX_QUERY_WORDS = 30
+
+# In merge priority order: earlier providers win when the same case comes back twice.
+# Cases from the local precedent store ("local") are merged last.
+PROVIDERS = {
+    "indiankanoon": fetch_indiankanoon,
+    "courtlistener": fetch_courtlistener,
+    "google_scholar": fetch_google_scholar,
+}
+
+_provider_pool = ThreadPoolExecutor(max_workers=3 * len(PROVIDERS), thread_name_prefix="precedent-search")
+_request_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="precedent-request")
+
+
+def merge_results(results_by_provider: Dict[str, List[dict]]) -> List[dict]:
+    """
+    Merges provider results in PROVIDERS order, deduping by citation and by
+    normalized case name. Duplicates fill in missing fields, raise confidence
+    and are listed under "sources".
+    """
+    merged: List[dict] = []
+    index: Dict[str, dict] = {}
+    for provider in [*PROVIDERS, "local"]:
+        for item in results_by_provider.get(provider, []):
+            citation = extract_citation(item)
+            name_key = normalize_case_name(item.get("name", ""))
+            keys = ([f"cite:{citation}"] if citation else []) + ([f"name:{name_key}"] if name_key else [])
+            existing = next((index[k] for k in keys if k in index), None)
+            if existing is None:
+                existing = dict(item, sources=[provider])
+                merged.append(existing)
+            else:
+                for field, value in item.items():
+                    if value and not existing.get(field):
+                        existing[field] = value
+                existing["confidence"] = max(float(existing.get("confidence") or 0), float(item.get("confidence") or 0))
+                if provider not in existing["sources"]:
+                    existing["sources"].append(provider)
+            if citation and not existing.get("citation"):
+                existing["citation"] = citation
+            for k in keys:
+                index.setdefault(k, existing)
+    return merged
+
+
+def search_precedents_detailed(query: str, limit: int = 5, deadline: Optional[float] = None,
+                               use_local: bool = True) -> Dict[str, Any]:
+    """
+    Answers from the local precedent store when it has enough good matches;
+    otherwise queries every provider concurrently and merges whatever finished
+    within `deadline` seconds with the local matches.
+    Returns {"results": [...], "providers": {name: status}}.
+    """
+    deadline = SEARCH_DEADLINE_SECONDS if deadline is None else deadline
+    short_query = " ".join((query or "").split()[:MAX_QUERY_WORDS])
+    if not short_query:
+        return {"results": [], "providers": {}}
+
+    started = time.perf_counter()
+    local_results = []
+    if use_local:
+        try:
+            local_results = search_local(short_query, limit)
+        except Exception as e:
+            print(f"[PRECEDENT SEARCH] Local store failed: {e}")
+        if local_recall_sufficient(local_results, limit):
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"[PRECEDENT SEARCH] {len(local_results)} local results in {elapsed:.1f}ms")
+            return {"results": local_results, "providers": {"local": {"status": "ok", "count": len(local_results)}}}
+
+    futures = {_provider_pool.submit(fn, short_query, limit): name for name, fn in PROVIDERS.items()}
+    done, _ = wait(futures, timeout=deadline)
+
+    results_by_provider, providers = {}, {}
+    for future, name in futures.items():
+        if future not in done:
+            providers[name] = {"status": "timeout", "count": 0}
+            continue
+        try:
+            items = future.result() or []
+        except ProviderUnavailable as e:
+            providers[name] = {"status": "unavailable", "count": 0, "reason": e.reason}
+            continue
+        except Exception as e:
+            print(f"[PRECEDENT SEARCH] {name} failed: {e}")
+            providers[name] = {"status": "error", "count": 0}
+            continue
+        results_by_provider[name] = items
+        providers[name] = {"status": "ok" if items else "empty", "count": len(items)}
+
+    local_matches = [r for r in local_results if r["local_score"] >= LOCAL_MATCH_THRESHOLD]
+    if local_matches:
+        results_by_provider["local"] = local_matches
+        providers["local"] = {"status": "partial", "count": len(local_matches)}
+    merged = merge_results(results_by_provider)
+    elapsed = (time.perf_counter() - started) * 1000
+    summary = ", ".join(f"{n}={p['status']}:{p['count']}" for n, p in providers.items())
+    print(f"[PRECEDENT SEARCH] {len(merged)} merged results in {elapsed:.0f}ms ({summary})")
+    return {"results": merged, "providers": providers}
+
+
+def search_precedents(query: str, limit: int = 5) -> list[dict]:
+    """
+    Search Indian Kanoon, CourtListener and Google Scholar at once for case
+    precedents; returns the merged, deduplicated list.
+    """
+    results = search_precedents_detailed(query, limit)["results"]
+    if not results:
+        return [{"name": "No matching precedents found.", "court": "", "year": "", "url": "", "confidence": 0}]
+    return results
+
+
+def start_precedent_search(query: str, limit: int = 5):
+    """Runs search_precedents_detailed in the background; returns its Future."""
+    return _request_pool.submit(search_precedents_detailed, query, limit)
@@ -0,0 +1,278 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from db import connection
+
+STORE_DB = os.getenv("PRECEDENT_STORE_DB", "precedent_store.db")
+# Embedding index on top of full-text search; set to 0 to run on FTS alone.
+USE_EMBEDDINGS = os.getenv("PRECEDENT_STORE_EMBEDDINGS", "1") == "1"
+# A stored case counts as a local hit at or above this score (cosine
+# similarity, or query-term coverage when embeddings are off).
+LOCAL_MATCH_THRESHOLD = float(os.getenv("PRECEDENT_LOCAL_THRESHOLD", "0.55"))
+# Local results needed before the network providers are skipped.
+LOCAL_MIN_RESULTS = int(os.getenv("PRECEDENT_LOCAL_MIN_RESULTS", "3"))
+FTS_CANDIDATES = 50
+
+CITATION_PATTERNS = [
+    re.compile(r"\(\d{4}\)\s*\d+\s*SCC\s*\d+", re.I),
+    re.compile(r"AIR\s*\d{4}\s*[A-Z]{2,4}\s*\d+", re.I),
+    re.compile(r"\d{4}\s*SCC\s*OnLine\s*[A-Za-z]+\s*\d+", re.I),
+    re.compile(r"\d+\s*U\.\s*S\.\s*\d+", re.I),
+]
+_V_RE = re.compile(r"\b(?:versus|vs|v)\b\.?", re.I)
+_FILLER_RE = re.compile(r"\b(?:the|and|ors|anr|others|another)\b")
+_STOPWORDS = {"a", "an", "the", "of", "in", "on", "to", "for", "and", "or", "is", "are", "was", "with", "by",
+              "as", "at", "be", "this", "that", "v", "vs", "case", "cases", "law", "legal"}
+
+_write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precedent-store")
+_index_lock = threading.Lock()
+_vectors: Optional[np.ndarray] = None   # row-normalized embeddings, aligned with _vector_ids
+_vector_buffer: Optional[np.ndarray] = None  # _vectors is a view of its first rows; spare rows take appends
+_vector_ids: List[int] = []
+_vector_rows: Dict[int, int] = {}
+_schema_ready = set()
+
+
+def normalize_case_name(name: str) -> str:
+    """'The State of X vs. Y & Ors.' -> 'state of x v y'"""
+    name = _V_RE.sub(" v ", (name or "").lower())
+    name = re.sub(r"\bon\s+\d{1,2}\s+\w+,?\s+\d{4}\b", " ", name)  # Indian Kanoon's "on 12 March, 2001"
+    name = re.sub(r"[^\w\s]", " ", name)
+    name = _FILLER_RE.sub(" ", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def extract_citation(result: Dict[str, Any]) -> str:
+    """Reporter citation found in the title or snippet, normalized; '' if none."""
+    text = f"{result.get('name', '')} {result.get('snippet', '')}"
+    for pattern in CITATION_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return re.sub(r"[\s.]+", "", match.group(0)).upper()
+    return ""
+
+
+def _connect(db_path: str = STORE_DB, immediate: bool = False):
+    """Pooled transaction on the store, creating the schema on first use."""
+    if db_path not in _schema_ready:
+        with connection(db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS precedents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    case_key TEXT UNIQUE NOT NULL,
+                    name TEXT,
+                    court TEXT,
+                    year TEXT,
+                    url TEXT,
+                    snippet TEXT,
+                    citation TEXT,
+                    sources TEXT,
+                    embedding BLOB,
+                    first_seen REAL,
+                    last_seen REAL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS precedents_fts USING fts5(
+                    name, court, snippet, content='precedents', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS precedents_ai AFTER INSERT ON precedents BEGIN
+                    INSERT INTO precedents_fts(rowid, name, court, snippet) VALUES (new.id, new.name, new.court, new.snippet);
+                END;
+                CREATE TRIGGER IF NOT EXISTS precedents_au AFTER UPDATE OF name, court, snippet ON precedents BEGIN
+                    INSERT INTO precedents_fts(precedents_fts, rowid, name, court, snippet)
+                        VALUES ('delete', old.id, old.name, old.court, old.snippet);
+                    INSERT INTO precedents_fts(rowid, name, court, snippet) VALUES (new.id, new.name, new.court, new.snippet);
+                END;
+            """)
+        _schema_ready.add(db_path)
+    return connection(db_path, immediate=immediate)
+
+
+def _case_text(case: Dict[str, Any]) -> str:
+    return f"{case.get('name', '')}. {case.get('court', '')} {case.get('year', '')}. {case.get('snippet', '')}".strip()
+
+
+def _embed(texts: List[str]) -> Optional[np.ndarray]:
+    if not USE_EMBEDDINGS or not texts:
+        return None
+    try:
+        from tools import get_embeddings
+        vectors = np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+    except Exception as e:
+        print(f"[PRECEDENT STORE] Embedding failed, using full-text only: {e}")
+        return None
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
+
+
+@lru_cache(maxsize=256)
+def _query_vector(query: str) -> Optional[np.ndarray]:
+    vectors = _embed([query])
+    return vectors[0] if vectors is not None else None
+
+
+def upsert_cases(cases: List[Dict[str, Any]], source: str, db_path: str = STORE_DB) -> int:
+    """Inserts or refreshes fetched cases (matched by citation or normalized name). Returns rows written."""
+    rows = []
+    for case in cases:
+        name = (case.get("name") or case.get("title") or "").strip()
+        if not name or not case.get("url"):
+            continue
+        citation = extract_citation(case)
+        case_key = f"cite:{citation}" if citation else f"name:{normalize_case_name(name)}"
+        rows.append((case_key, dict(case, name=name), citation))
+    if not rows:
+        return 0
+
+    vectors = _embed([_case_text(case) for _, case, _ in rows])
+    now = time.time()
+    updated: Dict[int, np.ndarray] = {}
+    with _connect(db_path, immediate=True) as conn:
+        for i, (case_key, case, citation) in enumerate(rows):
+            embedding = vectors[i].tobytes() if vectors is not None else None
+            existing = conn.execute("SELECT sources FROM precedents WHERE case_key = ?", (case_key,)).fetchone()
+            sources = sorted(set(json.loads(existing[0]) if existing else []) | {source})
+            conn.execute("""
+                INSERT INTO precedents (case_key, name, court, year, url, snippet, citation, sources,
+                                        embedding, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(case_key) DO UPDATE SET
+                    court = COALESCE(NULLIF(excluded.court, ''), precedents.court),
+                    year = COALESCE(NULLIF(excluded.year, ''), precedents.year),
+                    snippet = COALESCE(NULLIF(excluded.snippet, ''), precedents.snippet),
+                    citation = COALESCE(NULLIF(excluded.citation, ''), precedents.citation),
+                    sources = excluded.sources,
+                    embedding = COALESCE(excluded.embedding, precedents.embedding),
+                    last_seen = excluded.last_seen
+            """, (case_key, case["name"], case.get("court", ""), str(case.get("year", "")), case["url"],
+                  case.get("snippet", ""), citation, json.dumps(sources), embedding, now, now))
+            if vectors is not None:
+                row_id = conn.execute("SELECT id FROM precedents WHERE case_key = ?", (case_key,)).fetchone()[0]
+                updated[row_id] = vectors[i]
+    if updated:
+        _update_vectors(updated)
+    return len(rows)
+
+
+def remember(source: str, cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Stores freshly fetched cases in the background and passes them through unchanged."""
+    if cases:
+        _write_pool.submit(_safe_upsert, list(cases), source)
+    return cases
+
+
+def _safe_upsert(cases, source):
+    try:
+        upsert_cases(cases, source)
+    except Exception as e:
+        print(f"[PRECEDENT STORE] Upsert failed: {e}")
+
+
+def _load_vectors(conn: sqlite3.Connection) -> None:
+    global _vectors, _vector_buffer, _vector_ids, _vector_rows
+    rows = conn.execute("SELECT id, embedding FROM precedents WHERE embedding IS NOT NULL").fetchall()
+    _vector_ids = [r[0] for r in rows]
+    _vector_rows = {row_id: j for j, row_id in enumerate(_vector_ids)}
+    _vector_buffer = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows]) if rows else None
+    _vectors = _vector_buffer if rows else np.zeros((0, 0), dtype=np.float32)
+
+
+def _update_vectors(updated: Dict[int, np.ndarray]) -> None:
+    """
+    Applies upserted embeddings to the loaded index in place: known ids are
+    overwritten, new ids appended to the buffer (grown by doubling), so a
+    search after an upsert doesn't reload every embedding from SQLite.
+    """
+    global _vectors, _vector_buffer
+    with _index_lock:
+        if _vectors is None:
+            return  # not loaded yet; the first search reads everything
+        new_ids = [row_id for row_id in updated if row_id not in _vector_rows]
+        size = len(_vector_ids)
+        dim = len(next(iter(updated.values())))
+        if _vector_buffer is None or _vector_buffer.shape[1] != dim:
+            if size:
+                _vectors = None  # embedding model changed; reload on the next search
+                return
+            _vector_buffer = np.zeros((0, dim), dtype=np.float32)
+        if size + len(new_ids) > len(_vector_buffer):
+            grown = np.zeros((max(2 * len(_vector_buffer), size + len(new_ids), 64), dim), dtype=np.float32)
+            grown[:size] = _vector_buffer[:size]
+            _vector_buffer = grown
+        for row_id in new_ids:
+            _vector_rows[row_id] = len(_vector_ids)
+            _vector_ids.append(row_id)
+        for row_id, vector in updated.items():
+            _vector_buffer[_vector_rows[row_id]] = vector
+        _vectors = _vector_buffer[:len(_vector_ids)]
+
+
+def _query_terms(query: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z0-9]+", (query or "").lower()) if w not in _STOPWORDS and len(w) > 1]
+
+
+def search_local(query: str, limit: int = 5, db_path: str = STORE_DB) -> List[Dict[str, Any]]:
+    """
+    Stored cases matching `query`, best first, each with a "local_score".
+    Candidates come from full-text search and from the embedding index.
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return []
+    query_vector = _query_vector(" ".join(query.split()))
+
+    with _connect(db_path) as conn:
+        candidates = set(r[0] for r in conn.execute(
+            "SELECT rowid FROM precedents_fts WHERE precedents_fts MATCH ? ORDER BY bm25(precedents_fts) LIMIT ?",
+            (" OR ".join(f'"{t}"' for t in terms), FTS_CANDIDATES),
+        ))
+        scores: Dict[int, float] = {}
+        if query_vector is not None:
+            with _index_lock:
+                if _vectors is None:
+                    _load_vectors(conn)
+                vectors, ids, rows_by_id = _vectors, _vector_ids, _vector_rows
+            if len(vectors):
+                # Cosine score for every embedded case; the nearest ones join the FTS candidates.
+                # ids / rows_by_id may gain entries from a concurrent upsert past len(vectors).
+                similarity = vectors @ query_vector
+                candidates |= {ids[j] for j in np.argsort(-similarity)[:FTS_CANDIDATES]}
+                positions = {row_id: rows_by_id.get(row_id) for row_id in candidates}
+                scores = {row_id: float(similarity[j]) for row_id, j in positions.items()
+                          if j is not None and j < len(similarity)}
+        if not candidates:
+            return []
+
+        placeholders = ",".join("?" * len(candidates))
+        rows = conn.execute(
+            f"SELECT id, name, court, year, url, snippet, citation, sources FROM precedents WHERE id IN ({placeholders})",
+            list(candidates),
+        ).fetchall()
+
+    results = []
+    for row_id, name, court, year, url, snippet, citation, sources in rows:
+        if row_id in scores:
+            score = scores[row_id]
+        else:
+            text_terms = set(_query_terms(f"{name} {court} {snippet}"))
+            score = len(text_terms & set(terms)) / len(set(terms))
+        results.append({
+            "name": name, "court": court, "year": year, "url": url, "snippet": snippet,
+            "citation": citation, "confidence": round(max(0.0, min(1.0, score)), 2),
+            "sources": json.loads(sources or "[]") + ["local"], "local_score": round(score, 3),
+        })
+    results.sort(key=lambda r: r["local_score"], reverse=True)
+    return results[:limit]
+
+
+def local_recall_sufficient(results: List[Dict[str, Any]], limit: int) -> bool:
+    """True if enough stored cases match well that the network can be skipped."""
+    needed = min(limit, LOCAL_MIN_RESULTS)
+    return sum(1 for r in results if r["local_score"] >= LOCAL_MATCH_THRESHOLD) >= needed
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from rate_limiter import estimate_tokens
+
+# Token budget for everything we put in front of Gemini on a chat turn.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "800"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+MIN_CONTEXT_TOKENS = 500
+
+# Always included (short identifying fields)
+HEADER_FIELDS = ["case_title", "court", "year"]
+
+# Summary field -> query words that make it relevant
+# Matched as whole words (plus a plural "s"), so inflections are listed explicitly:
+# a bare stem would also hit unrelated words ("act" in "action", "law" in "lawyer").
+FIELD_KEYWORDS = {
+    "key_issues": ["issue", "question", "dispute", "disputed", "problem", "matter", "about"],
+    "arguments": ["argument", "argue", "argued", "arguing", "contend", "contended", "contending",
+                  "contention", "submission", "submit", "submitted", "plea", "pleaded",
+                  "petitioner", "respondent", "appellant", "plaintiff", "defendant", "side"],
+    "citations_present": ["citation", "cite", "cited", "citing", "precedent", "case law", "relied", "referred"],
+    "judgement_summary": ["judgment", "judgement", "held", "hold", "decision", "decide", "decided", "verdict",
+                          "outcome", "order", "ordered", "ruling", "ruled", "result", "conclusion", "concluded",
+                          "win", "won", "dismiss", "dismissed", "dismissal", "allow", "allowed"],
+    "important_sections": ["section", "act", "provision", "statute", "statutory", "article", "rule", "law",
+                           "ipc", "crpc"],
+    "important_clauses": ["clause", "term", "condition", "agreement", "contract", "contractual",
+                          "obligation", "liability", "liable"],
+    "key_takeaways": ["takeaway", "lesson", "implication", "important", "key point", "significance"],
+}
+DEFAULT_FIELDS = ["key_issues", "judgement_summary"]
+FULL_SUMMARY_WORDS = ["summary", "summarise", "summarize", "summarised", "summarized", "overview", "everything", "explain the case", "brief"]
+
+
+def _normalize_key(key: str) -> str:
+    key = re.sub(r"[^a-z0-9]+", "_", key.strip().lower()).strip("_")
+    return "judgement_summary" if key == "judgment_summary" else key
+
+
+@lru_cache(maxsize=256)
+def _parse_summary_cached(summary_text: str) -> tuple:
+    match = re.search(r"\{.*\}", summary_text, flags=re.S)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            if isinstance(data, dict):
+                return tuple((_normalize_key(k), v) for k, v in data.items())
+        except json.JSONDecodeError:
+            pass
+    return (("raw_summary", summary_text.strip()),)
+
+
+def parse_summary(summary_text: Optional[str]) -> Dict[str, object]:
+    """
+    Parses the stored summarizer output (a JSON blob, possibly fenced or with
+    prose around it) into a dict keyed by normalized field name. Parsed once per
+    distinct summary text. Falls back to {"raw_summary": text} if no JSON is found.
+    """
+    if not summary_text or not summary_text.strip():
+        return {}
+    return dict(_parse_summary_cached(summary_text))
+
+
+def _format_value(value) -> str:
+    if isinstance(value, list):
+        return "; ".join(_format_value(v) for v in value)
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {_format_value(v)}" for k, v in value.items())
+    return str(value).strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to roughly `max_tokens`, preferring a paragraph or sentence boundary."""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text or ""
+    limit = max(0, max_tokens * 4)
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n\n"), cut.rfind(". "))
+    if boundary > limit // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + "\n... [truncated]"
+
+
+def _mentions(words: List[str], text: str) -> bool:
+    """True if `text` contains one of `words` as a whole word (a plural "s" is allowed)."""
+    return any(re.search(rf"\b{re.escape(w)}s?\b", text) for w in words)
+
+
+def select_summary_fields(fields: Dict[str, object], query: str) -> List[str]:
+    """Picks the summary fields relevant to `query` (header fields are always kept)."""
+    lowered = (query or "").lower()
+    if "raw_summary" in fields:
+        return ["raw_summary"]
+    if _mentions(FULL_SUMMARY_WORDS, lowered):
+        return list(fields)
+
+    selected = [f for f in HEADER_FIELDS if f in fields]
+    matched = [f for f, words in FIELD_KEYWORDS.items()
+               if f in fields and _mentions(words, lowered)]
+    selected += matched or [f for f in DEFAULT_FIELDS if f in fields]
+    return selected
+
+
+def build_summary_context(summary_text: Optional[str], query: str, max_tokens: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """Renders only the query-relevant summary fields, capped at `max_tokens`."""
+    fields = parse_summary(summary_text)
+    if not fields:
+        return "No summary available."
+
+    if "raw_summary" in fields:
+        return truncate_to_tokens(_format_value(fields["raw_summary"]), max_tokens)
+
+    lines = []
+    for name in select_summary_fields(fields, query):
+        value = _format_value(fields[name])
+        if value:
+            lines.append(f"- {name.replace('_', ' ').title()}: {value}")
+    return truncate_to_tokens("\n".join(lines), max_tokens) or "No summary available."
+
+
+def fit_retrieved_context(context: str, max_tokens: int) -> str:
+    """Keeps whole retrieved chunks (separated by blank lines) until the budget is used."""
+    if not context or estimate_tokens(context) <= max_tokens:
+        return context
+    kept, used = [], 0
+    for chunk in context.split("\n\n"):
+        cost = estimate_tokens(chunk)
+        if used + cost > max_tokens:
+            if not kept:
+                kept.append(truncate_to_tokens(chunk, max_tokens))
+            break
+        kept.append(chunk)
+        used += cost
+    return "\n\n".join(kept)
+
+
+def context_budget(*sections: str, reserved: int = 0, total: int = PROMPT_TOKEN_BUDGET) -> int:
+    """Tokens left for retrieved context after the given prompt sections and `reserved` tokens."""
+    used = reserved + sum(estimate_tokens(s) for s in sections if s)
+    return max(MIN_CONTEXT_TOKENS, total - used)
+
+
+def log_prompt_tokens(label: str, prompt: str) -> int:
+    tokens = estimate_tokens(prompt)
+    print(f"[PROMPT] {label}: ~{tokens} tokens")
+    return tokens
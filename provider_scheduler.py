@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+from rate_limiter import TokenBucket
+
+STATE_CLOSED = "closed"        # healthy, calls go through
+STATE_OPEN = "open"            # failing, calls are skipped until the reset timeout
+STATE_HALF_OPEN = "half_open"  # one trial call is let through to probe recovery
+
+# Requests per minute each external provider allows us (env: PROVIDER_RPM_<NAME>).
+DEFAULT_PROVIDER_RPM = {
+    "indiankanoon": 30,
+    "google_scholar": 20,
+    "courtlistener": 60,
+    "tavily": 30,
+    "geoapify": 60,
+}
+FAILURE_THRESHOLD = int(os.getenv("PROVIDER_FAILURE_THRESHOLD", "4"))
+RESET_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_RESET_TIMEOUT", "60"))
+# Longest we'll queue for a provider's quota before skipping it.
+MAX_QUOTA_WAIT_SECONDS = float(os.getenv("PROVIDER_MAX_QUOTA_WAIT", "2"))
+LATENCY_WINDOW = 200
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider that is open-circuited, out of quota or not configured."""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; probes again after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = STATE_HALF_OPEN
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Ends a half-open trial that never reached the provider."""
+        with self._lock:
+            self._trial_running = False
+
+
+class Provider:
+    def __init__(self, name: str, rpm: float):
+        self.name = name
+        self.bucket = TokenBucket(rpm, 60.0)
+        self.breaker = CircuitBreaker()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "skipped": 0}
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def count(self, field: str, latency: float = None, error: str = None) -> None:
+        with self._lock:
+            self.counters[field] += 1
+            if latency is not None:
+                self.latencies.append(latency)
+            if error is not None:
+                self.last_error = error[:200]
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            counters = dict(self.counters)
+            last_error = self.last_error
+        finished = counters["successes"] + counters["failures"]
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+        return {
+            "state": self.breaker.state,
+            "healthy": self.breaker.state == STATE_CLOSED,
+            **counters,
+            "error_rate": round(counters["failures"] / finished, 3) if finished else 0.0,
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p95": percentile(0.95),
+            "last_error": last_error,
+        }
+
+
+class ProviderScheduler:
+    """
+    Gatekeeper for external search APIs: a per-provider token bucket, a circuit
+    breaker, and latency / error metrics. Providers that are open-circuited or
+    out of quota are skipped at once with ProviderUnavailable instead of
+    spending a network timeout.
+    """
+
+    def __init__(self, rpm_by_provider: Dict[str, float]):
+        self.providers = {name: Provider(name, rpm) for name, rpm in rpm_by_provider.items()}
+
+    def call(self, name: str, fn: Callable, *args, **kwargs):
+        provider = self.providers[name]
+        if not provider.breaker.allow():
+            provider.count("skipped")
+            raise ProviderUnavailable(name, "circuit open")
+
+        # Waiters woken together race for the refilled token; losers wait again
+        # until the call has a token or MAX_QUOTA_WAIT_SECONDS has passed
+        deadline = time.monotonic() + MAX_QUOTA_WAIT_SECONDS
+        wait = provider.bucket.try_take(1)
+        while wait:
+            if time.monotonic() + wait > deadline:
+                provider.breaker.release()
+                provider.count("skipped")
+                raise ProviderUnavailable(name, f"rate limited for {wait:.0f}s")
+            time.sleep(wait)
+            wait = provider.bucket.try_take(1)
+
+        provider.count("calls")
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except ProviderUnavailable:
+            provider.breaker.release()
+            provider.count("skipped")
+            raise
+        except Exception as e:
+            provider.breaker.record_failure()
+            provider.count("failures", time.perf_counter() - started, str(e))
+            if provider.breaker.state == STATE_OPEN:
+                print(f"[PROVIDERS] {name} circuit open after: {e}")
+            raise
+        provider.breaker.record_success()
+        provider.count("successes", time.perf_counter() - started)
+        return result
+
+    def remaining_quota(self, name: str) -> int:
+        """Calls `name` could make right now without waiting for its quota."""
+        return int(self.providers[name].bucket.available())
+
+    def is_available(self, name: str) -> bool:
+        return self.providers[name].breaker.state != STATE_OPEN
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        return {name: provider.health() for name, provider in self.providers.items()}
+
+
+def _rpm_from_env() -> Dict[str, float]:
+    return {name: float(os.getenv(f"PROVIDER_RPM_{name.upper()}", str(rpm)))
+            for name, rpm in DEFAULT_PROVIDER_RPM.items()}
+
+
+provider_scheduler = ProviderScheduler(_rpm_from_env())
@@ -0,0 +1,77 @@
+import re
+
+# Routes returned by classify_query()
+ROUTE_GREETING = "greeting"   # answer locally, no LLM call
+ROUTE_DOCUMENT = "document"   # retrieval + a single Gemini call
+ROUTE_AGENT = "agent"         # full tool-calling autogen loop
+
+# Short messages are answered locally only if every word is one of these and
+# at least one of them is a greeting, thanks or goodbye word; the filler words
+# alone ("so", "you", "good") never make a greeting.
+GREETING_WORDS = {"hi", "hii", "hello", "hey", "hiya", "namaste", "greetings", "morning", "afternoon", "evening"}
+THANKS_WORDS = {"thanks", "thank", "thx", "ty"}
+GOODBYE_WORDS = {"bye", "goodbye", "cya"}
+FILLER_WORDS = {"there", "you", "so", "much", "very", "good", "lexilaw", "see", "later", "a", "lot"}
+
+# Anything that needs external search keeps going through the agent.
+AGENT_PATTERNS = [
+    r"\bprecedents?\b", r"\bcase ?laws?\b", r"\bsimilar cases?\b", r"\bjudgements? on\b",
+    r"\bkanoon\b", r"\bsearch\b", r"\bweb\b", r"\bonline\b", r"\binternet\b", r"\blatest\b",
+    r"\brecent\b", r"\bnews\b", r"\bcurrent(ly)?\b", r"\btoday\b", r"\b20\d\d\b",
+    r"\bsupreme court (has|held|ruled)\b", r"\bother cases?\b",
+]
+
+# Only phrases that clearly point at the uploaded document: generic legal terms
+# ("section 420", "held", "bench") are general questions that need the agent's
+# search tools, not the document-only prompt.
+DOCUMENT_PATTERNS = [
+    r"\b(this|the|my) (uploaded )?(document|doc|pdf|file)\b", r"\buploaded\b",
+    r"\bthis (case|judg(e)?ment|order|agreement|contract|petition|appeal|act|deed)\b",
+    r"\b(paragraph|para|page|clause) \d+\b", r"\b(this|that) (clause|section|paragraph|page)\b",
+    r"\b(the|this) (petitioner|respondent|appellant|plaintiff|defendant|accused)s?\b",
+    r"\bsummar(y|ise|ize)\b", r"\bkey (issues|points|takeaways|arguments)\b",
+    r"\bwhat does it say\b", r"\baccording to (it|the (document|pdf|file|judg(e)?ment|order))\b",
+]
+
+
+def _tokens(query: str) -> list[str]:
+    return re.findall(r"[a-z']+", query.lower())
+
+
+def is_greeting(query: str) -> bool:
+    """True for short messages made only of greeting / closing words."""
+    words = _tokens(query)
+    core = GREETING_WORDS | THANKS_WORDS | GOODBYE_WORDS
+    return (0 < len(words) <= 6 and all(w in core or w in FILLER_WORDS for w in words)
+            and any(w in core for w in words))
+
+
+def classify_query(query: str, has_index: bool) -> str:
+    """
+    Picks the cheapest path that can answer the query.
+    Greetings never reach Gemini, obvious questions about the uploaded document
+    get retrieval plus one Gemini call, everything else runs the full agent.
+    """
+    if not query or not query.strip():
+        return ROUTE_GREETING
+    if is_greeting(query):
+        return ROUTE_GREETING
+
+    lowered = query.lower()
+    if any(re.search(p, lowered) for p in AGENT_PATTERNS):
+        return ROUTE_AGENT
+    if has_index and any(re.search(p, lowered) for p in DOCUMENT_PATTERNS):
+        return ROUTE_DOCUMENT
+    return ROUTE_AGENT
+
+
+def greeting_reply(query: str, pdf_name: str = None) -> str:
+    """Canned reply for greetings, thanks and goodbyes."""
+    words = set(_tokens(query))
+    if words & THANKS_WORDS:
+        return "You're welcome! Feel free to ask if you have any more legal questions."
+    if words & GOODBYE_WORDS:
+        return "Goodbye! Come back anytime you have a legal question."
+    if pdf_name:
+        return f"Hello! I'm LexiLaw. Ask me anything about \"{pdf_name}\" or any other legal question."
+    return "Hello! I'm LexiLaw, your legal assistant. Upload a document or ask me a legal question."
@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from dotenv import load_dotenv
+
+from db import connection
+
+load_dotenv()
+
+# Lower number = served first. /chat runs as interactive, summarization,
+# precedent finding and fact checks run as background work.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+_local = threading.local()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for TPM accounting."""
+    if not text:
+        return 1
+    return max(1, len(text) // 4)
+
+
+def current_priority() -> int:
+    return getattr(_local, "priority", PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """Run every LLM call made by this thread inside the block at the given priority."""
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+# -------------------------
+# Token buckets
+# -------------------------
+class TokenBucket:
+    """In-process token bucket. `capacity` tokens refill evenly over `period` seconds."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self, amount: float) -> float:
+        """Take `amount` tokens. Returns 0 on success, otherwise seconds to wait."""
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def give_back(self, amount: float) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def available(self) -> float:
+        """Tokens that could be taken right now."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class SQLiteTokenBucket:
+    """Token bucket whose state lives in a SQLite file, shared by every process using it."""
+
+    def __init__(self, name: str, capacity: float, period: float = 60.0, db_path: str = "rate_limits.db"):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.db_path = db_path
+        with connection(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def _update(self, delta_fn) -> float:
+        with connection(self.db_path, immediate=True) as conn:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            if row:
+                tokens = min(self.capacity, row[0] + (now - row[1]) * self.rate)
+            else:
+                tokens = self.capacity
+            tokens, wait = delta_fn(tokens)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, tokens, now),
+            )
+        return wait
+
+    def try_take(self, amount: float) -> float:
+        amount = min(float(amount), self.capacity)
+
+        def take(tokens):
+            if tokens >= amount:
+                return tokens - amount, 0.0
+            return tokens, (amount - tokens) / self.rate
+
+        return self._update(take)
+
+    def give_back(self, amount: float) -> None:
+        self._update(lambda tokens: (min(self.capacity, tokens + amount), 0.0))
+
+
+# -------------------------
+# Limiter
+# -------------------------
+class LLMRateLimiter:
+    """
+    Coordinates all Gemini calls made under one API key.
+
+    Enforces requests/min and tokens/min through two token buckets and caps the
+    number of in-flight calls. Background work never takes the slots reserved for
+    interactive calls and always yields while an interactive call is waiting.
+    The in-flight cap is per process; the buckets can be shared across processes
+    by using SQLiteTokenBucket.
+    """
+
+    def __init__(self, request_bucket, token_bucket, max_in_flight: int = 4, reserved_interactive: int = 1):
+        self.request_bucket = request_bucket
+        self.token_bucket = token_bucket
+        self.max_in_flight = max(1, max_in_flight)
+        self.reserved_interactive = min(max(0, reserved_interactive), self.max_in_flight - 1)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting: Dict[int, int] = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+
+    def _slot_limit(self, priority: int) -> int:
+        if priority == PRIORITY_INTERACTIVE:
+            return self.max_in_flight
+        return self.max_in_flight - self.reserved_interactive
+
+    def _try_admit(self, tokens: int, priority: int) -> Optional[float]:
+        """Returns None when admitted, otherwise how long to wait before retrying."""
+        if priority != PRIORITY_INTERACTIVE and self._waiting[PRIORITY_INTERACTIVE]:
+            return 0.5
+        if self._in_flight >= self._slot_limit(priority):
+            return 0.5
+        wait = self.token_bucket.try_take(tokens)
+        if wait:
+            return wait
+        wait = self.request_bucket.try_take(1)
+        if wait:
+            self.token_bucket.give_back(tokens)
+            return wait
+        self._in_flight += 1
+        return None
+
+    @contextmanager
+    def acquire(self, tokens: int = 1, priority: Optional[int] = None) -> Iterator[None]:
+        """Blocks until the call may proceed, then holds an in-flight slot for the block."""
+        priority = current_priority() if priority is None else priority
+        waited_from = time.monotonic()
+        with self._cond:
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+            try:
+                while True:
+                    wait = self._try_admit(tokens, priority)
+                    if wait is None:
+                        break
+                    self._cond.wait(timeout=min(wait, 5.0))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+        waited = time.monotonic() - waited_from
+        if waited > 1:
+            print(f"[RATE LIMIT] Waited {waited:.1f}s for a Gemini slot (priority={priority})")
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+
+def build_limiter_from_env() -> LLMRateLimiter:
+    """
+    Builds the limiter from environment settings:
+    GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_IN_FLIGHT, GEMINI_RESERVED_INTERACTIVE and
+    GEMINI_LIMITER_DB (set to a SQLite path to share the budget across processes).
+    """
+    rpm = float(os.getenv("GEMINI_RPM", "30"))
+    tpm = float(os.getenv("GEMINI_TPM", "250000"))
+    max_in_flight = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "4"))
+    reserved = int(os.getenv("GEMINI_RESERVED_INTERACTIVE", "1"))
+    db_path = os.getenv("GEMINI_LIMITER_DB")
+
+    if db_path:
+        request_bucket = SQLiteTokenBucket("gemini_requests", rpm, db_path=db_path)
+        token_bucket = SQLiteTokenBucket("gemini_tokens", tpm, db_path=db_path)
+    else:
+        request_bucket = TokenBucket(rpm)
+        token_bucket = TokenBucket(tpm)
+    return LLMRateLimiter(request_bucket, token_bucket, max_in_flight, reserved)
+
+
+gemini_limiter = build_limiter_from_env()
@@ -0,0 +1,81 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+
+from tools import retrieve_legal_context_with_chunks
+
+# Minimum word overlap between the raw user query and the tool-call query for
+# the prefetched result to be reused.
+PREFETCH_SIMILARITY = float(os.getenv("PREFETCH_SIMILARITY", "0.6"))
+PREFETCH_WAIT_SECONDS = 20
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "to", "for", "and", "or", "is", "are", "was", "were",
+    "what", "which", "who", "whom", "how", "does", "do", "did", "this", "that", "it", "its",
+    "about", "with", "by", "as", "be", "can", "please", "tell", "me", "give", "explain",
+}
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+
+def _terms(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if w not in STOPWORDS}
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the content words of two queries (0.0–1.0)."""
+    ta, tb = _terms(a), _terms(b)
+    if not ta or not tb:
+        return 1.0 if a.strip().lower() == b.strip().lower() else 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+class RetrievalPrefetch:
+    """
+    Speculative vector search started as soon as a /chat request arrives, so that
+    retrieval overlaps the first Gemini turn instead of following it.
+    """
+
+    def __init__(self, query: str, persist_dir: str, k: int = 5):
+        self.query = query
+        self.persist_dir = persist_dir
+        self.k = k
+        self.future = _prefetch_pool.submit(retrieve_legal_context_with_chunks, query, persist_dir=persist_dir, k=k)
+
+    def get(self, query: str, persist_dir: Optional[str] = None, k: int = 5) -> Optional[str]:
+        """Returns the prefetched context if it can serve `query`, otherwise None."""
+        result = self._result(query, persist_dir, k)
+        return result[0] if result is not None else None
+
+    def get_chunks(self, query: str, persist_dir: Optional[str] = None, k: int = 5) -> Optional[list]:
+        """Like get(), but returns the retrieved chunks with their page / chunk references."""
+        result = self._result(query, persist_dir, k)
+        return result[1] if result is not None else None
+
+    def _result(self, query: str, persist_dir: Optional[str], k: int) -> Optional[tuple]:
+        if persist_dir and persist_dir != self.persist_dir:
+            return None
+        if k != self.k:
+            return None
+        similarity = query_similarity(self.query, query)
+        if similarity < PREFETCH_SIMILARITY:
+            print(f"[PREFETCH] Miss (similarity {similarity:.2f}): {query[:60]}")
+            return None
+        try:
+            result = self.future.result(timeout=PREFETCH_WAIT_SECONDS)
+        except FutureTimeout:
+            print("[PREFETCH] Timed out waiting for speculative retrieval.")
+            return None
+        except Exception as e:
+            print(f"[PREFETCH] Speculative retrieval failed: {e}")
+            return None
+        print(f"[PREFETCH] Hit (similarity {similarity:.2f})")
+        return result
+
+
+def start_prefetch(query: str, persist_dir: Optional[str]) -> Optional[RetrievalPrefetch]:
+    """Starts a speculative retrieval for `query` if the user has an index."""
+    if not query or not persist_dir or not os.path.exists(persist_dir):
+        return None
+    return RetrievalPrefetch(query, persist_dir)
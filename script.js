@@ -6,6 +6,8 @@ let APP_STATE = {
   summary: null,
   pdfName: null,
   chatHistory: [],
+  chatCursor: null,        // cursor for the next older page of /chat-history
+  loadingOlderChat: false,
   currentDocumentId: null,
 };
 
@@ -116,6 +118,8 @@ function logoutUser() {
     summary: null,
     pdfName: null,
     chatHistory: [],
+    chatCursor: null,
+    loadingOlderChat: false,
     currentDocumentId: null,
   };
   localStorage.removeItem('legal_app_token');
@@ -148,9 +152,6 @@ document.addEventListener('DOMContentLoaded', async () => {
       APP_STATE.token = token;
       APP_STATE.userId = userData.user_id;
       APP_STATE.username = userData.username;
-      APP_STATE.summary = userData.summary;
-      APP_STATE.pdfName = userData.pdf_name;
-      APP_STATE.chatHistory = userData.chat_history || [];
       APP_STATE.currentDocumentId = userData.current_document_id || null;
       initializeAppUI(userData);
     } catch (e) {
@@ -188,37 +189,60 @@ async function loadDocuments() {
   }
 }
 
-function initializeAppUI(userData) {
-  authPage && (authPage.style.display = 'none');
-  appPage && (appPage.style.display = 'flex');
-  if (welcomeMessage) welcomeMessage.textContent = `Welcome, ${userData.username || 'User'}!`;
+// GET helper for the per-user resources. The server sends ETags, so the
+// browser cache revalidates these and a 304 reuses the cached body.
+async function fetchJson(path) {
+  const res = await fetch(`${API_URL}${path}`, { headers: authHeaders() });
+  if (res.status === 401) handleAuthError(res.status);
+  const data = await res.json();
+  if (!res.ok) throw new Error(data.detail || `Request failed: ${path}`);
+  return data;
+}
 
-  if (userData.summary) {
-    setMarkdownInnerHTML(summaryText, userData.summary);
+function renderSummary(summary, pdfName) {
+  APP_STATE.summary = summary;
+  APP_STATE.pdfName = pdfName;
+  if (summary) {
+    setMarkdownInnerHTML(summaryText, summary);
     summaryContainer.style.display = 'block';
   } else {
     summaryContainer.style.display = 'none';
   }
 
-  if (userData.pdf_name) {
-    uploadStatus.textContent = `✅ Index ready for: ${userData.pdf_name}`;
+  if (pdfName) {
+    uploadStatus.textContent = `✅ Index ready for: ${pdfName}`;
     uploadStatus.className = 'status-message success';
   } else {
     uploadStatus.textContent = 'ℹ️ No PDF uploaded.';
     uploadStatus.className = 'status-message info';
   }
+}
 
+async function loadSummary() {
+  const data = await fetchJson('/summary');
+  renderSummary(data.summary, data.pdf_name);
+}
+
+async function loadChatHistory() {
+  const data = await fetchJson('/chat-history');
+  APP_STATE.chatHistory = data.messages || [];
+  APP_STATE.chatCursor = data.next_cursor || null;
   chatMessages && (chatMessages.innerHTML = '');
   APP_STATE.chatHistory.forEach(msg => addMessageToChat(msg.role, msg.content, msg.source));
+  await fillChatViewport();
+}
+
+function initializeAppUI(userData) {
+  authPage && (authPage.style.display = 'none');
+  appPage && (appPage.style.display = 'flex');
+  if (welcomeMessage) welcomeMessage.textContent = `Welcome, ${userData.username || 'User'}!`;
+  chatMessages && (chatMessages.innerHTML = '');
 
-  // load docs & precedents
+  // Summary, chat and precedents load in parallel after login
+  loadSummary().catch(err => console.warn('Could not load summary', err));
+  loadChatHistory().catch(err => console.warn('Could not load chat history', err));
   loadDocuments().catch(() => {});
-  if (userData.precedents && userData.precedents.length) {
-    setMarkdownInnerHTML(precedentText, formatPrecedents(userData.precedents || []));
-    precedentContainer.style.display = 'block';
-  } else {
-    loadPreviousPrecedents();
-  }
+  loadPreviousPrecedents();
 }
 
 // ---------------------------
@@ -273,9 +297,6 @@ loginForm && loginForm.addEventListener('submit', async (ev) => {
     APP_STATE.token = data.access_token;
     APP_STATE.userId = data.user_id;
     APP_STATE.username = data.username;
-    APP_STATE.summary = data.summary;
-    APP_STATE.pdfName = data.pdf_name;
-    APP_STATE.chatHistory = data.chat_history || [];
     APP_STATE.currentDocumentId = data.current_document_id || null;
 
     localStorage.setItem('legal_app_token', data.access_token);
@@ -364,17 +385,10 @@ fileUploader && fileUploader.addEventListener('change', async () => {
 
     // Save info + refresh doc list
     APP_STATE.currentDocumentId = data.document_id;
-    APP_STATE.summary = data.summary;
-    APP_STATE.pdfName = data.pdf_name;
-    setMarkdownInnerHTML(summaryText, data.summary);
-    summaryContainer.style.display = 'block';
-    uploadStatus.textContent = `✅ Index ready for: ${data.pdf_name}`;
-    uploadStatus.className = 'status-message success';
+    renderSummary(data.summary, data.pdf_name);
 
     try {
       const user = JSON.parse(localStorage.getItem('legal_app_user') || '{}');
-      user.summary = data.summary;
-      user.pdf_name = data.pdf_name;
       user.current_document_id = data.document_id;
       localStorage.setItem('legal_app_user', JSON.stringify(user));
     } catch (err) { console.warn('Failed to update local user', err); }
@@ -429,10 +443,79 @@ precedentButton && precedentButton.addEventListener('click', async () => {
   }
 });
 
-function formatPrecedents(precedents) {
-  return precedents.map((p, i) => `**${i+1}. ${escapeHtml(p.name || 'Unnamed')}**<br>${escapeHtml(p.court || 'Unknown')} (${p.year || 'N/A'})<br>${p.url ? `[Read](${p.url})` : ''}`).join('<br><hr>');
+// ---------------------------
+// Indian Kanoon search (cursor paging)
+// ---------------------------
+const ikanoonForm = $('#ikanoon-search-form');
+const ikanoonInput = $('#ikanoon-search-input');
+const ikanoonButton = $('#ikanoon-search-button');
+
+function renderIkanoonItems(results) {
+  return results.map(p => `
+    <div class="precedent-card">
+      <b>${escapeHtml(p.name || 'Unnamed')}</b><br>
+      ${escapeHtml(p.court || 'Unknown')} (${escapeHtml(p.year || 'N/A')})<br>
+      ${p.url ? `<a href="${p.url}" target="_blank">View Case</a>` : ''}
+    </div>
+  `).join('<hr>');
 }
 
+// Without a cursor opens a new search (POST); with one, fetches the given page and appends it
+async function loadIkanoonPage(query, cursor = null, page = 0) {
+  const res = cursor
+    ? await fetch(`${API_URL}/precedents/search/${encodeURIComponent(cursor)}?page=${page}`, {
+        method: 'GET', headers: authHeaders(),
+      })
+    : await fetch(`${API_URL}/precedents/search`, {
+        method: 'POST',
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
+        body: JSON.stringify({ query }),
+      });
+  if (res.status === 401) handleAuthError(res.status);
+  const data = await res.json();
+  if (!res.ok) throw new Error(data.detail || 'Indian Kanoon search failed');
+
+  const content = $('#ikanoon-results');
+  if (!content) return;
+  content.querySelector('.load-more-precedents')?.remove();
+  if (!cursor && (!data.results || !data.results.length)) {
+    content.innerHTML = "<i>No Indian Kanoon results.</i>";
+    return;
+  }
+  const html = renderIkanoonItems(data.results || []);
+  if (cursor) content.insertAdjacentHTML('beforeend', html ? `<hr>${html}` : '');
+  else content.innerHTML = html;
+
+  if (data.has_more) {
+    const more = document.createElement('button');
+    more.className = 'load-more-precedents';
+    more.textContent = 'More results';
+    more.addEventListener('click', () => {
+      toggleButtonLoading(more, true);
+      loadIkanoonPage(query, data.cursor, data.page + 1).catch(err => {
+        showMessage(appError, err.message || String(err), true);
+        toggleButtonLoading(more, false);
+      });
+    });
+    content.appendChild(more);
+  }
+}
+
+ikanoonForm && ikanoonForm.addEventListener('submit', async (e) => {
+  e.preventDefault();
+  const query = ikanoonInput.value.trim();
+  if (!query) return;
+  toggleButtonLoading(ikanoonButton, true);
+  showMessage(appError, '', false);
+  try {
+    await loadIkanoonPage(query);
+  } catch (err) {
+    showMessage(appError, err.message || String(err), true);
+  } finally {
+    toggleButtonLoading(ikanoonButton, false);
+  }
+});
+
 function loadPreviousPrecedents() {
   fetch(`${API_URL}/get-precedents`, {
     method: 'GET',
@@ -440,7 +523,8 @@ function loadPreviousPrecedents() {
   })
   .then(res => res.json())
   .then(data => {
-    if (!Array.isArray(data) && Array.isArray(data.precedents)) data = data.precedents;
+    if (!Array.isArray(data) && Array.isArray(data.precedents_json)) data = data.precedents_json;
+    else if (!Array.isArray(data) && Array.isArray(data.precedents)) data = data.precedents;
     const pText = document.getElementById('precedent-text');
     if (!pText) return;
     if (!data || !data.length) {
@@ -449,7 +533,7 @@ function loadPreviousPrecedents() {
     }
     pText.innerHTML = data.map(p => `
       <div class="precedent-card">
-        <b>${escapeHtml(p.name)}</b><br>
+        <b>${escapeHtml(p.name || p.title || 'Unnamed')}</b><br>
         ${escapeHtml(p.court || 'Unknown')} (${escapeHtml(p.year || 'N/A')})<br>
         ${p.url ? `<a href="${p.url}" target="_blank">View Case</a><br>` : ''}
         <small>Source: ${escapeHtml(p.source || 'N/A')} • ${new Date(p.created_at || Date.now()).toLocaleString()}</small>
@@ -488,15 +572,33 @@ chatForm && chatForm.addEventListener('submit', async (e) => {
 
     updateLastAssistantMessage(data.answer, data.source);
 
-    // fact check UI (optional)
-    // Save fact checks silently (NOT shown in chat)
-if (data.fact_check && data.fact_check.length) {
+    // Fact check runs in the background on the server; collect it when ready
+    if (data.message_id && data.fact_check_status === 'pending') {
+      pollFactCheck(data.message_id).catch(err => console.warn('Fact check polling failed', err));
+    }
+
+
+    // history itself lives on the server (/chat-history)
+    APP_STATE.chatHistory.push(
+      { role: 'user', content: query },
+      { role: 'assistant', content: data.answer, source: data.source },
+    );
+
+  } catch (err) {
+    updateLastAssistantMessage(`Error: ${err.message}`, 'Error');
+  }
+});
+
+// Save fact checks silently (NOT shown in chat)
+function saveFactHistory(factCheck) {
+  if (!factCheck || !factCheck.length) return;
   try {
     const user = JSON.parse(localStorage.getItem('legal_app_user') || '{}');
 
     if (!user.fact_history) user.fact_history = [];
 
-    data.fact_check.forEach(fc => {
+    factCheck.forEach(fc => {
+      if (!fc.statement) return;
       user.fact_history.push({
         statement: fc.statement,
         supported: fc.supported,
@@ -512,24 +614,20 @@ if (data.fact_check && data.fact_check.length) {
   }
 }
 
-
-    // persist chat locally
-    APP_STATE.chatHistory.push({ role: 'user', content: query });
-    APP_STATE.chatHistory.push({ role: 'assistant', content: data.answer, source: data.source });
-    try {
-      const user = JSON.parse(localStorage.getItem('legal_app_user') || '{}');
-      user.chat_history = APP_STATE.chatHistory;
-      localStorage.setItem('legal_app_user', JSON.stringify(user));
-    } catch (err) { console.warn('Failed to update chat history locally', err); }
-
-  } catch (err) {
-    updateLastAssistantMessage(`Error: ${err.message}`, 'Error');
+async function pollFactCheck(messageId, attempts = 30, intervalMs = 2000) {
+  for (let i = 0; i < attempts; i++) {
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+    const res = await fetch(`${API_URL}/fact-check/${messageId}`, { headers: authHeaders() });
+    if (res.status === 202) continue;   // still running
+    if (!res.ok) return;
+    const data = await res.json();
+    saveFactHistory(data.fact_check);
+    return;
   }
-});
+}
 
 // Chat UI helpers
-function addMessageToChat(role, content, source = null, isLoading = false) {
-  if (!chatMessages) return;
+function buildMessageElement(role, content, source = null, isLoading = false) {
   const msgDiv = document.createElement('div');
   msgDiv.className = `chat-message ${role}`;
   const iconClass = role === 'user' ? 'fa-user' : 'fa-gavel';
@@ -545,10 +643,55 @@ function addMessageToChat(role, content, source = null, isLoading = false) {
     <div class="icon"><i class="fas ${iconClass}" style="color:${iconColor}"></i></div>
     <div class="message-content">${contentHTML}</div>
   `;
-  chatMessages.appendChild(msgDiv);
+  return msgDiv;
+}
+
+function addMessageToChat(role, content, source = null, isLoading = false) {
+  if (!chatMessages) return;
+  chatMessages.appendChild(buildMessageElement(role, content, source, isLoading));
   chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
+// Older messages are fetched a page at a time from /chat-history as the user scrolls up
+async function loadOlderMessages() {
+  if (!chatMessages || !APP_STATE.chatCursor || APP_STATE.loadingOlderChat) return;
+  APP_STATE.loadingOlderChat = true;
+  try {
+    const params = new URLSearchParams({ before: APP_STATE.chatCursor });
+    const res = await fetch(`${API_URL}/chat-history?${params}`, { headers: authHeaders() });
+    if (res.status === 401) handleAuthError(res.status);
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.detail || 'Failed to load older messages');
+
+    // Prepend while keeping the messages the user is looking at in place
+    const previousHeight = chatMessages.scrollHeight;
+    const fragment = document.createDocumentFragment();
+    data.messages.forEach(msg => fragment.appendChild(buildMessageElement(msg.role, msg.content, msg.source)));
+    chatMessages.insertBefore(fragment, chatMessages.firstChild);
+    chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+
+    APP_STATE.chatHistory = [...data.messages, ...APP_STATE.chatHistory];
+    APP_STATE.chatCursor = data.next_cursor;
+  } catch (err) {
+    console.warn('Could not load older messages', err);
+    APP_STATE.chatCursor = null;  // stop retrying on every scroll event
+  } finally {
+    APP_STATE.loadingOlderChat = false;
+  }
+}
+
+// Keeps loading pages until the chat can scroll (or history runs out)
+async function fillChatViewport() {
+  while (chatMessages && APP_STATE.chatCursor && !APP_STATE.loadingOlderChat
+         && chatMessages.scrollHeight <= chatMessages.clientHeight) {
+    await loadOlderMessages();
+  }
+}
+
+chatMessages && chatMessages.addEventListener('scroll', () => {
+  if (chatMessages.scrollTop < 80) loadOlderMessages();
+});
+
 function updateLastAssistantMessage(content, source = null) {
   if (!chatMessages) return;
   const loadingMsg = chatMessages.querySelector('.chat-message.assistant:last-child');
@@ -563,30 +706,57 @@ function updateLastAssistantMessage(content, source = null) {
 // Fact history
 // ---------------------------
 const factBtn = $("#fact-history-button");
+
+function renderFactItems(history) {
+  return history.map(h => `
+    <div class="fact-item">
+      <strong>${escapeHtml(h.statement)}</strong><br>
+      Supported: ${h.supported ? '✅' : '❌'} • Confidence: ${(h.confidence*100).toFixed(1)}%<br>
+      Evidence: ${escapeHtml(h.evidence || 'N/A')}<br>
+      <small>${new Date(h.timestamp).toLocaleString()}</small>
+    </div>
+  `).join('<hr>');
+}
+
+// Fetches one page of /fact-history; with a cursor the page is appended below the current one
+async function loadFactHistory(cursor = null) {
+  const params = cursor ? `?${new URLSearchParams({ before: cursor })}` : '';
+  const res = await fetch(`${API_URL}/fact-history${params}`, { method: 'GET', headers: authHeaders() });
+  const data = await res.json();
+  if (!res.ok) throw new Error(data.detail || 'Failed to load history');
+
+  const container = $("#fact-history-container");
+  const content = $("#fact-history-content");
+  if (!content) return;
+  container.style.display = 'block';
+  content.querySelector('.load-more-facts')?.remove();
+  if (!cursor && (!data.history || !data.history.length)) {
+    content.innerHTML = "<i>No fact checks yet.</i>";
+    return;
+  }
+  const html = renderFactItems(data.history || []);
+  if (cursor) content.insertAdjacentHTML('beforeend', html ? `<hr>${html}` : '');
+  else content.innerHTML = html;
+
+  if (data.next_cursor) {
+    const more = document.createElement('button');
+    more.className = 'load-more-facts';
+    more.textContent = 'Load older fact checks';
+    more.addEventListener('click', () => {
+      toggleButtonLoading(more, true);
+      loadFactHistory(data.next_cursor).catch(err => {
+        appError && (appError.textContent = err.message || String(err));
+        toggleButtonLoading(more, false);
+      });
+    });
+    content.appendChild(more);
+  }
+}
+
 factBtn && factBtn.addEventListener('click', async () => {
   toggleButtonLoading(factBtn, true);
   try {
-    const res = await fetch(`${API_URL}/fact-history`, { method: 'GET', headers: authHeaders() });
-    const data = await res.json();
-    if (!res.ok) throw new Error(data.detail || 'Failed to load history');
-
-    const container = $("#fact-history-container");
-    const content = $("#fact-history-content");
-    if (!content) return;
-    container.style.display = 'block';
-    if (!data.history || !data.history.length) {
-      content.innerHTML = "<i>No fact checks yet.</i>";
-    } else {
-      content.innerHTML = data.history.map(h => `
-        <div class="fact-item">
-          <strong>${escapeHtml(h.statement)}</strong><br>
-          Supported: ${h.supported ? '✅' : '❌'} • Confidence: ${(h.confidence*100).toFixed(1)}%<br>
-          Evidence: ${escapeHtml(h.evidence || 'N/A')}<br>
-          <small>${new Date(h.timestamp).toLocaleString()}</small>
-        </div>
-      `).join('<hr>');
-      
-    }
+    await loadFactHistory();
   } catch (err) {
     appError && (appError.textContent = err.message || String(err));
   } finally {
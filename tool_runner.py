@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Tuple
+
+from autogen import Agent, ConversableAgent
+from autogen.fast_depends.utils import is_coroutine_callable
+
+# Per-tool wall-clock limits (seconds). External APIs already use ~10s HTTP timeouts.
+TOOL_TIMEOUTS = {
+    "retrieve_legal_context": 20,
+    "search_indiankanoon_api": 15,
+    "search_indian_kanoon": 15,
+    "search_google_scholar_legal": 15,
+    # precedent_search returns at its own deadline (PRECEDENT_SEARCH_DEADLINE, 8s)
+    "search_precedents": 12,
+    "search_web": 15,
+}
+DEFAULT_TOOL_TIMEOUT = 30
+
+# Most tool calls of one turn run at once; the rest queue behind them.
+TOOL_MAX_WORKERS_PER_TURN = int(os.getenv("TOOL_MAX_WORKERS_PER_TURN", "8"))
+
+# Tool calls still running after their turn gave up on them. Each turn gets its
+# own executor, so these only hold their own thread, never another turn's slot.
+_abandoned = 0
+_abandoned_lock = threading.Lock()
+
+
+def _release_abandoned(_future) -> None:
+    global _abandoned
+    with _abandoned_lock:
+        _abandoned -= 1
+
+
+def abandoned_tool_calls() -> int:
+    with _abandoned_lock:
+        return _abandoned
+
+
+def _run_tool(agent: ConversableAgent, function_call: Dict[str, Any], call_id: Optional[str]) -> Dict[str, Any]:
+    """Executes one (already input-processed) call the way generate_tool_calls_reply does."""
+    func = agent._function_map.get(function_call.get("name", None), None)
+    if is_coroutine_callable(func):
+        _, func_return = agent._run_async_in_thread(agent.a_execute_function(function_call, call_id=call_id))
+    else:
+        _, func_return = agent.execute_function(function_call, call_id=call_id)
+    return func_return
+
+
+def concurrent_tool_calls_reply(
+    recipient: ConversableAgent,
+    messages: Optional[List[Dict[str, Any]]] = None,
+    sender: Optional[Agent] = None,
+    config: Optional[Any] = None,
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Drop-in replacement for ConversableAgent.generate_tool_calls_reply that runs
+    every tool call of a turn in parallel. Input / output safeguard hooks,
+    coroutine tools, __structured_output and the reply shape are the built-in's;
+    only the scheduling differs. Each call gets its own timeout and the
+    responses are returned in the order the model requested them.
+    """
+    if messages is None:
+        messages = recipient._oai_messages[sender]
+    tool_calls = messages[-1].get("tool_calls") or []
+    if not tool_calls:
+        return False, None
+
+    # Like the built-in: calls before a __structured_output run, then its arguments are the reply
+    structured = None
+    for k, tool_call in enumerate(tool_calls):
+        if tool_call.get("function", {}).get("name", "") == "__structured_output":
+            structured = tool_call["function"].get("arguments", {})
+            tool_calls = tool_calls[:k]
+            break
+
+    # Hooks run on the calling thread, in request order, before anything executes
+    processed_calls = []
+    for tool_call in tool_calls:
+        processed_call = recipient._process_tool_input(tool_call.get("function", {}))
+        if processed_call is None:
+            raise ValueError("safeguard_tool_inputs hook returned None")
+        processed_calls.append(processed_call)
+
+    global _abandoned
+    started = time.monotonic()
+    futures = []
+    pool = None
+    if processed_calls:
+        pool = ThreadPoolExecutor(max_workers=min(len(processed_calls), TOOL_MAX_WORKERS_PER_TURN),
+                                  thread_name_prefix="tool")
+        for tool_call, processed_call in zip(tool_calls, processed_calls):
+            futures.append(pool.submit(_run_tool, recipient, processed_call, tool_call.get("id", None)))
+
+    tool_returns = []
+    for tool_call, processed_call, future in zip(tool_calls, processed_calls, futures):
+        name = processed_call.get("name", "")
+        timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+        remaining = max(0.0, timeout - (time.monotonic() - started))
+        try:
+            func_return = future.result(timeout=remaining)
+        except FutureTimeout:
+            print(f"[TOOL TIMEOUT] {name} exceeded {timeout}s")
+            func_return = {"name": name, "role": "tool",
+                           "content": f"Error: {name} timed out after {timeout} seconds."}
+            if not future.cancel():
+                with _abandoned_lock:
+                    _abandoned += 1
+                future.add_done_callback(_release_abandoned)
+        except Exception as e:
+            func_return = {"name": name, "role": "tool", "content": f"Error: {e}"}
+
+        processed_return = recipient._process_tool_output(func_return)
+        if processed_return is None:
+            raise ValueError("safeguard_tool_outputs hook returned None")
+        content = processed_return.get("content", "")
+        response = {"role": "tool", "content": "" if content is None else content}
+        if tool_call.get("id") is not None:
+            response = {"tool_call_id": tool_call["id"], **response}
+        tool_returns.append(response)
+    if pool is not None:
+        # Don't wait for timed-out calls; their threads exit when the call returns
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if structured is not None:
+        return True, structured
+    if len(tool_calls) > 1:
+        print(f"[TOOLS] Ran {len(tool_calls)} tool calls concurrently in {time.monotonic() - started:.2f}s")
+    return True, {
+        "role": "tool",
+        "tool_responses": tool_returns,
+        "content": "\n\n".join(recipient._str_for_tool_response(r) for r in tool_returns),
+    }
+
+
+def enable_concurrent_tool_calls(agent: ConversableAgent) -> ConversableAgent:
+    """Registers concurrent_tool_calls_reply in place of the sequential built-in tool reply."""
+    position = next(
+        (i for i, entry in enumerate(agent._reply_func_list)
+         if entry["reply_func"] is ConversableAgent.generate_tool_calls_reply),
+        0,
+    )
+    agent.register_reply([Agent, None], concurrent_tool_calls_reply, position=position)
+    return agent
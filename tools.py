@@ -1,3 +1,4 @@
+import hashlib
 import os
 from dotenv import load_dotenv
 from langchain_huggingface import HuggingFaceEmbeddings
@@ -5,31 +6,56 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma # <-- NEW IMPORT
 # --- END OF FIX ---
 from typing import Tuple
+from functools import lru_cache
 from langchain_core.documents import Document
 import time # For the file lock fix
 
 load_dotenv()
 
 # ------------------ TOOL FUNCTION ------------------
+@lru_cache(maxsize=4)
+def get_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2") -> HuggingFaceEmbeddings:
+    """Loads the sentence-transformer once per process and reuses it."""
+    return HuggingFaceEmbeddings(model_name=model_name)
+
 def load_chroma(persist_dir="chroma_db", model_name="sentence-transformers/all-MiniLM-L6-v2"):
     """Loads the Chroma vector database from the persist directory."""
-    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    embeddings = get_embeddings(model_name)
     vectordb = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
     return vectordb
 
-def retrieve_legal_context(
+def chunk_reference(doc: Document, rank: int) -> dict:
+    """
+    Text of a retrieved chunk plus where it came from (page is 1-based). Without a
+    stored id, chunk_id comes from a hash of the text, never its position: it
+    feeds the fact-check memo key (fact_checker.fact_check_key).
+    """
+    metadata = getattr(doc, "metadata", None) or {}
+    page = metadata.get("page")
+    source = os.path.basename(str(metadata.get("source", "")))
+    text = getattr(doc, "page_content", str(doc))
+    chunk_id = getattr(doc, "id", None) or f"{source}:{page}:{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+    return {
+        "text": text,
+        "page": page + 1 if isinstance(page, int) else None,
+        "source": source,
+        "chunk_id": str(chunk_id),
+    }
+
+def retrieve_legal_context_with_chunks(
     query: str,
     persist_dir: str = "chroma_db",
     k: int = 5,
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
-) -> str:
+) -> Tuple[str, list]:
     """
     Retrieve top-k similar document chunks from Chroma for the given query.
-    Returns a single concatenated context string (JSON-serializable).
+    Returns (concatenated context string, list of chunk_reference dicts).
+    On failure the string carries the error / NO_INDEX_AVAILABLE and the list is empty.
     """
     try:
         if not os.path.exists(persist_dir):
-            return "NO_INDEX_AVAILABLE"
+            return "NO_INDEX_AVAILABLE", []
             
         vectordb = load_chroma(persist_dir=persist_dir, model_name=model_name)
     except Exception as e:
@@ -41,9 +67,9 @@ def retrieve_legal_context(
                  vectordb = load_chroma(persist_dir=persist_dir, model_name=model_name)
              except Exception as e2:
                  print(f"Retry failed: {e2}")
-                 return f"Error loading Chroma DB: {e2}. Please ensure you have uploaded a document first."
+                 return f"Error loading Chroma DB: {e2}. Please ensure you have uploaded a document first.", []
         else:
-            return f"Error loading Chroma DB: {e}. Please ensure you have uploaded a document first."
+            return f"Error loading Chroma DB: {e}. Please ensure you have uploaded a document first.", []
 
     docs = vectordb.similarity_search(query, k=k)
     
@@ -55,8 +81,22 @@ def retrieve_legal_context(
     # --- END OF FIX ---
     
     if not docs:
-        return "No relevant context was found in the document for your query."
+        return "No relevant context was found in the document for your query.", []
         
     context = "\n\n".join([getattr(d, "page_content", str(d)) for d in docs])
+    return context, [chunk_reference(d, i) for i, d in enumerate(docs)]
+
+
+def retrieve_legal_context(
+    query: str,
+    persist_dir: str = "chroma_db",
+    k: int = 5,
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+) -> str:
+    """
+    Retrieve top-k similar document chunks from Chroma for the given query.
+    Returns a single concatenated context string (JSON-serializable).
+    """
+    context, _ = retrieve_legal_context_with_chunks(query, persist_dir=persist_dir, k=k, model_name=model_name)
     return context
 
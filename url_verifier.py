@@ -0,0 +1,121 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Optional
+
+from http_client import get_session
+
+URL_VERIFY_WORKERS = int(os.getenv("URL_VERIFY_WORKERS", "8"))
+URL_VERIFY_TIMEOUT = float(os.getenv("URL_VERIFY_TIMEOUT", "4"))
+# How long a check is trusted. Failures are retried sooner than successes.
+URL_VERIFY_TTL = int(os.getenv("URL_VERIFY_TTL", str(6 * 60 * 60)))
+URL_VERIFY_FAILED_TTL = int(os.getenv("URL_VERIFY_FAILED_TTL", str(10 * 60)))
+# Default wall-clock wait for a blocking verify_urls call.
+URL_VERIFY_WAIT = float(os.getenv("URL_VERIFY_WAIT", "6"))
+MAX_CACHED_URLS = 5000
+# Bytes read from a page when looking for its <title>.
+TITLE_READ_BYTES = 64 * 1024
+
+TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+_verify_pool = ThreadPoolExecutor(max_workers=URL_VERIFY_WORKERS, thread_name_prefix="url-verify")
+_cache: Dict[str, tuple] = {}  # url -> (status dict, expires_at)
+_in_flight: Dict[tuple, Future] = {}  # (url, want_title) -> running check
+_lock = threading.Lock()
+
+
+def _read_title(url: str) -> Optional[str]:
+    with get_session().get(url, timeout=URL_VERIFY_TIMEOUT, stream=True) as resp:
+        if resp.status_code >= 400:
+            return None
+        chunk = next(resp.iter_content(TITLE_READ_BYTES, decode_unicode=False), b"")
+    match = TITLE_RE.search(chunk.decode(resp.encoding or "utf-8", errors="ignore"))
+    return re.sub(r"\s+", " ", match.group(1)).strip() if match else None
+
+
+def _check_url(url: str, want_title: bool) -> dict:
+    status = {"verified": False, "status_code": None, "title": None, "title_checked": want_title,
+              "checked_at": time.time()}
+    try:
+        resp = get_session().head(url, timeout=URL_VERIFY_TIMEOUT, allow_redirects=True)
+        if resp.status_code in (403, 405):
+            # Some court sites refuse HEAD; fall back to a streamed GET
+            with get_session().get(url, timeout=URL_VERIFY_TIMEOUT, stream=True) as get_resp:
+                resp = get_resp
+        status["status_code"] = resp.status_code
+        status["verified"] = resp.status_code < 400
+        if want_title and status["verified"]:
+            status["title"] = _read_title(url)
+    except Exception as e:
+        print(f"[URL VERIFY] {url[:80]}: {e}")
+
+    ttl = URL_VERIFY_TTL if status["verified"] else URL_VERIFY_FAILED_TTL
+    with _lock:
+        if len(_cache) >= MAX_CACHED_URLS:
+            # Drop the entries closest to expiry
+            for old_url, _ in sorted(_cache.items(), key=lambda kv: kv[1][1])[:MAX_CACHED_URLS // 10]:
+                del _cache[old_url]
+        current = _cache.get(url)
+        # A plain check finishing late must not replace a fresh check that read the title
+        if want_title or current is None or not current[0]["title_checked"] or current[1] <= time.time():
+            _cache[url] = (status, time.time() + ttl)
+        _in_flight.pop((url, want_title), None)
+    return status
+
+
+def cached_status(url: str, want_title: bool = False) -> Optional[dict]:
+    """The cached, unexpired check for `url` (with a title attempt if `want_title`), or None."""
+    with _lock:
+        entry = _cache.get(url)
+    if entry is None or entry[1] <= time.time():
+        return None
+    status = entry[0]
+    if want_title and not status["title_checked"]:
+        return None
+    return status
+
+
+def _schedule(url: str, want_title: bool) -> Future:
+    """Joins a running check that covers the request (a title check covers a plain one) or starts one."""
+    with _lock:
+        future = _in_flight.get((url, True))
+        if future is None and not want_title:
+            future = _in_flight.get((url, False))
+        if future is None:
+            future = _verify_pool.submit(_check_url, url, want_title)
+            _in_flight[(url, want_title)] = future
+    return future
+
+
+def verify_urls(urls: Iterable[str], titles_for: Iterable[str] = (), block: bool = True,
+                timeout: Optional[float] = None) -> Dict[str, Optional[dict]]:
+    """
+    Verifies links concurrently on a bounded pool, reusing cached checks.
+    URLs in `titles_for` also get their page <title> read.
+
+    With block=True waits up to `timeout` seconds (URL_VERIFY_WAIT by default);
+    with block=False returns immediately. Either way, URLs whose check hasn't
+    finished map to None and keep being verified in the background, so a later
+    call finds them in the cache.
+    """
+    titles_for = set(titles_for)
+    results: Dict[str, Optional[dict]] = {}
+    pending: Dict[str, Future] = {}
+    for url in dict.fromkeys(u for u in urls if u):
+        status = cached_status(url, url in titles_for)
+        if status is not None:
+            results[url] = status
+        else:
+            pending[url] = _schedule(url, url in titles_for)
+
+    if pending and block:
+        wait(pending.values(), timeout=URL_VERIFY_WAIT if timeout is None else timeout)
+    for url, future in pending.items():
+        results[url] = future.result() if future.done() and not future.exception() else None
+    return results
+
+
+def verify_url(url: str, want_title: bool = False) -> Optional[dict]:
+    return verify_urls([url], titles_for=[url] if want_title else ()).get(url)
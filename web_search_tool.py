@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 from tavily import TavilyClient
 from typing import List, Dict, Any
 
+from provider_scheduler import provider_scheduler, ProviderUnavailable
+
 # Load environment variables
 load_dotenv()
 
@@ -21,7 +23,9 @@ def search_web(query: str) -> str:
     try:
         client = TavilyClient(api_key=api_key)
         # include_answer=True adds an AI-generated answer based on the results
-        response = client.search(query=query, search_depth="basic", include_answer=True, max_results=3)
+        response = provider_scheduler.call(
+            "tavily", client.search, query=query, search_depth="basic", include_answer=True, max_results=3
+        )
         
         # Format the results for the LLM
         context = f"Tavily Search Answer: {response.get('answer', 'No answer found.')}\n\nSources:\n"
@@ -32,6 +36,10 @@ def search_web(query: str) -> str:
             
         return context
 
+    except ProviderUnavailable as e:
+        print(f"Tavily search skipped: {e}")
+        return "Web search is temporarily unavailable; answer from the document and general knowledge."
+
     except Exception as e:
         print(f"Error during Tavily search: {e}")
         return f"An unexpected error occurred while searching the web: {e}"
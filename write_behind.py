@@ -0,0 +1,214 @@
+import atexit
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+
+from db import USERS_DB, connection
+
+# Most writes committed in one transaction.
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "200"))
+# How long the writer lingers after the first queued write to collect a batch.
+# 0 commits whatever queued up while the previous batch was being written.
+WRITE_BATCH_WAIT_MS = float(os.getenv("WRITE_BATCH_WAIT_MS", "0"))
+# Upper bound on the flush at interpreter exit or SIGTERM.
+SHUTDOWN_FLUSH_TIMEOUT = float(os.getenv("WRITE_SHUTDOWN_FLUSH_TIMEOUT", "10"))
+
+
+class _Write:
+    __slots__ = ("db_path", "sql", "rows", "return_id", "future")
+
+    def __init__(self, db_path: str, sql: Optional[str], rows: Sequence[tuple], return_id: bool):
+        self.db_path = db_path
+        self.sql = sql          # None marks a flush barrier
+        self.rows = rows
+        self.return_id = return_id
+        self.future: Future = Future()
+
+
+class WriteBehindQueue:
+    """
+    Single background writer for SQLite inserts/updates. Queued writes are
+    committed together, one transaction per batch, and consecutive writes of
+    the same statement go through one executemany. Each write's future
+    resolves once its batch has committed.
+    """
+
+    def __init__(self, batch_max: int = WRITE_BATCH_MAX, wait_ms: float = WRITE_BATCH_WAIT_MS):
+        self.batch_max = batch_max
+        self.wait = wait_ms / 1000
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # Re-entrant: the SIGTERM handler may close() on a thread that is inside submit()
+        self._lock = threading.RLock()
+        self._closed = False
+        self._stats = {"writes": 0, "rows": 0, "batches": 0, "errors": 0}
+
+    def submit(self, sql: str, rows: Sequence[tuple], db_path: str = USERS_DB, return_id: bool = False) -> Future:
+        """
+        Queues `sql` once per parameter tuple in `rows`. The future's result is
+        the inserted row id when return_id=True (single-row writes only), the
+        row count otherwise; it raises the database error if the write failed.
+        """
+        write = _Write(db_path, sql, list(rows), return_id)
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                    self._thread.start()
+                self._queue.put(write)
+        if closed:
+            # After shutdown started: write synchronously rather than drop it
+            self._commit(db_path, [write])
+        return write.future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything queued before the call has been committed. False on timeout."""
+        with self._lock:
+            if self._thread is None or self._closed:
+                return True
+            barrier = _Write(USERS_DB, None, (), False)
+            self._queue.put(barrier)
+        try:
+            barrier.future.result(timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self, timeout: float = SHUTDOWN_FLUSH_TIMEOUT) -> None:
+        """Flushes pending writes and stops the writer; later submits write synchronously."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                print(f"[WRITE BEHIND] Shutdown flush timed out with ~{self._queue.qsize()} writes pending")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["pending"] = self._queue.qsize()
+        snapshot["avg_batch"] = round(snapshot["writes"] / snapshot["batches"], 2) if snapshot["batches"] else 0.0
+        return snapshot
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            batch: List[_Write] = []
+            if first is None:
+                stopping = True
+            else:
+                batch.append(first)
+                deadline = time.monotonic() + self.wait
+                while len(batch) < self.batch_max:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+            # Drain whatever is left at shutdown so nothing queued is lost
+            while stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    batch.append(item)
+            self._process(batch)
+
+    def _process(self, batch: List[_Write]) -> None:
+        by_db: Dict[str, List[_Write]] = {}
+        barriers = []
+        for write in batch:
+            if write.sql is None:
+                barriers.append(write)
+            else:
+                by_db.setdefault(write.db_path, []).append(write)
+        for db_path, writes in by_db.items():
+            for start in range(0, len(writes), self.batch_max):
+                self._commit(db_path, writes[start:start + self.batch_max])
+        for barrier in barriers:
+            barrier.future.set_result(True)
+
+    def _commit(self, db_path: str, writes: List[_Write]) -> None:
+        try:
+            with connection(db_path, immediate=True) as conn:
+                results = self._apply(conn, writes)
+        except Exception as e:
+            if len(writes) > 1:
+                # One bad write must not sink the rest of the batch
+                for write in writes:
+                    self._commit(db_path, [write])
+                return
+            print(f"[WRITE BEHIND] Write failed: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            writes[0].future.set_exception(e)
+            return
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["writes"] += len(writes)
+            self._stats["rows"] += sum(len(w.rows) for w in writes)
+        for write, result in zip(writes, results):
+            write.future.set_result(result)
+
+    @staticmethod
+    def _apply(conn, writes: List[_Write]) -> list:
+        results = []
+        i = 0
+        while i < len(writes):
+            write = writes[i]
+            if write.return_id:
+                results.append(conn.execute(write.sql, write.rows[0]).lastrowid)
+                i += 1
+                continue
+            j = i
+            rows = []
+            while j < len(writes) and writes[j].sql == write.sql and not writes[j].return_id:
+                rows.extend(writes[j].rows)
+                j += 1
+            conn.executemany(write.sql, rows)
+            results.extend(len(w.rows) for w in writes[i:j])
+            i = j
+        return results
+
+
+def install_shutdown_handler(signals=(signal.SIGTERM,)) -> bool:
+    """
+    Flushes write_queue when the process is told to stop. atexit alone misses
+    SIGTERM (systemd, Docker, gunicorn), which kills the process without running
+    exit hooks. The previous handler runs afterwards; if there was none, the
+    signal's default action is restored and the signal re-raised. Only the main
+    thread can set handlers; returns False elsewhere.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return False
+    for sig in signals:
+        previous = signal.getsignal(sig)
+
+        def handler(signum, frame, previous=previous):
+            print(f"[WRITE BEHIND] {signal.Signals(signum).name} received, flushing pending writes")
+            write_queue.close()
+            if callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                signal.signal(signum, signal.SIG_DFL)
+                os.kill(os.getpid(), signum)
+
+        signal.signal(sig, handler)
+    return True
+
+
+write_queue = WriteBehindQueue()
+atexit.register(write_queue.close)